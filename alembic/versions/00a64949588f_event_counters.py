@@ -0,0 +1,47 @@
+"""event hold/confirmed counters
+
+Revision ID: 00a64949588f
+Revises: 6e974484c169
+Create Date: 2026-10-18 11:42:37.118254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '00a64949588f'
+down_revision = '6e974484c169'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ('events', 'event_capacity_shards'):
+        op.add_column(table, sa.Column('hold_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('confirmed_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill: reservations without a shard count on the event row,
+    # the others on the shard they were taken from
+    op.execute(
+        "UPDATE events SET"
+        " hold_count = (SELECT COUNT(*) FROM reservations r"
+        "  WHERE r.event_id = events.id AND r.shard_no IS NULL AND r.state = 'HOLD'),"
+        " confirmed_count = (SELECT COUNT(*) FROM reservations r"
+        "  WHERE r.event_id = events.id AND r.shard_no IS NULL AND r.state = 'CONFIRMED')"
+    )
+    op.execute(
+        "UPDATE event_capacity_shards SET"
+        " hold_count = (SELECT COUNT(*) FROM reservations r"
+        "  WHERE r.event_id = event_capacity_shards.event_id"
+        "  AND r.shard_no = event_capacity_shards.shard_no AND r.state = 'HOLD'),"
+        " confirmed_count = (SELECT COUNT(*) FROM reservations r"
+        "  WHERE r.event_id = event_capacity_shards.event_id"
+        "  AND r.shard_no = event_capacity_shards.shard_no AND r.state = 'CONFIRMED')"
+    )
+
+
+def downgrade() -> None:
+    for table in ('event_capacity_shards', 'events'):
+        op.drop_column(table, 'confirmed_count')
+        op.drop_column(table, 'hold_count')
@@ -0,0 +1,36 @@
+"""reservation hot-path indexes
+
+Revision ID: 3b1f9c2d7e41
+Revises: 00a64949588f
+Create Date: 2026-10-18 12:20:44.583102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1f9c2d7e41'
+down_revision = '00a64949588f'
+branch_labels = None
+depends_on = None
+
+# Partial on both dialects, matching the model (app/models.py)
+HOLD_ONLY = sa.text("state = 'HOLD'")
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction; reservations is the
+    # hottest table, so do not block writes while the indexes build
+    with op.get_context().autocommit_block():
+        op.create_index('ix_reservations_hold_expires_at', 'reservations', ['expires_at'], unique=False,
+                        postgresql_where=HOLD_ONLY, sqlite_where=HOLD_ONLY,
+                        postgresql_concurrently=True)
+        op.create_index('ix_reservations_event_id_state', 'reservations', ['event_id', 'state'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_reservations_event_id_state', table_name='reservations', postgresql_concurrently=True)
+        op.drop_index('ix_reservations_hold_expires_at', table_name='reservations', postgresql_concurrently=True)
@@ -0,0 +1,32 @@
+"""outbox
+
+Revision ID: 4c7d9e2a1f58
+Revises: e2b84f0c6a15
+Create Date: 2026-10-18 19:05:41.218330
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c7d9e2a1f58'
+down_revision = 'e2b84f0c6a15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=64), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('outbox')
@@ -0,0 +1,26 @@
+"""event version stamp
+
+Revision ID: 5f8e2b7c3a64
+Revises: c47e0b5a9d13
+Create Date: 2026-10-18 14:31:56.907214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f8e2b7c3a64'
+down_revision = 'c47e0b5a9d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('event_capacity_shards', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('event_capacity_shards', 'version')
+    op.drop_column('events', 'version')
@@ -0,0 +1,49 @@
+"""sharded capacity
+
+Revision ID: 6e974484c169
+Revises: 443ce1778b8c
+Create Date: 2026-10-18 10:05:12.412907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e974484c169'
+down_revision = '443ce1778b8c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('capacity_shards', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('reservations', sa.Column('shard_no', sa.Integer(), nullable=True))
+    op.create_table('event_capacity_shards',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('shard_no', sa.Integer(), nullable=False),
+    sa.Column('available_capacity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id', 'shard_no', name='uq_event_capacity_shards_event_shard')
+    )
+    op.create_index(op.f('ix_event_capacity_shards_id'), 'event_capacity_shards', ['id'], unique=False)
+    op.create_index(op.f('ix_event_capacity_shards_event_id'), 'event_capacity_shards', ['event_id'], unique=False)
+
+
+def downgrade() -> None:
+    # Fold any sharded capacity back into the event row before dropping shards.
+    # Add to the row rather than overwrite it: expiries and rebalancing can
+    # leave seats on the event row of a sharded event
+    op.execute(
+        "UPDATE events SET available_capacity = available_capacity + ("
+        " SELECT COALESCE(SUM(s.available_capacity), 0) FROM event_capacity_shards s"
+        " WHERE s.event_id = events.id)"
+        " WHERE capacity_shards > 0"
+    )
+    op.drop_index(op.f('ix_event_capacity_shards_event_id'), table_name='event_capacity_shards')
+    op.drop_index(op.f('ix_event_capacity_shards_id'), table_name='event_capacity_shards')
+    op.drop_table('event_capacity_shards')
+    op.drop_column('reservations', 'shard_no')
+    op.drop_column('events', 'capacity_shards')
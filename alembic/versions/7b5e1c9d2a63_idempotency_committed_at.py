@@ -0,0 +1,24 @@
+"""idempotency committed_at
+
+Revision ID: 7b5e1c9d2a63
+Revises: 4c7d9e2a1f58
+Create Date: 2026-10-18 21:14:08.502716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b5e1c9d2a63'
+down_revision = '4c7d9e2a1f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('idempotency_keys', sa.Column('committed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('idempotency_keys', 'committed_at')
@@ -0,0 +1,25 @@
+"""reservation quantity
+
+Revision ID: 8d2a4c6f1b90
+Revises: 3b1f9c2d7e41
+Create Date: 2026-10-18 13:05:19.274630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2a4c6f1b90'
+down_revision = '3b1f9c2d7e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing reservations are single-seat, which is exactly the server default
+    op.add_column('reservations', sa.Column('quantity', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('reservations', 'quantity')
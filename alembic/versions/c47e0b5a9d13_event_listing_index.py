@@ -0,0 +1,27 @@
+"""event listing index
+
+Revision ID: c47e0b5a9d13
+Revises: 8d2a4c6f1b90
+Create Date: 2026-10-18 13:48:02.651937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e0b5a9d13'
+down_revision = '8d2a4c6f1b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_events_is_active_id', 'events', ['is_active', 'id'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_events_is_active_id', table_name='events', postgresql_concurrently=True)
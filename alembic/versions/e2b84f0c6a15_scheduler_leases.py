@@ -0,0 +1,32 @@
+"""scheduler leases
+
+Revision ID: e2b84f0c6a15
+Revises: 9a3d6e1f4b27
+Create Date: 2026-10-18 17:20:09.554102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b84f0c6a15'
+down_revision = '9a3d6e1f4b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('holder', sa.String(length=255), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('renewed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_runs', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scheduler_leases')
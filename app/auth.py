@@ -1,29 +1,33 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.config import settings
-from app.db import get_db
+from app.hashing import hash_password, verify_and_update
+from app.db import get_db, get_async_db
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models import User
+from app.principals import Principal, get_principal_cache
 
-# Use pbkdf2_sha256 for portability in test environment
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hash_password(password)
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_and_update(plain_password, hashed_password)[0]
 
 
-def create_access_token(subject: str, expires_delta: Optional[timedelta] = None):
+def create_access_token(subject: str, expires_delta: Optional[timedelta] = None,
+                        user_id: Optional[int] = None, is_admin: bool = False):
     to_encode = {"sub": str(subject)}
+    if user_id is not None:
+        # uid/adm let get_current_user build the principal without a users query
+        to_encode.update({"uid": user_id, "adm": bool(is_admin)})
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -33,16 +37,57 @@ def create_access_token(subject: str, expires_delta: Optional[timedelta] = None)
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _decode_token(token: str) -> dict:
     from jose import JWTError
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    user = db.query(User).filter(User.username == username).first()
+    return payload
+
+
+def _known_principal(token: str, claims: dict) -> Optional[Principal]:
+    # Güvenilen claim modu: hiç sorgu yok; aksi halde önbellek
+    if settings.AUTH_TRUST_TOKEN_CLAIMS:
+        principal = Principal.from_claims(claims)
+        if principal is not None:
+            return principal
+    cache = get_principal_cache()
+    return cache.get(claims["sub"], token) if cache is not None else None
+
+
+def _remember(token: str, claims: dict, user: Optional[User]) -> Principal:
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    return user
+    principal = Principal.from_user(user)
+    cache = get_principal_cache()
+    if cache is not None:
+        cache.put(claims["sub"], token, principal, expires_at=claims.get("exp"))
+    return principal
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    claims = _decode_token(token)
+    principal = _known_principal(token, claims)
+    if principal is None:
+        user = db.query(User).filter(User.username == claims["sub"]).first()
+        principal = _remember(token, claims, user)
+    return principal
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db=Depends(get_async_db)) -> Principal:
+    claims = _decode_token(token)
+    principal = _known_principal(token, claims)
+    if principal is None:
+        user = await db.scalar(select(User).where(User.username == claims["sub"]))
+        principal = _remember(token, claims, user)
+    return principal
+
+
+def require_admin(current_user=Depends(get_current_user)) -> Principal:
+    """Admin-only endpoints (shard configuration, bulk import and bulk updates)."""
+    if not getattr(current_user, "is_admin", False):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
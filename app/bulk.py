@@ -0,0 +1,322 @@
+"""Bulk event import and set-based bulk updates.
+
+Importing a season (tens of thousands of events) one ``POST /events/`` at a
+time costs a round trip, a commit and a refresh per event. ``import_events``
+takes CSV (header row, ``EventCreate`` field names as columns) or NDJSON
+(one object per line), validates every row with ``schemas.EventCreate`` and
+inserts ``BULK_IMPORT_CHUNK_SIZE`` valid rows per transaction: ``COPY`` on
+Postgres (psycopg2), an executemany ``INSERT`` elsewhere. Input is consumed
+as a stream, so memory stays at one chunk whatever the file size.
+
+A bad row never stops the load. Validation errors are reported per line. If
+the database rejects a chunk, its rows are retried one by one and only the
+ones that still fail are reported.
+
+The bulk updates (``set_active``, ``adjust_capacity``) are one ``UPDATE ...
+WHERE id IN (...)`` each, not a loop over events.
+
+    python -m app.bulk import season.csv
+    python -m app.bulk import season.ndjson --chunk-size 5000
+    python -m app.bulk deactivate 12 13 14
+    python -m app.bulk capacity --delta 50 12 13
+"""
+import argparse
+import codecs
+import csv
+import io
+import json
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import anyio.from_thread
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import db as db_module
+from app.capacity_gate import reconcile_capacity_gate
+from app.config import settings
+from app.event_cache import changed
+from app.models import Event
+from app.schemas import EventCreate
+from app.waiting_room import get_waiting_room
+
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+COLUMNS = ("title", "capacity", "available_capacity", "start_date", "end_date", "is_active")
+NULLABLE_COLUMNS = ("start_date", "end_date")
+
+# (line number, parsed object) or (line number, error message)
+Record = Tuple[int, Union[dict, str]]
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    inserted: int = 0
+    failed: int = 0
+    # First BULK_IMPORT_MAX_ERRORS failures; ``failed`` counts them all
+    errors: List[dict] = field(default_factory=list)
+    max_errors: int = 1000
+
+    def error(self, line: int, messages: Sequence[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": list(messages)})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+# --- Girdi ---
+def format_for(content_type: str) -> Optional[str]:
+    return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[Record]:
+    reader = csv.DictReader(lines)
+    for raw in reader:
+        if None in raw:
+            yield reader.line_num, "more fields than columns in the header"
+            continue
+        # Empty cells fall back to the schema defaults
+        yield reader.line_num, {key: value for key, value in raw.items() if value not in ("", None)}
+
+
+def parse_ndjson(lines: Iterable[str]) -> Iterator[Record]:
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as exc:
+            yield number, f"invalid JSON: {exc}"
+            continue
+        yield number, raw if isinstance(raw, dict) else "expected a JSON object"
+
+
+def parse(fmt: str, lines: Iterable[str]) -> Iterator[Record]:
+    return parse_csv(lines) if fmt == "csv" else parse_ndjson(lines)
+
+
+def stream_lines(stream) -> Iterator[str]:
+    """Lines of an async byte stream (e.g. ``Request.stream()``), for a worker thread.
+
+    Each chunk is awaited on the event loop through ``anyio.from_thread``, so
+    the body is never held in memory as a whole.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            break
+        buffer += decoder.decode(chunk)
+        *complete, buffer = buffer.split("\n")
+        for line in complete:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+# --- Yükleme ---
+def _validate(line: int, raw: Union[dict, str], report: ImportReport) -> Optional[dict]:
+    if isinstance(raw, str):
+        report.error(line, [raw])
+        return None
+    try:
+        event = EventCreate.parse_obj(raw)
+    except ValidationError as exc:
+        report.error(line, [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()])
+        return None
+    return {
+        "title": event.title,
+        "capacity": event.capacity,
+        "available_capacity": event.capacity,
+        "start_date": event.start_date,
+        "end_date": event.end_date,
+        "is_active": True if event.is_active is None else event.is_active,
+    }
+
+
+def _copy(db: Session, rows: List[dict]) -> None:
+    buffer = io.StringIO()
+    # QUOTE_NONNUMERIC quotes strings, so "" stays an empty title. It also
+    # writes None as "", which COPY would read as an empty string; FORCE_NULL
+    # turns it back into NULL for the nullable columns
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    writer.writerows([row[column] for column in COLUMNS] for row in rows)
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY events ({', '.join(COLUMNS)}) FROM STDIN"
+            f" WITH (FORMAT csv, FORCE_NULL ({', '.join(NULLABLE_COLUMNS)}))",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _insert(db: Session, rows: List[dict]) -> None:
+    if db.get_bind().dialect.driver == "psycopg2":
+        _copy(db, rows)
+    else:
+        db.execute(insert(Event), rows)
+
+
+def _flush(db: Session, chunk: List[Tuple[int, dict]], report: ImportReport) -> None:
+    try:
+        _insert(db, [row for _, row in chunk])
+        db.commit()
+        report.inserted += len(chunk)
+        return
+    except Exception:
+        # COPY errors come unwrapped from the DBAPI cursor; the row-by-row
+        # pass below either reports the bad rows or re-raises a real bug
+        db.rollback()
+    # One bad row must not cost the whole chunk: find it row by row
+    for line, row in chunk:
+        try:
+            db.execute(insert(Event), [row])
+            db.commit()
+            report.inserted += 1
+        except SQLAlchemyError as exc:
+            db.rollback()
+            report.error(line, [f"database: {getattr(exc, 'orig', None) or exc}"])
+
+
+def import_events(db: Session, records: Iterable[Record], chunk_size: Optional[int] = None) -> ImportReport:
+    """Validate and insert ``records`` chunk by chunk; one transaction per chunk."""
+    chunk_size = chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+    report = ImportReport(max_errors=settings.BULK_IMPORT_MAX_ERRORS)
+    chunk: List[Tuple[int, dict]] = []
+    for line, raw in records:
+        report.rows += 1
+        row = _validate(line, raw, report)
+        if row is None:
+            continue
+        chunk.append((line, row))
+        if len(chunk) >= chunk_size:
+            _flush(db, chunk, report)
+            chunk = []
+    if chunk:
+        _flush(db, chunk, report)
+    return report
+
+
+# --- Toplu güncellemeler ---
+def set_active(db: Session, event_ids: Sequence[int], active: bool) -> int:
+    """Activate or deactivate events in one UPDATE; returns rows changed.
+
+    Deactivated events lose their waiting-room queue. The admission gate is
+    reconciled either way, so it stops admitting (or starts counting) them.
+    """
+    result = db.execute(
+        update(Event)
+        .where(Event.id.in_(event_ids), Event.is_active.isnot(active))
+        .values(is_active=active, version=Event.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    for event_id in event_ids:
+        changed(db, event_id)
+    db.commit()
+    if not active:
+        room = get_waiting_room()
+        if room:
+            for event_id in event_ids:
+                room.close(event_id)
+    reconcile_capacity_gate(db, event_ids)
+    return result.rowcount
+
+
+def adjust_capacity(db: Session, event_ids: Sequence[int], delta: int) -> Dict[str, List[int]]:
+    """Add ``delta`` to capacity and available seats of each event in one UPDATE.
+
+    Sharded events (capacity lives on the shard rows), missing ids and events
+    where fewer than ``-delta`` seats are still free are skipped.
+    """
+    eligible = list(db.execute(
+        select(Event.id)
+        .where(Event.id.in_(event_ids), Event.capacity_shards == 0, Event.available_capacity + delta >= 0)
+        .order_by(Event.id)
+        .with_for_update()
+    ).scalars())
+    if eligible:
+        db.execute(
+            update(Event)
+            .where(Event.id.in_(eligible))
+            .values(
+                capacity=Event.capacity + delta,
+                available_capacity=Event.available_capacity + delta,
+                version=Event.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        for event_id in eligible:
+            changed(db, event_id)
+    db.commit()
+    if eligible:
+        if delta > 0:
+            # app.holds imports app.tasks; keep this module importable on its own
+            from app.holds import admit_waiting
+
+            admit_waiting(db, eligible)
+        reconcile_capacity_gate(db, eligible)
+    return {"updated": eligible, "skipped": sorted(set(event_ids) - set(eligible))}
+
+
+# --- CLI ---
+def _run_import(db: Session, args) -> dict:
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    if args.path == "-":
+        return import_events(db, parse(fmt, io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig")),
+                             args.chunk_size).as_dict()
+    with open(args.path, encoding="utf-8-sig", newline="") as handle:
+        return import_events(db, parse(fmt, handle), args.chunk_size).as_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    importing = commands.add_parser("import", help="load events from a CSV or NDJSON file (- for stdin)")
+    importing.add_argument("path")
+    importing.add_argument("--format", choices=FORMATS, help="default: from the file extension, else csv")
+    importing.add_argument("--chunk-size", type=int, help="rows per transaction (default BULK_IMPORT_CHUNK_SIZE)")
+    for name in ("activate", "deactivate"):
+        commands.add_parser(name).add_argument("ids", type=int, nargs="+")
+    capacity = commands.add_parser("capacity", help="add --delta seats (may be negative)")
+    capacity.add_argument("--delta", type=int, required=True)
+    capacity.add_argument("ids", type=int, nargs="+")
+    args = parser.parse_args(argv)
+
+    db = db_module.SessionLocal()
+    try:
+        if args.command == "import":
+            result = _run_import(db, args)
+        elif args.command == "capacity":
+            result = adjust_capacity(db, args.ids, args.delta)
+        else:
+            result = {"updated": set_active(db, args.ids, args.command == "activate")}
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2))
+    return 1 if result.get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Atomic capacity admission in front of the event row lock.
+
+The gate keeps one counter per event that mirrors ``Event.available_capacity``.
+A hold first takes a seat from the counter with a single atomic operation and
+only the winners go on to ``SELECT ... FOR UPDATE`` in the database, so a
+sold-out event rejects traffic without queueing on the row lock.
+
+The database stays the source of truth. Counters are seeded from it on startup
+and after every expiry sweep; an event without a counter simply falls through
+to the transactional path.
+"""
+import threading
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.inventory import available_capacities
+
+
+class CapacityGate:
+    """Interface shared by the in-process and Redis gates."""
+
+    def reserve(self, event_id: int, seats: int = 1) -> Optional[bool]:
+        """Take ``seats`` from the counter.
+
+        Returns True when admitted, False when sold out and None when the
+        event has no counter yet (the caller must ask the database).
+        """
+        raise NotImplementedError
+
+    def release(self, event_id: int, seats: int = 1) -> None:
+        """Give seats back, only if the counter exists."""
+        raise NotImplementedError
+
+    def prime(self, event_id: int, available: int) -> None:
+        """Create the counter if it is missing; never overwrite a live one."""
+        raise NotImplementedError
+
+    def set(self, event_id: int, available: int) -> None:
+        raise NotImplementedError
+
+    def forget(self, event_id: int) -> None:
+        raise NotImplementedError
+
+    def reconcile(self, db: Session, event_ids: Optional[Iterable[int]] = None) -> int:
+        """Overwrite counters with the database capacity (shards summed).
+
+        Inactive events lose their counter so the database can answer with
+        the proper "Event is not active" error. Returns the number of events
+        that were synced.
+        """
+        if event_ids is not None:
+            event_ids = list(event_ids)
+            if not event_ids:
+                return 0
+        capacities = available_capacities(db, event_ids)
+        for event_id, (available, is_active) in capacities.items():
+            if is_active:
+                self.set(event_id, available)
+            else:
+                self.forget(event_id)
+        return len(capacities)
+
+
+class InMemoryCapacityGate(CapacityGate):
+    """Single-process gate, also used by the tests."""
+
+    def __init__(self):
+        self._counters: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, event_id, seats=1):
+        with self._lock:
+            available = self._counters.get(event_id)
+            if available is None:
+                return None
+            if available < seats:
+                return False
+            self._counters[event_id] = available - seats
+            return True
+
+    def release(self, event_id, seats=1):
+        with self._lock:
+            if event_id in self._counters:
+                self._counters[event_id] += seats
+
+    def prime(self, event_id, available):
+        with self._lock:
+            self._counters.setdefault(event_id, available)
+
+    def set(self, event_id, available):
+        with self._lock:
+            self._counters[event_id] = available
+
+    def forget(self, event_id):
+        with self._lock:
+            self._counters.pop(event_id, None)
+
+    def get(self, event_id) -> Optional[int]:
+        return self._counters.get(event_id)
+
+
+_RESERVE_SCRIPT = """
+local v = redis.call('GET', KEYS[1])
+if not v then return -1 end
+if tonumber(v) < tonumber(ARGV[1]) then return 0 end
+redis.call('DECRBY', KEYS[1], ARGV[1])
+return 1
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+
+class RedisCapacityGate(CapacityGate):
+    """Gate shared by every worker through Redis Lua scripts."""
+
+    key_prefix = "proxan:capacity:"
+
+    def __init__(self, client):
+        self.client = client
+        self._reserve = client.register_script(_RESERVE_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    def _key(self, event_id):
+        return f"{self.key_prefix}{event_id}"
+
+    def reserve(self, event_id, seats=1):
+        result = int(self._reserve(keys=[self._key(event_id)], args=[seats]))
+        if result < 0:
+            return None
+        return result == 1
+
+    def release(self, event_id, seats=1):
+        self._release(keys=[self._key(event_id)], args=[seats])
+
+    def prime(self, event_id, available):
+        self.client.set(self._key(event_id), available, nx=True)
+
+    def set(self, event_id, available):
+        self.client.set(self._key(event_id), available)
+
+    def forget(self, event_id):
+        self.client.delete(self._key(event_id))
+
+
+_gate: Optional[CapacityGate] = None
+
+
+def build_gate(backend: str) -> Optional[CapacityGate]:
+    if backend == "off":
+        return None
+    if backend == "memory":
+        return InMemoryCapacityGate()
+    if backend == "redis":
+        from app import redis_client
+
+        return RedisCapacityGate(redis_client.from_url(settings.REDIS_URL))
+    raise ValueError(f"Unknown CAPACITY_GATE backend: {backend}")
+
+
+def get_capacity_gate() -> Optional[CapacityGate]:
+    global _gate
+    if _gate is None:
+        _gate = build_gate(settings.CAPACITY_GATE)
+    return _gate
+
+
+def reconcile_capacity_gate(db: Session, event_ids: Optional[Iterable[int]] = None) -> int:
+    gate = get_capacity_gate()
+    if gate is None:
+        return 0
+    return gate.reconcile(db, event_ids)
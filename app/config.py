@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,6 +7,125 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
 
+    # Primary connection pool (Postgres): persistent connections, extra
+    # connections under load and how long a request waits for one
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    # Read replica for read-only endpoints (unset = everything on the primary)
+    READ_DATABASE_URL: Optional[str] = None
+    READ_DB_POOL_SIZE: int = 5
+    READ_DB_MAX_OVERFLOW: int = 10
+    # After a successful write the client reads from the primary for this
+    # long (cookie), so it never sees a replica older than its own write
+    READ_YOUR_WRITES_SECONDS: float = 5
+
+    # Prometheus metrics at GET /metrics (in-process, no collector needed)
+    METRICS_ENABLED: bool = True
+    # Per-request SQL profile (app/sql_profile.py): off | header (requests
+    # sending "X-SQL-Profile: 1") | all. Adds X-SQL-Queries / X-SQL-Time-Ms
+    # response headers and logs the slowest statements
+    SQL_PROFILE: str = "off"
+
+    # Capacity admission gate in front of create_hold: off | memory | redis
+    CAPACITY_GATE: str = "off"
+    # Honour per-event capacity shards (Event.capacity_shards) on the hold path
+    SHARDED_INVENTORY: bool = False
+    # How create_hold takes a seat: row_lock | conditional_update (see app/holds.py)
+    HOLD_STRATEGY: str = "row_lock"
+
+    # Waiting room for sold-out events: off | memory | redis. Over-capacity
+    # holds get a FIFO ticket (202) and the expiry sweep grants freed seats
+    WAITING_ROOM: str = "off"
+    # A ticket not polled for this long is dropped instead of granted
+    WAITING_ROOM_TICKET_IDLE_SECONDS: int = 60
+    # Retry-After sent with a ticket: how often clients should poll it
+    WAITING_ROOM_POLL_SECONDS: int = 5
+
+    # Token buckets on the hold endpoints: off | memory | redis. Rates are
+    # requests per second (0 = no limit at that level), bursts bucket sizes
+    RATE_LIMIT_BACKEND: str = "off"
+    RATE_LIMIT_USER_RATE: float = 5
+    RATE_LIMIT_USER_BURST: int = 10
+    RATE_LIMIT_EVENT_RATE: float = 500
+    RATE_LIMIT_EVENT_BURST: int = 1000
+    RATE_LIMIT_GLOBAL_RATE: float = 2000
+    RATE_LIMIT_GLOBAL_BURST: int = 4000
+
+    # Idempotency-Key on hold/confirm: how long a stored response is replayed,
+    # how long a duplicate on an async endpoint waits for the first attempt
+    # (sync endpoints answer 409 at once) and when an attempt whose work never
+    # committed counts as abandoned
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_WAIT_SECONDS: float = 10
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS: int = 60
+
+    # Upper bound on seats per event in one hold or batch hold request
+    MAX_SEATS_PER_HOLD: int = 10
+
+    # Expiry sweep: rows per batch, max batches per run (0 = until drained)
+    # and a pause between batches to leave room for live traffic
+    EXPIRY_BATCH_SIZE: int = 500
+    EXPIRY_MAX_BATCHES: int = 0
+    EXPIRY_BATCH_PAUSE_MS: int = 0
+    # poll: sweep every EXPIRY_SWEEP_INTERVAL_SECONDS
+    # celery: one ETA task per hold, sweep every EXPIRY_SAFETY_SWEEP_SECONDS
+    EXPIRY_SCHEDULER: str = "poll"
+    EXPIRY_SWEEP_INTERVAL_SECONDS: int = 60
+    EXPIRY_SAFETY_SWEEP_SECONDS: int = 600
+
+    # Outbox relay (app/outbox.py): reservation changes are published to this
+    # topic exchange on the Celery broker. The leader enqueues a relay task
+    # every interval; it drains batches (max batches per run, 0 = until empty)
+    OUTBOX_EXCHANGE: str = "proxan.events"
+    OUTBOX_RELAY_INTERVAL_SECONDS: int = 2
+    OUTBOX_RELAY_BATCH_SIZE: int = 500
+    OUTBOX_RELAY_MAX_BATCHES: int = 0
+
+    # Admin bulk import (POST /events/import, python -m app.bulk): valid rows
+    # per transaction and how many row errors the report lists
+    BULK_IMPORT_CHUNK_SIZE: int = 1000
+    BULK_IMPORT_MAX_ERRORS: int = 1000
+
+    # Periodic jobs run on one elected process: db (scheduler_leases row) |
+    # redis | off (every process runs them). A dead leader is replaced within
+    # one lease plus one heartbeat
+    SCHEDULER_LEADER_ELECTION: str = "db"
+    SCHEDULER_LEASE_SECONDS: int = 15
+    SCHEDULER_HEARTBEAT_SECONDS: int = 5
+
+    # Serve hold/confirm/detail/register/token from async def endpoints
+    ASYNC_ENDPOINTS: bool = False
+    # Defaults to DATABASE_URL with the async driver (asyncpg / aiosqlite)
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # get_current_user principal cache: entry lifetime (0 = off) and size
+    AUTH_CACHE_TTL_SECONDS: int = 30
+    AUTH_CACHE_SIZE: int = 10000
+    # Trust the uid/adm token claims and skip the users lookup entirely;
+    # admin/user changes then only apply once the token expires
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+    # GET /events/{id} payload cache, filled from the primary; also the upper
+    # bound on how stale a detail read can be when an invalidation message is
+    # lost (0 = off, and detail reads use the replica)
+    EVENT_CACHE_TTL_SECONDS: float = 1.0
+    EVENT_CACHE_SIZE: int = 10000
+    # Live capacity push (SSE / WebSocket): coalescing window, heartbeat,
+    # how long a send may stall before the socket is closed, events per stream
+    LIVE_UPDATE_INTERVAL_MS: int = 250
+    LIVE_HEARTBEAT_SECONDS: float = 15
+    LIVE_SEND_TIMEOUT_SECONDS: float = 10
+    LIVE_MAX_EVENTS_PER_SUBSCRIPTION: int = 50
+    # Cross-worker cache invalidation: memory (this process only) | redis
+    PUBSUB_BACKEND: str = "memory"
+
+    # pbkdf2_sha256 rounds; logins rehash passwords stored with fewer rounds
+    PASSWORD_HASH_ROUNDS: int = 29000
+    # Hashing process pool size (0 = hash inline on the request thread) and
+    # how many jobs may wait for it before /auth answers 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE: int = 32
+
     class Config:
         env_file = ".env"
 
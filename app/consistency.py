@@ -0,0 +1,116 @@
+"""Consistency checker for the maintained hold/confirmed counters.
+
+``Event.hold_count``/``confirmed_count`` (and the same columns on capacity
+shards) are updated in the hold, confirm and expiry transactions instead of
+being counted on every read. This module recomputes the true seat counts
+(``SUM(quantity)``) from ``reservations`` and reports every row whose
+counters drifted, plus events whose capacity no longer adds up
+(available + held + confirmed != capacity).
+
+    python -m app.consistency          # report only, exit code 1 on drift
+    python -m app.consistency --fix    # rewrite drifted counters
+"""
+import argparse
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.event_cache import changed
+from app.inventory import event_totals
+from app.models import Event, EventCapacityShard, Reservation, ReservationState
+
+
+@dataclass
+class CounterMismatch:
+    event_id: int
+    shard_no: Optional[int]  # None = the event row itself
+    field: str
+    stored: int
+    actual: int
+
+
+def _true_counts(db: Session, event_ids: Optional[List[int]]) -> Dict[Tuple[int, Optional[int]], Dict[str, int]]:
+    query = db.query(Reservation.event_id, Reservation.shard_no, Reservation.state, func.sum(Reservation.quantity))
+    if event_ids is not None:
+        query = query.filter(Reservation.event_id.in_(event_ids))
+    counts = defaultdict(lambda: {"hold_count": 0, "confirmed_count": 0})
+    for event_id, shard_no, state, count in query.group_by(Reservation.event_id, Reservation.shard_no, Reservation.state):
+        field = "hold_count" if state == ReservationState.HOLD else "confirmed_count"
+        counts[(event_id, shard_no)][field] = int(count)
+    return counts
+
+
+def check_event_counters(db: Session, event_ids: Optional[Iterable[int]] = None, fix: bool = False) -> List[CounterMismatch]:
+    """Compare stored counters with the seats actually held/confirmed.
+
+    With ``fix=True`` drifted counters are overwritten with the true values;
+    the caller commits.
+    """
+    event_ids = list(event_ids) if event_ids is not None else None
+    counts = _true_counts(db, event_ids)
+
+    events = db.query(Event)
+    shards = db.query(EventCapacityShard)
+    if event_ids is not None:
+        events = events.filter(Event.id.in_(event_ids))
+        shards = shards.filter(EventCapacityShard.event_id.in_(event_ids))
+    rows = [(e, e.id, None) for e in events] + [(s, s.event_id, s.shard_no) for s in shards]
+
+    mismatches = []
+    for row, event_id, shard_no in rows:
+        actual = counts.get((event_id, shard_no), {"hold_count": 0, "confirmed_count": 0})
+        for field, value in actual.items():
+            stored = getattr(row, field)
+            if stored != value:
+                mismatches.append(CounterMismatch(event_id, shard_no, field, stored, value))
+                if fix:
+                    setattr(row, field, value)
+                    row.version += 1
+                    changed(db, event_id)
+    return mismatches
+
+
+def check_capacity(db: Session, event_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, int, int]]:
+    """Return ``(event_id, capacity, accounted)`` for events that do not add up."""
+    query = db.query(Event)
+    if event_ids is not None:
+        query = query.filter(Event.id.in_(list(event_ids)))
+    broken = []
+    for event in query:
+        totals = event_totals(db, event)
+        accounted = totals.available + totals.hold_count + totals.confirmed_count
+        if accounted != event.capacity:
+            broken.append((event.id, event.capacity, accounted))
+    return broken
+
+
+def main(argv=None):
+    from app.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Check event hold/confirmed counters against reservations")
+    parser.add_argument("--fix", action="store_true", help="rewrite drifted counters")
+    parser.add_argument("--event", type=int, action="append", dest="event_ids", help="limit to these event ids")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        mismatches = check_event_counters(db, args.event_ids, fix=args.fix)
+        for m in mismatches:
+            where = f"event {m.event_id}" + (f" shard {m.shard_no}" if m.shard_no is not None else "")
+            print(f"{where}: {m.field} stored={m.stored} actual={m.actual}")
+        if args.fix:
+            db.commit()
+        for event_id, capacity, accounted in check_capacity(db, args.event_ids):
+            print(f"event {event_id}: capacity={capacity} but available+hold+confirmed={accounted}")
+        print(f"{len(mismatches)} counter mismatch(es){' fixed' if args.fix and mismatches else ''}")
+        return 1 if mismatches and not args.fix else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
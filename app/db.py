@@ -1,11 +1,80 @@
-from sqlalchemy import create_engine
+import math
+import threading
+import time
+from typing import Dict, Optional
+import greenlet
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.util import await_only
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
 from app.config import settings
+from app.metrics import POOL_CHECKOUT_WAIT
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited (pool_logging_name = label)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, self.logging_name or "primary")
+
+
+# Checkout counters per engine, read by pool_stats()
+_pool_counters: Dict[int, Dict[str, int]] = {}
+_pool_counters_lock = threading.Lock()
+
+
+def make_engine(url: str, pool_size: int, max_overflow: int, name: str = "primary", **engine_kwargs):
+    """Engine with a sized, tracked connection pool."""
+    engine_kwargs.setdefault("pool_pre_ping", True)
+    # SQLite picks its own pool class, which takes no sizing arguments
+    if not url.startswith("sqlite") or issubclass(engine_kwargs.get("poolclass", type), QueuePool):
+        engine_kwargs.setdefault("poolclass", TimedQueuePool)
+        engine_kwargs.setdefault("pool_logging_name", name)
+        engine_kwargs.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=settings.DB_POOL_TIMEOUT)
+    new_engine = create_engine(url, **engine_kwargs)
+    if isinstance(new_engine.pool, QueuePool):
+        _track_pool(new_engine)
+    return new_engine
+
+
+def _track_pool(tracked):
+    counters = _pool_counters.setdefault(id(tracked), {"checkouts": 0, "peak_checked_out": 0, "saturated_checkouts": 0})
+    capacity = tracked.pool.size() + max(tracked.pool._max_overflow, 0)
+
+    @event.listens_for(tracked, "checkout")
+    def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out = tracked.pool.checkedout()
+        with _pool_counters_lock:
+            counters["checkouts"] += 1
+            counters["peak_checked_out"] = max(counters["peak_checked_out"], checked_out)
+            if checked_out >= capacity:
+                # The next request has to wait for a connection (or time out)
+                counters["saturated_checkouts"] += 1
+
+
+engine = make_engine(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# --- Read replica (READ_DATABASE_URL) ---
+# Without a replica ReadSessionLocal is None and every read uses SessionLocal.
+if settings.READ_DATABASE_URL:
+    read_engine = make_engine(settings.READ_DATABASE_URL, settings.READ_DB_POOL_SIZE, settings.READ_DB_MAX_OVERFLOW,
+                              name="replica")
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+else:
+    read_engine = engine
+    ReadSessionLocal = None
+
+# Set on successful writes; while it is in the future reads go to the primary
+READ_PRIMARY_COOKIE = "proxan_read_primary_until"
+
 
 def get_db():
     db = SessionLocal()
@@ -13,3 +82,126 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def reads_primary(request: Request) -> bool:
+    """True while the client is inside its read-your-writes window."""
+    until = request.cookies.get(READ_PRIMARY_COOKIE)
+    try:
+        return until is not None and float(until) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: the replica, or the primary right after a write."""
+    # Module globals are looked up per call so tests can swap either factory
+    factory = SessionLocal if ReadSessionLocal is None or reads_primary(request) else ReadSessionLocal
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ReadYourWritesMiddleware:
+    """Marks clients that just wrote so their next reads skip the replica.
+
+    Plain ASGI (no BaseHTTPMiddleware) so streaming responses and the hot
+    path pay for one header append on successful non-GET requests only.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        window = settings.READ_YOUR_WRITES_SECONDS
+        if (scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS")
+                or window <= 0 or ReadSessionLocal is None):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (f"{READ_PRIMARY_COOKIE}={time.time() + window:.3f}; Max-Age={math.ceil(window)}; "
+                          "Path=/; HttpOnly; SameSite=Lax")
+                MutableHeaders(scope=message).append("set-cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def pool_stats() -> dict:
+    """Connection pool usage of the primary and (if separate) the replica engine."""
+    stats = {"primary": engine_pool_stats(engine)}
+    if read_engine is not engine:
+        stats["replica"] = engine_pool_stats(read_engine)
+    return stats
+
+
+def engine_pool_stats(stats_engine) -> dict:
+    pool = stats_engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        stats.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            saturation=round(pool.checkedout() / capacity, 3) if capacity else None,
+        )
+        with _pool_counters_lock:
+            stats.update(_pool_counters.get(id(stats_engine), {}))
+    return stats
+
+
+# --- Async engine (ASYNC_ENDPOINTS) ---
+# Created lazily so the sync app, the tests and the Celery worker never need
+# an async driver installed.
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+async_engine = None
+AsyncSessionLocal = None
+
+
+def async_database_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def init_async_engine(url: Optional[str] = None, **engine_kwargs):
+    global async_engine, AsyncSessionLocal
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    url = url or settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+    engine_kwargs.setdefault("pool_pre_ping", True)
+    async_engine = create_async_engine(url, **engine_kwargs)
+    # expire_on_commit=False: attributes must stay readable outside the greenlet
+    AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    return async_engine
+
+
+def off_loop(fn, *args, **kwargs):
+    """Call blocking ``fn``; inside ``AsyncSession.run_sync`` it runs in a worker thread.
+
+    ``run_sync`` runs the sync hold path on the event loop thread (in a
+    greenlet), so a Redis or broker round trip there would stall every
+    request. From that greenlet the call is awaited in the threadpool;
+    anywhere else it is a plain call.
+    """
+    if getattr(greenlet.getcurrent(), "driver", None) is None:
+        return fn(*args, **kwargs)
+    return await_only(run_in_threadpool(fn, *args, **kwargs))
+
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        init_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
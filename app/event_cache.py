@@ -0,0 +1,143 @@
+"""Event version stamps and the short-TTL event detail cache.
+
+Every change to an event's capacity or counters bumps ``version`` on the row
+it touches: the event row, or a capacity shard for sharded holds, so the hot
+path still never writes the event row. An event's version is the event
+row's plus the sum of its shards' versions; every part only grows, so any
+change yields a new value.
+
+``GET /events/{id}`` answers with a strong ``ETag`` built from it and keeps
+the payload here for at most ``EVENT_CACHE_TTL_SECONDS``. Code that changes
+an event calls ``changed(db, event_id)``; after the commit the entry is
+dropped locally and an invalidation is published to the other workers via
+``app.pubsub``. A lost message or a write that bypasses ``changed`` is
+therefore stale for at most the TTL. Misses are loaded from the primary,
+not the read replica, so replica lag does not add to that bound.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.pubsub import get_broadcaster
+
+INVALIDATION_CHANNEL = "proxan:events:invalidate"
+
+Entry = Tuple[int, dict]  # (version, payload)
+
+
+def etag(event_id: int, version: int) -> str:
+    return f'"{event_id}-{version}"'
+
+
+class EventDetailCache:
+    """Bounded LRU of ``event_id -> (version, payload)`` with a TTL."""
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[int, Tuple[float, Entry]]" = OrderedDict()
+        # Bumped on invalidation so a load that raced with a write is not stored
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, event_id: int) -> Optional[Entry]:
+        with self._lock:
+            item = self._entries.get(event_id)
+            if item is None:
+                return None
+            deadline, entry = item
+            if deadline <= self.clock():
+                del self._entries[event_id]
+                return None
+            self._entries.move_to_end(event_id)
+            return entry
+
+    def generation(self, event_id: int) -> int:
+        with self._lock:
+            return self._generations.get(event_id, 0)
+
+    def put(self, event_id: int, entry: Entry, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(event_id, 0) != generation:
+                return
+            self._entries[event_id] = (self.clock() + self.ttl, entry)
+            self._entries.move_to_end(event_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, event_id: int) -> None:
+        with self._lock:
+            self._entries.pop(event_id, None)
+            self._generations[event_id] = self._generations.get(event_id, 0) + 1
+            if len(self._generations) > self.maxsize * 4:
+                # Only in-flight loads compare generations; old ones can go
+                self._generations = {k: v for k, v in self._generations.items() if k in self._entries}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[EventDetailCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_event_cache() -> Optional[EventDetailCache]:
+    """The process-wide cache, or None when ``EVENT_CACHE_TTL_SECONDS`` is 0."""
+    global _cache
+    if settings.EVENT_CACHE_TTL_SECONDS <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = EventDetailCache(settings.EVENT_CACHE_SIZE, settings.EVENT_CACHE_TTL_SECONDS)
+                get_broadcaster().subscribe(INVALIDATION_CHANNEL, lambda message: cache.invalidate(int(message)))
+                _cache = cache
+    return _cache
+
+
+def cached_detail(event_id: int, load: Callable[[], Entry]) -> Entry:
+    """``(version, payload)`` from the cache, or from ``load()`` on a miss."""
+    cache = get_event_cache()
+    if cache is None:
+        return load()
+    entry = cache.get(event_id)
+    if entry is None:
+        generation = cache.generation(event_id)
+        entry = load()
+        cache.put(event_id, entry, generation)
+    return entry
+
+
+def changed(db: Session, event_id: int) -> None:
+    """Record that this transaction changes ``event_id``; invalidated on commit."""
+    db.info.setdefault("changed_events", set()).add(event_id)
+
+
+def invalidate_events(event_ids) -> None:
+    for event_id in event_ids:
+        if _cache is not None:
+            _cache.invalidate(event_id)
+        get_broadcaster().publish(INVALIDATION_CHANNEL, str(event_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_events(session):
+    event_ids = session.info.pop("changed_events", None)
+    if event_ids:
+        invalidate_events(sorted(event_ids))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changed_events(session, previous_transaction):
+    session.info.pop("changed_events", None)
@@ -0,0 +1,121 @@
+"""Password hashing off the request threads.
+
+pbkdf2 burns CPU for the whole hash and holds the GIL while doing it, so a
+burst of logins inline in the web process slows every other request down,
+holds included. With ``PASSWORD_HASH_WORKERS > 0`` hashing and verification
+run in a dedicated process pool instead; the request thread only waits on a
+future.
+
+The pool accepts at most ``PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE`` jobs
+at a time. Past that, callers get a 503 with ``Retry-After`` immediately
+rather than queueing behind minutes of CPU work.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from passlib.context import CryptContext
+
+from app.config import settings
+
+
+@lru_cache(maxsize=None)
+def crypt_context(rounds: int) -> CryptContext:
+    # pbkdf2_sha256 for portability (no native bcrypt needed); min_rounds
+    # makes verify_and_update flag weaker (older) hashes for a rehash
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=rounds,
+    )
+
+
+# --- Havuzda çalışan fonksiyonlar (picklable, modül seviyesinde) ---
+def _hash(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return crypt_context(rounds).verify_and_update(password, hashed)
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_lock = threading.Lock()
+
+
+def _pool() -> Optional[ProcessPoolExecutor]:
+    global _executor, _slots
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE)
+                # spawn: forking a process that already runs threads is unsafe
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def _submit(fn, *args) -> Future:
+    """Run ``fn`` in the pool, or inline when the pool is disabled."""
+    executor = _pool()
+    if executor is None:
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def hash_password(password: str) -> str:
+    return _submit(_hash, password, settings.PASSWORD_HASH_ROUNDS).result()
+
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """``(valid, new_hash)``; ``new_hash`` is set when the stored hash is outdated."""
+    return _submit(_verify_and_update, password, hashed, settings.PASSWORD_HASH_ROUNDS).result()
+
+
+async def _submit_async(fn, *args):
+    if _pool() is None:
+        # Havuz kapalıyken bile event loop'u bloklama
+        return await run_in_threadpool(fn, *args)
+    return await asyncio.wrap_future(_submit(fn, *args))
+
+
+async def hash_password_async(password: str) -> str:
+    return await _submit_async(_hash, password, settings.PASSWORD_HASH_ROUNDS)
+
+
+async def verify_and_update_async(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _submit_async(_verify_and_update, password, hashed, settings.PASSWORD_HASH_ROUNDS)
+
+
+def shutdown() -> None:
+    global _executor, _slots
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor, _slots = None, None
@@ -0,0 +1,411 @@
+"""Hold strategies.
+
+``row_lock``
+    The original flow: ``SELECT ... FOR UPDATE`` on the event row, check the
+    capacity in Python, decrement, insert, commit and refresh.
+
+``conditional_update``
+    One guarded ``UPDATE events SET available_capacity = available_capacity - :seats,
+    hold_count = hold_count + :seats WHERE id = :id AND is_active AND
+    available_capacity >= :seats`` decides the hold.
+    The reservation is inserted in the same transaction and returned without
+    a refresh. The row lock is held only for the UPDATE and the INSERT, and
+    the error cases cost one extra SELECT on the failure path only.
+
+The strategy is picked with ``Settings.HOLD_STRATEGY`` so both can be
+compared under the same load. Both take ``seats`` for multi-seat holds;
+``create_holds`` holds several events in one all-or-nothing transaction and
+``confirm_hold`` completes the lifecycle. With a waiting room configured
+(``app.waiting_room``) a sold-out ``create_hold`` queues instead of failing
+and ``admit_waiting`` turns the queue into holds as seats come back.
+
+Everything here is plain sync SQLAlchemy so it can run on a request thread,
+in the Celery worker, or inside ``AsyncSession.run_sync`` on the async path.
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app import outbox
+from app.capacity_gate import get_capacity_gate
+from app.config import settings
+from app.event_cache import changed
+from app.inventory import confirm_seats, take_from_shard
+from app.metrics import (
+    CONFIRM_OUTCOME_BY_DETAIL, CONFIRM_OUTCOMES, HOLD_LOCK_WAIT, HOLD_OUTCOME_BY_DETAIL, HOLD_OUTCOMES,
+    count_outcomes,
+)
+from app.models import Event, Reservation, ReservationState
+from app.tasks import schedule_expiry
+from app.waiting_room import Queued, get_waiting_room
+
+HOLD_DURATION = timedelta(minutes=5)
+# Tickets granted per event per locked transaction in admit_waiting
+ADMIT_BATCH_SIZE = 500
+
+
+def _event_not_found():
+    return HTTPException(status_code=404, detail="Event not found")
+
+
+def _event_inactive():
+    return HTTPException(status_code=400, detail="Event is not active")
+
+
+def _no_capacity():
+    return HTTPException(status_code=400, detail="No capacity")
+
+
+def _check_seats(seats: int) -> None:
+    if seats < 1:
+        raise HTTPException(status_code=400, detail="Quantity must be at least 1")
+    if seats > settings.MAX_SEATS_PER_HOLD:
+        raise HTTPException(status_code=400, detail="Too many seats")
+
+
+def _new_hold(user_id: int, event_id: int, shard_no: Optional[int] = None, seats: int = 1) -> Reservation:
+    now = datetime.utcnow()
+    return Reservation(
+        user_id=user_id,
+        event_id=event_id,
+        quantity=seats,
+        state=ReservationState.HOLD,
+        expires_at=now + HOLD_DURATION,
+        created_at=now,
+        shard_no=shard_no,
+    )
+
+
+def hold_with_row_lock(db: Session, event_id: int, user_id: int, seats: int = 1):
+    """Returns ``(reservation, remaining)``; remaining is None for sharded events."""
+    event_query = db.query(Event).filter(Event.id == event_id)
+    if settings.SHARDED_INVENTORY:
+        # Sharded events must not lock the event row; only single-row ones do
+        event = event_query.first()
+        if event and not event.capacity_shards:
+            with HOLD_LOCK_WAIT.time("row_lock"):
+                event = event_query.with_for_update().populate_existing().first()
+    else:
+        # Transactional - lock event row
+        with HOLD_LOCK_WAIT.time("row_lock"):
+            event = event_query.with_for_update().first()
+
+    if not event:
+        raise _event_not_found()
+    if not event.is_active:
+        raise _event_inactive()
+
+    shard_no = remaining = None
+    if event.capacity_shards:
+        shard_no = take_from_shard(db, event.id, seats)
+        if shard_no is None:
+            raise _no_capacity()
+    else:
+        if event.available_capacity < seats:
+            raise _no_capacity()
+        # Kapasite düşür ve hold oluştur
+        event.available_capacity -= seats
+        event.hold_count += seats
+        event.version += 1
+        changed(db, event.id)
+        remaining = event.available_capacity
+
+    reservation = _new_hold(user_id, event.id, shard_no, seats)
+    db.add(reservation)
+    outbox.add(db, outbox.HELD, reservation)
+    db.commit()
+    db.refresh(reservation)
+    return reservation, remaining
+
+
+def hold_with_conditional_update(db: Session, event_id: int, user_id: int, seats: int = 1):
+    """Returns ``(reservation, remaining)``; remaining is None when unknown."""
+    statement = (
+        update(Event)
+        .where(
+            Event.id == event_id,
+            Event.is_active.is_(True),
+            Event.available_capacity >= seats,
+            Event.capacity_shards == 0,
+        )
+        .values(
+            available_capacity=Event.available_capacity - seats,
+            hold_count=Event.hold_count + seats,
+            version=Event.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    returning = getattr(db.get_bind().dialect, "full_returning", False)
+    if returning:
+        statement = statement.returning(Event.available_capacity)
+    with HOLD_LOCK_WAIT.time("conditional_update"):
+        result = db.execute(statement)
+    remaining = shard_no = None
+    if returning:
+        row = result.first()
+        won = row is not None
+        remaining = row[0] if won else None
+    else:
+        won = result.rowcount == 1
+
+    if won:
+        changed(db, event_id)
+    else:
+        # Only the losing path pays for a second statement to explain why
+        event = db.query(Event.is_active, Event.capacity_shards).filter(Event.id == event_id).first()
+        if not event:
+            raise _event_not_found()
+        if not event.is_active:
+            raise _event_inactive()
+        if not event.capacity_shards:
+            raise _no_capacity()
+        shard_no = take_from_shard(db, event_id, seats)
+        if shard_no is None:
+            raise _no_capacity()
+
+    reservation = _new_hold(user_id, event_id, shard_no, seats)
+    db.add(reservation)
+    outbox.add(db, outbox.HELD, reservation)
+    db.flush()
+    # Detach before commit so the caller can read it without a reload
+    db.expunge(reservation)
+    db.commit()
+    return reservation, remaining
+
+
+STRATEGIES = {
+    "row_lock": hold_with_row_lock,
+    "conditional_update": hold_with_conditional_update,
+}
+
+
+_count_holds = count_outcomes(HOLD_OUTCOMES, HOLD_OUTCOME_BY_DETAIL, others={Queued: "queued"})
+
+
+@_count_holds
+def create_hold(db: Session, event_id: int, user_id: int, strategy: Optional[str] = None,
+                seats: int = 1) -> Reservation:
+    """Run one hold through the admission gate and the configured strategy."""
+    hold = STRATEGIES[strategy or settings.HOLD_STRATEGY]
+    _check_seats(seats)
+
+    # Waiting room: while an event has a queue, nobody skips it by retrying
+    room = get_waiting_room()
+    if room:
+        ticket = room.find(event_id, user_id)
+        if ticket is None and room.waiting(event_id):
+            ticket = room.join(event_id, user_id, seats)
+        if ticket is not None:
+            raise Queued(ticket)
+
+    # Admission gate: sold-out events are rejected before touching the DB
+    gate = get_capacity_gate()
+    admitted = gate.reserve(event_id, seats) if gate else None
+    if admitted is False:
+        if room:
+            raise Queued(room.join(event_id, user_id, seats))
+        raise _no_capacity()
+
+    try:
+        reservation, remaining = hold(db, event_id, user_id, seats)
+    except HTTPException as exc:
+        # Release the event row lock now, not when the session is torn down
+        # after the response (that needs a free threadpool worker)
+        db.rollback()
+        # Give the seat back rather than zeroing the counter: a sweep may have
+        # freed seats and reconciled the gate since the DB said "No capacity",
+        # and a late set(0) would turn that into a lasting false sold-out
+        if admitted:
+            gate.release(event_id, seats)
+        if room and exc.detail == "No capacity":
+            raise Queued(room.join(event_id, user_id, seats)) from exc
+        raise
+    except Exception:
+        db.rollback()
+        if admitted:
+            gate.release(event_id, seats)
+        raise
+
+    if gate and admitted is None and remaining is not None:
+        gate.prime(event_id, remaining)
+    if settings.EXPIRY_SCHEDULER == "celery":
+        schedule_expiry(reservation.id, reservation.expires_at)
+    return reservation
+
+
+@_count_holds
+def create_holds(db: Session, items: Iterable[Tuple[int, int]], user_id: int) -> List[Reservation]:
+    """Hold ``(event_id, seats)`` pairs in one transaction, all or nothing.
+
+    Event rows are locked in id order (then shards in shard_no order), so two
+    overlapping batches queue instead of deadlocking. Repeated events are
+    merged into one reservation.
+    """
+    wanted = Counter()
+    for event_id, seats in items:
+        _check_seats(seats)
+        wanted[event_id] += seats
+    order = sorted(wanted)
+    for event_id in order:
+        _check_seats(wanted[event_id])
+
+    gate = get_capacity_gate()
+    admitted = []
+    try:
+        if gate:
+            for event_id in order:
+                verdict = gate.reserve(event_id, wanted[event_id])
+                if verdict is False:
+                    raise _no_capacity()
+                if verdict:
+                    admitted.append(event_id)
+
+        events = {
+            event.id: event
+            for event in db.query(Event).filter(Event.id.in_(order)).order_by(Event.id).with_for_update()
+        }
+        reservations = []
+        for event_id in order:
+            event, seats, shard_no = events.get(event_id), wanted[event_id], None
+            if not event:
+                raise _event_not_found()
+            if not event.is_active:
+                raise _event_inactive()
+            if event.capacity_shards:
+                shard_no = take_from_shard(db, event_id, seats)
+                if shard_no is None:
+                    raise _no_capacity()
+            else:
+                if event.available_capacity < seats:
+                    raise _no_capacity()
+                event.available_capacity -= seats
+                event.hold_count += seats
+                event.version += 1
+                changed(db, event_id)
+            reservations.append(_new_hold(user_id, event_id, shard_no, seats))
+
+        db.add_all(reservations)
+        outbox.add(db, outbox.HELD, *reservations)
+        db.flush()
+        for reservation in reservations:
+            db.expunge(reservation)
+        db.commit()
+    except Exception:
+        db.rollback()
+        for event_id in admitted:
+            gate.release(event_id, wanted[event_id])
+        raise
+
+    if settings.EXPIRY_SCHEDULER == "celery":
+        for reservation in reservations:
+            schedule_expiry(reservation.id, reservation.expires_at)
+    return reservations
+
+
+def admit_waiting(db: Session, event_ids: Optional[Iterable[int]] = None) -> Counter:
+    """Grant waiting-room tickets, oldest first, as far as capacity goes.
+
+    Called by the expiry sweep after it released seats. Each batch is one
+    transaction that locks the event row once (shards for sharded events)
+    however many tickets it grants. The queue is strict FIFO: a ticket that
+    does not fit blocks the ones behind it. Returns grants per event.
+    """
+    granted = Counter()
+    room = get_waiting_room()
+    if room is None:
+        return granted
+    for event_id in sorted(room.events() if event_ids is None else set(event_ids)):
+        while True:
+            count = _admit_batch(db, room, event_id)
+            granted[event_id] += count
+            if count < ADMIT_BATCH_SIZE:
+                break
+    return +granted
+
+
+def _admit_batch(db: Session, room, event_id: int) -> int:
+    tickets = room.head(event_id, ADMIT_BATCH_SIZE)
+    if not tickets:
+        return 0
+    try:
+        event_query = db.query(Event).filter(Event.id == event_id)
+        event = event_query.first()
+        if event and not event.capacity_shards:
+            event = event_query.with_for_update().populate_existing().first()
+        if not event or not event.is_active:
+            # Nothing to wait for any more
+            db.rollback()
+            room.close(event_id)
+            return 0
+
+        granted = []
+        for ticket in tickets:
+            shard_no = None
+            if event.capacity_shards:
+                shard_no = take_from_shard(db, event_id, ticket.seats)
+                if shard_no is None:
+                    break
+            else:
+                if event.available_capacity < ticket.seats:
+                    break
+                event.available_capacity -= ticket.seats
+                event.hold_count += ticket.seats
+                event.version += 1
+                changed(db, event_id)
+            granted.append((ticket, _new_hold(ticket.user_id, event_id, shard_no, ticket.seats)))
+        if not granted:
+            db.rollback()
+            return 0
+
+        db.add_all([reservation for _, reservation in granted])
+        outbox.add(db, outbox.HELD, *[reservation for _, reservation in granted])
+        db.flush()
+        for _, reservation in granted:
+            db.expunge(reservation)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    for ticket, reservation in granted:
+        room.grant(ticket.id, reservation.id)
+        if settings.EXPIRY_SCHEDULER == "celery":
+            schedule_expiry(reservation.id, reservation.expires_at)
+    return len(granted)
+
+
+@count_outcomes(CONFIRM_OUTCOMES, CONFIRM_OUTCOME_BY_DETAIL, success="confirmed")
+def confirm_hold(db: Session, reservation_id: int, user_id: int) -> Reservation:
+    # Lock the hold before checking it: the sweep's SKIP LOCKED then leaves
+    # it alone, and both paths take the reservation before the counter row
+    reservation = db.query(Reservation).filter(
+        Reservation.id == reservation_id,
+        Reservation.user_id == user_id
+    ).with_for_update().first()
+
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+
+    # --- Kritik Güncelleme: Süre Kontrolü ---
+    expires_at = reservation.expires_at
+    if expires_at.tzinfo is not None:
+        # Postgres hands timestamptz back aware; utcnow() is naive UTC
+        expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if expires_at < datetime.utcnow():
+        raise HTTPException(status_code=400, detail="Reservation expired")
+    # ---------------------------------------
+
+    if reservation.state != ReservationState.HOLD:
+        raise HTTPException(status_code=400, detail="Reservation not in HOLD state")
+
+    # Durumu GÜNCELLE
+    reservation.state = ReservationState.CONFIRMED
+    confirm_seats(db, reservation.event_id, reservation.shard_no, reservation.quantity)
+    outbox.add(db, outbox.CONFIRMED, reservation)
+    db.commit()
+    db.refresh(reservation)
+    return reservation
@@ -0,0 +1,233 @@
+"""``Idempotency-Key`` support for the hold and confirm endpoints.
+
+A request that carries the header first claims ``(user_id, key)`` by
+inserting a pending row into ``idempotency_keys``; the unique constraint
+decides the winner. The winner runs the transaction and stores the rendered
+response on the row. Anyone else with the same key either gets that stored
+response back byte for byte (``Idempotent-Replayed: true``) without running
+anything, or, while the first attempt is still running, gets 409 with
+``Retry-After``. Sync endpoints answer 409 at once rather than hold a
+threadpool worker; async ones poll the row for up to
+``IDEMPOTENCY_WAIT_SECONDS`` first.
+
+The transaction that does the work also stamps ``committed_at`` on the claim
+(a ``before_commit`` hook, like ``outbox.add``). The response is stored right
+after; if that write is lost, the claim still says the work happened and is
+never run again, even after the pending timeout.
+
+Only successful responses are stored. If the attempt fails (no capacity, a
+404, queued in the waiting room, a crash) the claim is deleted, so a retry
+runs again instead of replaying an error. A pending row older than
+``IDEMPOTENCY_PENDING_TIMEOUT_SECONDS`` whose work never committed belongs
+to a worker that died and may be taken over. Rows live for
+``IDEMPOTENCY_TTL_SECONDS`` and are purged by ``purge_expired_keys``.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional, Type
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy import delete, event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import serializers
+from app.config import settings
+from app.db import SessionLocal
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+KEY_MAX_LENGTH = 255
+# How often a duplicate re-reads the row of the attempt it waits for
+POLL_INTERVAL = 0.05
+
+_OWNED = object()
+# The claim was deleted (expired, abandoned or released): claim again
+_RETRY = object()
+
+
+def key_of(request: Optional[Request]) -> Optional[str]:
+    # Read from the request rather than a Header() parameter so the endpoint
+    # functions stay callable directly (tests, scripts) without one
+    return request.headers.get(HEADER) if request is not None else None
+
+
+def fingerprint(request: Request, body: Optional[BaseModel] = None) -> str:
+    """Hash of what the key stands for: method, path and (canonical) body."""
+    payload = f"{request.method} {request.url.path}\n"
+    if body is not None:
+        payload += body.json(sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _check_key(key: str) -> None:
+    if not key or len(key) > KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+
+
+def _claim(db: Session, user_id: int, key: str, request_hash: str):
+    """``_OWNED``, the stored row to replay, ``_RETRY``, or None (someone else is running)."""
+    now = datetime.utcnow()
+    db.add(IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        fingerprint=request_hash,
+        created_at=now,
+        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+    ))
+    try:
+        db.commit()
+        return _OWNED
+    except IntegrityError:
+        db.rollback()
+
+    # Compared in SQL: the driver may hand back aware or naive datetimes
+    stale_before = now - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+    existing = (
+        db.query(
+            IdempotencyKey.id,
+            IdempotencyKey.fingerprint,
+            IdempotencyKey.status_code,
+            IdempotencyKey.response_body,
+            (IdempotencyKey.expires_at <= now).label("expired"),
+            (IdempotencyKey.status_code.is_(None) & (IdempotencyKey.created_at <= stale_before)).label("stale"),
+            IdempotencyKey.committed_at,
+        )
+        .filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .first()
+    )
+    # End the read so the next poll sees the other attempt's commit
+    db.rollback()
+    if existing is None:
+        return _RETRY  # released in the meantime
+    if existing.expired or (existing.stale and existing.committed_at is None):
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == existing.id))
+        db.commit()
+        return _RETRY
+    if existing.fingerprint != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was used with a different request")
+    if existing.stale:
+        # The work committed but its response was never stored; running it
+        # again would take the seats twice
+        raise HTTPException(status_code=409, detail="Request with this Idempotency-Key was already processed")
+    return existing if existing.status_code is not None else None
+
+
+@event.listens_for(Session, "before_commit")
+def _mark_committed(session):
+    claim = session.info.pop("idempotency", None)
+    if claim is not None:
+        user_id, key = claim
+        session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .values(committed_at=datetime.utcnow())
+        )
+
+
+def _release(db: Session, user_id: int, key: str) -> None:
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key))
+    db.commit()
+
+
+def _execute(db: Session, user_id: int, key: str, action: Callable[[Session], Any],
+             response_model: Type[BaseModel]) -> Response:
+    # The first commit inside ``action`` marks the claim (see _mark_committed)
+    db.info["idempotency"] = (user_id, key)
+    try:
+        result = action(db)
+    except BaseException:
+        db.info.pop("idempotency", None)
+        db.rollback()
+        _release(db, user_id, key)
+        raise
+    response = serializers.respond(response_model, result)
+    try:
+        db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .values(status_code=response.status_code, response_body=response.body.decode())
+        )
+        db.commit()
+    except Exception:
+        # The work and committed_at are in; retries get 409, never a second run
+        logger.exception("Could not store idempotent response for key %r", key)
+        db.rollback()
+    return response
+
+
+def _replay(stored) -> Response:
+    return Response(
+        content=stored.response_body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _in_progress():
+    return HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is still in progress",
+        headers={"Retry-After": "1"},
+    )
+
+
+def run(db: Session, user_id: int, request: Optional[Request], body: Optional[BaseModel],
+        action: Callable[[Session], Any], response_model: Type[BaseModel]):
+    """Run ``action(db)`` at most once per ``(user_id, key)``; no key, no bookkeeping."""
+    key = key_of(request)
+    if key is None:
+        return action(db)
+    _check_key(key)
+    request_hash = fingerprint(request, body)
+    while True:
+        outcome = _claim(db, user_id, key, request_hash)
+        if outcome is _OWNED:
+            return _execute(db, user_id, key, action, response_model)
+        if outcome is None:
+            # Waiting here would pin a threadpool worker per duplicate
+            raise _in_progress()
+        if outcome is not _RETRY:
+            return _replay(outcome)
+
+
+async def run_async(session: AsyncSession, user_id: int, request: Optional[Request], body: Optional[BaseModel],
+                    action: Callable[[Session], Any], response_model: Type[BaseModel]):
+    """``run`` for the async endpoints; waiting does not block the event loop."""
+    key = key_of(request)
+    if key is None:
+        return await session.run_sync(action)
+    _check_key(key)
+    request_hash = fingerprint(request, body)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        outcome = await session.run_sync(_claim, user_id, key, request_hash)
+        if outcome is _OWNED:
+            return await session.run_sync(_execute, user_id, key, action, response_model)
+        if outcome is _RETRY:
+            continue
+        if outcome is not None:
+            return _replay(outcome)
+        if time.monotonic() >= deadline:
+            raise _in_progress()
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+def purge_expired_keys(db_session: Session = None) -> int:
+    db = db_session or SessionLocal()
+    try:
+        result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow()))
+        db.commit()
+        return result.rowcount
+    finally:
+        if db_session is None:
+            db.close()
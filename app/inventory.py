@@ -0,0 +1,273 @@
+"""Sharded capacity inventory.
+
+For a popular event every hold and every expiry lands on the same
+``events`` row lock. An event can opt in to sharding, which splits its
+remaining capacity across ``Event.capacity_shards`` rows in
+``event_capacity_shards``. A hold then locks one random shard that still has
+stock, so concurrent holds on the same event mostly touch different rows.
+
+The event row and its shards are additive: an event's available capacity and
+its hold/confirmed counters are the event row's values plus the sum over its
+shards. A reservation records the shard it came from and every later change
+(confirm, expiry) goes to that same row; reservations without a shard keep
+using the event row. ``rebalance`` moves any stock left on the event row
+back into the shards.
+"""
+import random
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.event_cache import changed
+from app.models import Event, EventCapacityShard, Reservation
+
+
+class Totals(NamedTuple):
+    available: int
+    hold_count: int
+    confirmed_count: int
+    version: int = 0
+
+
+def _split(total: int, shards: int) -> List[int]:
+    base, extra = divmod(total, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def set_shard_count(db: Session, event_id: int, shards: int) -> Event:
+    """(Re)shard an event, or fold it back into a single row with ``shards=0``.
+
+    Locks the event row and all of its shards, so it must not be called on
+    the hot path. The caller commits.
+    """
+    if shards < 0:
+        raise HTTPException(status_code=400, detail="Shard count must be >= 0")
+    event = db.query(Event).filter(Event.id == event_id).with_for_update().first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    # Fold everything into the event row first ...
+    for shard in _lock_shards(db, event.id):
+        event.available_capacity += shard.available_capacity
+        event.hold_count += shard.hold_count
+        event.confirmed_count += shard.confirmed_count
+        # Shard versions fold in too, so the event's version never goes back
+        event.version += shard.version
+        db.delete(shard)
+    db.query(Reservation).filter(Reservation.event_id == event.id, Reservation.shard_no.isnot(None)).update(
+        {"shard_no": None}, synchronize_session=False
+    )
+    db.flush()
+
+    # ... then move the remaining stock out to the new shards
+    event.capacity_shards = shards
+    event.version += 1
+    changed(db, event.id)
+    if shards:
+        db.add_all([
+            EventCapacityShard(event_id=event.id, shard_no=i, available_capacity=amount, hold_count=0, confirmed_count=0)
+            for i, amount in enumerate(_split(event.available_capacity, shards))
+        ])
+        event.available_capacity = 0
+    return event
+
+
+def rebalance(db: Session, event_id: int) -> List[int]:
+    """Spread an event's remaining capacity evenly over its shards.
+
+    Holds drain shards unevenly and expiries refill the row a seat came
+    from, so a sale can end up with stock concentrated on a few rows or left
+    on the event row. The caller commits.
+    """
+    event = db.query(Event).filter(Event.id == event_id).with_for_update().first()
+    shards = _lock_shards(db, event_id)
+    if not event or not shards:
+        return []
+    total = event.available_capacity + sum(s.available_capacity for s in shards)
+    event.available_capacity = 0
+    event.version += 1
+    amounts = _split(total, len(shards))
+    for shard, amount in zip(shards, amounts):
+        shard.available_capacity = amount
+    changed(db, event_id)
+    return amounts
+
+
+def _lock_shards(db: Session, event_id: int) -> List[EventCapacityShard]:
+    # Always lock in shard_no order so concurrent rebalances cannot deadlock
+    return (
+        db.query(EventCapacityShard)
+        .filter(EventCapacityShard.event_id == event_id)
+        .order_by(EventCapacityShard.shard_no)
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+
+
+def _try_take(db: Session, shard_id: int, seats: int) -> bool:
+    # Guarded decrement: safe even where FOR UPDATE is a no-op (SQLite)
+    result = db.execute(
+        update(EventCapacityShard)
+        .where(EventCapacityShard.id == shard_id, EventCapacityShard.available_capacity >= seats)
+        .values(
+            available_capacity=EventCapacityShard.available_capacity - seats,
+            hold_count=EventCapacityShard.hold_count + seats,
+            version=EventCapacityShard.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def take_from_shard(db: Session, event_id: int, seats: int = 1) -> Optional[int]:
+    """Take seats from a random shard with stock and return its shard_no.
+
+    The first attempt skips shards that other transactions have locked; if
+    every shard with stock is busy the hold waits on one of them instead.
+    Multi-seat holds that no single shard can cover move stock between the
+    shards first. Returns None when the shards together cannot cover
+    ``seats``.
+    """
+    with_stock = db.query(EventCapacityShard.id, EventCapacityShard.shard_no).filter(
+        EventCapacityShard.event_id == event_id,
+        EventCapacityShard.available_capacity >= seats,
+    )
+    candidate = with_stock.order_by(func.random()).limit(1).with_for_update(skip_locked=True).first()
+    if candidate and _try_take(db, candidate.id, seats):
+        changed(db, event_id)
+        return candidate.shard_no
+
+    # Fallback: walk the other shards; each guarded UPDATE waits on one row only
+    others = with_stock.all()
+    random.shuffle(others)
+    for shard_id, shard_no in others:
+        if _try_take(db, shard_id, seats):
+            changed(db, event_id)
+            return shard_no
+    if seats > 1:
+        return _take_consolidated(db, event_id, seats)
+    return None
+
+
+def _take_consolidated(db: Session, event_id: int, seats: int) -> Optional[int]:
+    # Multi-seat hold that no single shard covers: lock all shards (in
+    # shard_no order, like rebalance), pull stock into the fullest one and
+    # take from there, so a reservation still maps to exactly one shard
+    shards = _lock_shards(db, event_id)
+    if sum(s.available_capacity for s in shards) < seats:
+        return None
+    target = max(shards, key=lambda s: s.available_capacity)
+    for shard in shards:
+        if shard is target or target.available_capacity >= seats:
+            continue
+        moved = min(shard.available_capacity, seats - target.available_capacity)
+        shard.available_capacity -= moved
+        target.available_capacity += moved
+    target.available_capacity -= seats
+    target.hold_count += seats
+    target.version += 1
+    db.flush()
+    changed(db, event_id)
+    return target.shard_no
+
+
+def _counter_row(event_id: int, shard_no: Optional[int]):
+    if shard_no is None:
+        return Event, update(Event).where(Event.id == event_id)
+    return EventCapacityShard, update(EventCapacityShard).where(
+        EventCapacityShard.event_id == event_id, EventCapacityShard.shard_no == shard_no
+    )
+
+
+def release_hold(db: Session, event_id: int, shard_no: Optional[int], seats: int = 1) -> None:
+    """Give expired hold seats back to the row they were taken from."""
+    model, statement = _counter_row(event_id, shard_no)
+    db.execute(
+        statement.values(
+            available_capacity=model.available_capacity + seats,
+            hold_count=model.hold_count - seats,
+            version=model.version + 1,
+        ).execution_options(synchronize_session=False)
+    )
+    changed(db, event_id)
+
+
+def confirm_seats(db: Session, event_id: int, shard_no: Optional[int], seats: int = 1) -> None:
+    """Move seats from the hold counter to the confirmed counter."""
+    model, statement = _counter_row(event_id, shard_no)
+    db.execute(
+        statement.values(
+            hold_count=model.hold_count - seats,
+            confirmed_count=model.confirmed_count + seats,
+            version=model.version + 1,
+        ).execution_options(synchronize_session=False)
+    )
+    changed(db, event_id)
+
+
+def shard_totals(db: Session, event_ids: Iterable[int]) -> Dict[int, Totals]:
+    event_ids = list(event_ids)
+    if not event_ids:
+        return {}
+    rows = (
+        db.query(
+            EventCapacityShard.event_id,
+            func.sum(EventCapacityShard.available_capacity),
+            func.sum(EventCapacityShard.hold_count),
+            func.sum(EventCapacityShard.confirmed_count),
+            func.sum(EventCapacityShard.version),
+        )
+        .filter(EventCapacityShard.event_id.in_(event_ids))
+        .group_by(EventCapacityShard.event_id)
+    )
+    return {event_id: Totals(int(a or 0), int(h or 0), int(c or 0), int(v or 0)) for event_id, a, h, c, v in rows}
+
+
+def event_totals(db: Session, event: Event) -> Totals:
+    """Available capacity, counters and version for one event, shards included."""
+    totals = Totals(event.available_capacity, event.hold_count, event.confirmed_count, event.version)
+    if not event.capacity_shards:
+        return totals
+    extra = shard_totals(db, [event.id]).get(event.id, Totals(0, 0, 0, 0))
+    return Totals(*(a + b for a, b in zip(totals, extra)))
+
+
+def available_capacity(db: Session, event: Event) -> int:
+    return event_totals(db, event).available
+
+
+def available_capacities(db: Session, event_ids: Optional[Iterable[int]] = None) -> Dict[int, Tuple[int, bool]]:
+    """Return ``{event_id: (available, is_active)}`` with shards summed."""
+    query = db.query(Event.id, Event.available_capacity, Event.is_active, Event.capacity_shards)
+    if event_ids is not None:
+        query = query.filter(Event.id.in_(list(event_ids)))
+    rows = query.all()
+    sums = shard_totals(db, [r.id for r in rows if r.capacity_shards])
+    return {
+        r.id: (r.available_capacity + (sums[r.id].available if r.id in sums else 0), bool(r.is_active))
+        for r in rows
+    }
+
+
+def totals_for(db: Session, event_ids: Iterable[int]) -> Dict[int, Totals]:
+    """``{event_id: Totals}`` for several events in at most two queries."""
+    rows = (
+        db.query(Event.id, Event.available_capacity, Event.hold_count, Event.confirmed_count,
+                 Event.version, Event.capacity_shards)
+        .filter(Event.id.in_(list(event_ids)))
+        .all()
+    )
+    sums = shard_totals(db, [r.id for r in rows if r.capacity_shards])
+    totals = {}
+    for r in rows:
+        extra = sums.get(r.id, Totals(0, 0, 0, 0))
+        totals[r.id] = Totals(
+            r.available_capacity + extra.available,
+            r.hold_count + extra.hold_count,
+            r.confirmed_count + extra.confirmed_count,
+            r.version + extra.version,
+        )
+    return totals
@@ -0,0 +1,302 @@
+"""Leader election for the periodic jobs in ``app.main``.
+
+Every worker process starts the APScheduler ``BackgroundScheduler``, but the
+jobs are wrapped with ``LeaderElector.guard`` and only do work on the
+process that holds the lease. Each process renews or tries to take the lease
+every ``SCHEDULER_HEARTBEAT_SECONDS``. The lease lasts
+``SCHEDULER_LEASE_SECONDS``, so when a leader dies another process takes
+over within one lease plus one heartbeat. A leader that shuts down cleanly
+gives the lease up, and the handover then takes one heartbeat.
+
+A leader whose heartbeat stalls stops running jobs once its own view of the
+lease has run out, before a successor can get it. Lease times come from the
+nodes' clocks, which must agree to well within the lease length.
+
+Backends: ``db`` keeps the lease in a ``scheduler_leases`` row and takes it
+with a conditional UPDATE, so no extra service is needed. ``redis`` uses
+``SET NX PX`` plus a renew script. Both also store each job's last run so
+``GET /health/scheduler`` answers the same on every worker.
+"""
+import functools
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db as db_module
+from app.config import settings
+from app.models import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "scheduler"
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Postgres hands timestamptz back aware; everything here is naive UTC
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def instance_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class Lease:
+    """Interface shared by the database and Redis leases."""
+
+    def acquire(self, holder: str, now: datetime, ttl: timedelta) -> bool:
+        """Take the lease if it is free or expired, or extend it if ``holder`` has it."""
+        raise NotImplementedError
+
+    def release(self, holder: str, now: datetime) -> None:
+        raise NotImplementedError
+
+    def current(self) -> Optional[dict]:
+        """``{"holder", "expires_at", "last_runs"}`` or None if never taken."""
+        raise NotImplementedError
+
+    def record_run(self, holder: str, job: str, run: dict) -> None:
+        raise NotImplementedError
+
+
+class DatabaseLease(Lease):
+    def __init__(self, name: str = LEASE_NAME, session_factory=None):
+        self.name = name
+        # Looked up at call time so tests can swap SessionLocal
+        self.session_factory = session_factory or (lambda: db_module.SessionLocal())
+
+    def acquire(self, holder, now, ttl):
+        db = self.session_factory()
+        try:
+            # Row lock + re-check: of two nodes racing for an expired lease one wins
+            result = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now),
+                )
+                .values(holder=holder, expires_at=now + ttl, renewed_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                db.commit()
+                return True
+            if db.query(SchedulerLease.name).filter(SchedulerLease.name == self.name).first():
+                db.rollback()
+                return False
+            db.add(SchedulerLease(name=self.name, holder=holder, expires_at=now + ttl, renewed_at=now))
+            try:
+                db.commit()
+                return True
+            except IntegrityError:
+                db.rollback()
+                return False
+        finally:
+            db.close()
+
+    def release(self, holder, now):
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == holder)
+                .values(expires_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def current(self):
+        db = self.session_factory()
+        try:
+            row = db.get(SchedulerLease, self.name)
+            if row is None:
+                return None
+            return {
+                "holder": row.holder,
+                "expires_at": _naive_utc(row.expires_at),
+                "last_runs": json.loads(row.last_runs or "{}"),
+            }
+        finally:
+            db.close()
+
+    def record_run(self, holder, job, run):
+        db = self.session_factory()
+        try:
+            row = (
+                db.query(SchedulerLease)
+                .filter(SchedulerLease.name == self.name, SchedulerLease.holder == holder)
+                .with_for_update()
+                .first()
+            )
+            if row is not None:
+                runs = json.loads(row.last_runs or "{}")
+                runs[job] = run
+                row.last_runs = json.dumps(runs, default=str)
+                db.commit()
+        finally:
+            db.close()
+
+
+_RENEW_SCRIPT = """
+local holder = redis.call('GET', KEYS[1])
+if holder == ARGV[1] then
+  redis.call('PEXPIRE', KEYS[1], ARGV[2])
+  return 1
+end
+if not holder then
+  redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+  return 1
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease(Lease):
+    key_prefix = "proxan:leader:"
+
+    def __init__(self, client, name: str = LEASE_NAME):
+        self.client = client
+        self.key = self.key_prefix + name
+        self.runs_key = self.key + ":runs"
+        self._renew = client.register_script(_RENEW_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    def acquire(self, holder, now, ttl):
+        return bool(self._renew(keys=[self.key], args=[holder, int(ttl.total_seconds() * 1000)]))
+
+    def release(self, holder, now):
+        self._release(keys=[self.key], args=[holder])
+
+    def current(self):
+        pipe = self.client.pipeline()
+        pipe.get(self.key)
+        pipe.pttl(self.key)
+        pipe.hgetall(self.runs_key)
+        holder, pttl, runs = pipe.execute()
+        if holder is None and not runs:
+            return None
+        return {
+            "holder": holder.decode() if holder else None,
+            "expires_at": datetime.utcnow() + timedelta(milliseconds=pttl) if holder else None,
+            "last_runs": {job.decode(): json.loads(run) for job, run in runs.items()},
+        }
+
+    def record_run(self, holder, job, run):
+        self.client.hset(self.runs_key, job, json.dumps(run, default=str))
+
+
+class LeaderElector:
+    def __init__(self, lease: Lease, instance: Optional[str] = None, ttl: Optional[float] = None,
+                 clock: Callable[[], datetime] = datetime.utcnow):
+        self.lease = lease
+        self.instance = instance or instance_id()
+        self.ttl = timedelta(seconds=ttl if ttl is not None else settings.SCHEDULER_LEASE_SECONDS)
+        self.clock = clock
+        self._leader_until: Optional[datetime] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader_until is not None and self.clock() < self._leader_until
+
+    def heartbeat(self) -> bool:
+        """Renew or try to take the lease; run every SCHEDULER_HEARTBEAT_SECONDS."""
+        # Measured from before the round trip: our view ends no later than the lease
+        now = self.clock()
+        was_leader = self.is_leader
+        try:
+            won = self.lease.acquire(self.instance, now, self.ttl)
+        except Exception:
+            logger.exception("Scheduler lease heartbeat failed")
+            won = False
+        if won:
+            self._leader_until = now + self.ttl
+        elif not self.is_leader:
+            self._leader_until = None
+        if won and not was_leader:
+            logger.info("Scheduler leadership acquired by %s", self.instance)
+        return self.is_leader
+
+    def resign(self) -> None:
+        if self._leader_until is None:
+            return
+        self._leader_until = None
+        try:
+            self.lease.release(self.instance, self.clock())
+        except Exception:
+            logger.exception("Could not release scheduler lease")
+
+    def guard(self, job: str, func: Callable):
+        """Wrap a periodic job so it only runs on the leader and records its runs."""
+        @functools.wraps(func)
+        def run():
+            if not self.is_leader:
+                return None
+            started = self.clock()
+            ok = False
+            try:
+                result = func()
+                ok = True
+                return result
+            finally:
+                record = {
+                    "instance": self.instance,
+                    "started_at": started.isoformat(),
+                    "seconds": round((self.clock() - started).total_seconds(), 3),
+                    "ok": ok,
+                }
+                try:
+                    self.lease.record_run(self.instance, job, record)
+                except Exception:
+                    logger.exception("Could not record run of %s", job)
+        return run
+
+    def status(self) -> Dict:
+        current = self.lease.current() or {}
+        expires_at = current.get("expires_at")
+        return {
+            "election": settings.SCHEDULER_LEADER_ELECTION,
+            "instance": self.instance,
+            "is_leader": self.is_leader,
+            "leader": current.get("holder") if expires_at and expires_at > self.clock() else None,
+            "lease_expires_at": expires_at,
+            "last_runs": current.get("last_runs", {}),
+        }
+
+
+_elector: Optional[LeaderElector] = None
+
+
+def build_elector(backend: str) -> Optional[LeaderElector]:
+    if backend == "off":
+        return None
+    if backend == "db":
+        return LeaderElector(DatabaseLease())
+    if backend == "redis":
+        import redis
+
+        return LeaderElector(RedisLease(redis.Redis.from_url(settings.REDIS_URL)))
+    raise ValueError(f"Unknown SCHEDULER_LEADER_ELECTION backend: {backend}")
+
+
+def get_elector() -> Optional[LeaderElector]:
+    global _elector
+    if _elector is None:
+        _elector = build_elector(settings.SCHEDULER_LEADER_ELECTION)
+    return _elector
@@ -0,0 +1,177 @@
+"""Live capacity push for WebSocket and Server-Sent Events subscribers.
+
+Every commit that changes an event already publishes its id on
+``event_cache.INVALIDATION_CHANNEL`` (Redis pub/sub with
+``PUBSUB_BACKEND=redis``, so every worker hears about every change). The
+hub only marks those ids dirty. Every ``LIVE_UPDATE_INTERVAL_MS`` it loads
+the dirty events that someone is watching in one go and hands a frame to
+each subscriber, so a burst of 1,000 holds becomes a few frames per second
+per event.
+
+Backpressure: a subscriber keeps only the latest frame per event. A slow
+consumer skips intermediate states instead of growing a queue, and a send
+that stalls longer than ``LIVE_SEND_TIMEOUT_SECONDS`` closes the connection.
+"""
+import asyncio
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+from app import db as db_module
+from app.config import settings
+from app.event_cache import INVALIDATION_CHANNEL
+from app.inventory import totals_for
+from app.pubsub import get_broadcaster
+
+logger = logging.getLogger(__name__)
+
+
+def _frame(event_id: int, totals) -> dict:
+    return {
+        "id": event_id,
+        "available_capacity": totals.available,
+        "hold_count": totals.hold_count,
+        "confirmed_count": totals.confirmed_count,
+        "version": totals.version,
+    }
+
+
+class Subscriber:
+    """One connection; conflates to the newest frame per event."""
+
+    def __init__(self, event_ids: Iterable[int]):
+        self.event_ids = frozenset(event_ids)
+        self._pending: Dict[int, dict] = {}
+        self._ready = asyncio.Event()
+        self.conflated = 0
+
+    def offer(self, frame: dict) -> None:
+        if frame["id"] in self._pending:
+            self.conflated += 1
+        self._pending[frame["id"]] = frame
+        self._ready.set()
+
+    async def next(self, timeout: Optional[float] = None) -> List[dict]:
+        """Frames ready to send, or ``[]`` when ``timeout`` passes first."""
+        if not self._ready.is_set():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        frames, self._pending = list(self._pending.values()), {}
+        return frames
+
+
+class LiveHub:
+    def __init__(self, interval: float, session_factory=None):
+        self.interval = interval
+        # Looked up at call time so tests/benchmarks can swap SessionLocal
+        self.session_factory = session_factory or (lambda: db_module.SessionLocal())
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self._dirty: Set[int] = set()
+        self._dirty_lock = threading.Lock()
+        self._last_version: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+
+    # --- Yayın tarafı (herhangi bir thread'den çağrılabilir) ---
+    def mark_dirty(self, message: str) -> None:
+        with self._dirty_lock:
+            self._dirty.add(int(message))
+
+    # --- Abonelik ---
+    async def subscribe(self, event_ids: Iterable[int]) -> Subscriber:
+        subscriber = Subscriber(event_ids)
+        for event_id in subscriber.event_ids:
+            self._subscribers.setdefault(event_id, set()).add(subscriber)
+        self._ensure_running()
+        # Initial snapshot so the client does not wait for the first change
+        for event_id, totals in (await self._load(subscriber.event_ids)).items():
+            subscriber.offer(_frame(event_id, totals))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        for event_id in subscriber.event_ids:
+            watchers = self._subscribers.get(event_id)
+            if watchers is not None:
+                watchers.discard(subscriber)
+                if not watchers:
+                    del self._subscribers[event_id]
+                    self._last_version.pop(event_id, None)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({s for watchers in self._subscribers.values() for s in watchers})
+
+    # --- Birleştirme döngüsü ---
+    async def flush(self) -> int:
+        """Push one frame per watched dirty event; returns the frames built."""
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        watched = [event_id for event_id in dirty if event_id in self._subscribers]
+        if not watched:
+            return 0
+        built = 0
+        for event_id, totals in (await self._load(watched)).items():
+            if self._last_version.get(event_id) == totals.version:
+                continue
+            self._last_version[event_id] = totals.version
+            frame = _frame(event_id, totals)
+            built += 1
+            for subscriber in list(self._subscribers.get(event_id, ())):
+                subscriber.offer(frame)
+        return built
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Live update flush failed")
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+
+    def shutdown(self) -> None:
+        if self._task is not None and not self._task.done() and self._loop and not self._loop.is_closed():
+            self._task.cancel()
+        self._task = self._loop = None
+        self._subscribers.clear()
+        self._last_version.clear()
+
+    async def _load(self, event_ids):
+        def load():
+            session = self.session_factory()
+            try:
+                return totals_for(session, event_ids)
+            finally:
+                session.close()
+
+        return await run_in_threadpool(load)
+
+
+_hub: Optional[LiveHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_hub() -> LiveHub:
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                hub = LiveHub(settings.LIVE_UPDATE_INTERVAL_MS / 1000)
+                get_broadcaster().subscribe(INVALIDATION_CHANNEL, hub.mark_dirty)
+                _hub = hub
+    return _hub
+
+
+def shutdown_hub() -> None:
+    if _hub is not None:
+        _hub.shutdown()
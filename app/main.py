@@ -1,32 +1,109 @@
-from fastapi import FastAPI
-from app.routers import events, reservations, auth
+from fastapi import FastAPI, HTTPException, Response
+from app.routers import events, reservations, auth, aio, live
+from app.config import settings
 from apscheduler.schedulers.background import BackgroundScheduler
-from app.tasks import cleanup_expired_holds
+from app.tasks import cleanup_expired_holds, enqueue_outbox_relay
+from app.capacity_gate import get_capacity_gate
+from app import db as db_module
+from app import hashing, metrics, sql_profile
+from app.live import shutdown_hub
+from app.waiting_room import Queued, queued_response
+from app.idempotency import purge_expired_keys
+from app.leader import get_elector
 from contextlib import asynccontextmanager
 
 # --- Scheduler Ayarları ---
+def build_scheduler(elector=None) -> BackgroundScheduler:
+    """Periyodik işler; elector varsa yalnızca lider process'te çalışırlar."""
+    def job(name, func):
+        return elector.guard(name, func) if elector else func
+
+    scheduler = BackgroundScheduler()
+    if elector:
+        scheduler.add_job(elector.heartbeat, 'interval', seconds=settings.SCHEDULER_HEARTBEAT_SECONDS)
+    # Süresi dolan hold kayıtlarını temizle ve kapasiteyi iade et [cite: 39, 41]
+    # Celery modunda her hold kendi ETA görevini alır; tarama yalnızca güvenlik ağıdır
+    if settings.EXPIRY_SCHEDULER == "celery":
+        interval = settings.EXPIRY_SAFETY_SWEEP_SECONDS
+    else:
+        interval = settings.EXPIRY_SWEEP_INTERVAL_SECONDS
+    scheduler.add_job(job("cleanup_expired_holds", cleanup_expired_holds), 'interval', seconds=interval)
+    # Süresi dolan Idempotency-Key kayıtlarını sil
+    scheduler.add_job(job("purge_expired_keys", purge_expired_keys), 'interval', minutes=10)
+    # Outbox'taki rezervasyon olaylarını Celery worker'a yayınlat
+    scheduler.add_job(job("relay_outbox", enqueue_outbox_relay), 'interval', seconds=settings.OUTBOX_RELAY_INTERVAL_SECONDS)
+    return scheduler
+
+
 # Uygulama başladığında çalışacak ve kapandığında duracak şekilde yapılandırıyoruz
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Admission gate sayaçlarını veritabanındaki kapasiteyle eşitle
+    if get_capacity_gate():
+        session = db_module.SessionLocal()
+        try:
+            get_capacity_gate().reconcile(session)
+        finally:
+            session.close()
     # Uygulama başlarken scheduler'ı başlat
-    scheduler = BackgroundScheduler()
-    # Her 1 dakikada bir süresi dolan hold kayıtlarını temizle ve kapasiteyi iade et [cite: 39, 41]
-    scheduler.add_job(cleanup_expired_holds, 'interval', minutes=1)
+    scheduler = build_scheduler(get_elector())
     scheduler.start()
     yield
     # Uygulama kapanırken scheduler'ı güvenli bir şekilde kapat
     scheduler.shutdown()
+    if get_elector():
+        # Liderliği bırak: diğer worker bir heartbeat içinde devralır
+        get_elector().resign()
+    hashing.shutdown()
+    shutdown_hub()
+    if db_module.async_engine is not None:
+        await db_module.async_engine.dispose()
 
 app = FastAPI(
     title="Proxan - Reservation System",
     lifespan=lifespan
 )
 
+# Yazan istemci kısa bir süre okumalarını replica yerine primary'den yapar
+app.add_middleware(db_module.ReadYourWritesMiddleware)
+# X-SQL-Profile: 1 ile istenen isteklerin SQL sayısı/süresi (SQL_PROFILE)
+app.add_middleware(sql_profile.SQLProfileMiddleware)
+# En dışta: gecikme ölçümü diğer middleware'leri de kapsar
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Bekleme odasına alınan hold istekleri 202 + bilet döner
+app.add_exception_handler(Queued, queued_response)
+
 # Routerlar
+if settings.ASYNC_ENDPOINTS:
+    # Async sürümler önce eklenir; aynı path'teki sync endpoint'leri gölgeler
+    app.include_router(aio.router)
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
+# /events/live, /events/{event_id}'den önce eşleşmeli
+app.include_router(live.router, prefix="/events", tags=["events"])
 app.include_router(events.router, prefix="/events", tags=["events"])
 app.include_router(reservations.router, prefix="/reservations", tags=["reservations"])
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/health/db")
+def db_health():
+    """Primary ve replica bağlantı havuzlarının doluluğu"""
+    return db_module.pool_stats()
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus text formatında sayaçlar ve histogramlar"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/health/scheduler")
+def scheduler_health():
+    """Hangi instance lider ve periyodik işler en son ne zaman çalıştı"""
+    elector = get_elector()
+    if elector is None:
+        return {"election": "off"}
+    return elector.status()
\ No newline at end of file
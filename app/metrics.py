@@ -0,0 +1,285 @@
+"""In-process metrics in the Prometheus text format, served at ``/metrics``.
+
+Counters and histograms live in this process and need no client library or
+collector: Prometheus scrapes each worker. Recording a value costs one dict
+lookup and a lock around a few integer additions. ``benchmarks/metrics_overhead.py``
+measures this, so the instrumentation stays on in production
+(``METRICS_ENABLED``).
+
+Gauges are read at scrape time through callbacks, e.g. the connection pool
+usage from ``app.db.pool_stats``.
+"""
+import bisect
+import functools
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; request latencies from sub-millisecond cache hits to slow locks
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Lock and pool waits are usually far below a millisecond
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labelvalues)
+            if row is None:
+                row = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def time(self, *labelvalues: str) -> "_Timer":
+        return _Timer(self, labelvalues)
+
+    def count(self, *labelvalues: str) -> int:
+        row = self._values.get(labelvalues)
+        return int(sum(row[:-1])) if row else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(row)) for key, row in self._values.items())
+        lines = []
+        for key, row in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (math.inf,), row[:-1]):
+                cumulative += hits
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(row[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labelvalues", "started")
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+
+
+class Gauge(Metric):
+    """Read at scrape time: ``collect()`` yields ``(labelvalues, value)``."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames, collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in self.collect()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- HTTP ---
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "proxan_http_request_duration_seconds", "Request latency by route template",
+    ("method", "route", "status"),
+))
+
+# --- Holds and confirms ---
+HOLD_LOCK_WAIT = REGISTRY.register(Histogram(
+    "proxan_hold_lock_wait_seconds", "Time to get the event row lock (or win the conditional UPDATE) in a hold",
+    ("strategy",), WAIT_BUCKETS,
+))
+HOLD_OUTCOMES = REGISTRY.register(Counter(
+    "proxan_hold_outcomes_total", "Hold requests by outcome", ("outcome",),
+))
+CONFIRM_OUTCOMES = REGISTRY.register(Counter(
+    "proxan_confirm_outcomes_total", "Confirm requests by outcome", ("outcome",),
+))
+
+# --- Expiry sweep ---
+SWEEP_DURATION = REGISTRY.register(Histogram(
+    "proxan_sweep_duration_seconds", "cleanup_expired_holds run time", ("result",),
+))
+SWEEP_RECLAIMED = REGISTRY.register(Counter(
+    "proxan_sweep_reclaimed_total", "Expired holds deleted by the sweep",
+))
+
+# --- Outbox ---
+OUTBOX_PUBLISHED = REGISTRY.register(Counter(
+    "proxan_outbox_published_total", "Outbox messages handed to the broker",
+))
+
+# --- Connection pools ---
+POOL_CHECKOUT_WAIT = REGISTRY.register(Histogram(
+    "proxan_db_pool_checkout_seconds", "Time to get a connection from the pool", ("pool",), WAIT_BUCKETS,
+))
+
+
+def _pool_gauge(field: str):
+    def collect():
+        from app.db import pool_stats
+
+        return [((name,), stats[field]) for name, stats in pool_stats().items() if field in stats]
+    return collect
+
+
+REGISTRY.register(Gauge("proxan_db_pool_in_use", "Connections checked out", ("pool",), _pool_gauge("checked_out")))
+REGISTRY.register(Gauge("proxan_db_pool_size", "Persistent connections in the pool", ("pool",), _pool_gauge("size")))
+REGISTRY.register(Gauge("proxan_db_pool_overflow", "Connections above the pool size", ("pool",), _pool_gauge("overflow")))
+
+
+# Outcome labels for the HTTPException details raised by app.holds
+HOLD_OUTCOME_BY_DETAIL = {
+    "No capacity": "sold_out",
+    "Event is not active": "inactive",
+    "Event not found": "not_found",
+}
+CONFIRM_OUTCOME_BY_DETAIL = {
+    "Reservation expired": "expired",
+    "Reservation not found": "not_found",
+    "Reservation not in HOLD state": "not_hold",
+}
+
+
+def count_outcomes(counter: Counter, by_detail: Mapping[str, str], success: str = "success",
+                   others: Mapping[type, str] = None):
+    """Count each call of the wrapped function under its outcome label.
+
+    HTTPExceptions are labelled by their detail (``rejected`` if unknown),
+    exception types in ``others`` by their label, anything else ``error``.
+    """
+    others = tuple((others or {}).items())
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                result = func(*args, **kwargs)
+            except HTTPException as exc:
+                counter.inc(by_detail.get(exc.detail, "rejected"))
+                raise
+            except Exception as exc:
+                counter.inc(next((label for kind, label in others if isinstance(exc, kind)), "error"))
+                raise
+            counter.inc(success)
+            return result
+        return wrapper
+    return decorate
+
+
+class MetricsMiddleware:
+    """Times every HTTP request under its route template (not the raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # FastAPI leaves the matched route in the scope; raw paths would
+            # give every event id its own series
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                scope["method"], getattr(route, "path", "unmatched"), status[0],
+            )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db import Base
@@ -20,6 +20,8 @@ class User(Base):
 
 class Event(Base):
     __tablename__ = "events"
+    # GET /events: is_active filter + keyset order on id from one index
+    __table_args__ = (Index("ix_events_is_active_id", "is_active", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     capacity = Column(Integer, nullable=False)
@@ -27,17 +29,95 @@ class Event(Base):
     start_date = Column(DateTime(timezone=True))
     end_date = Column(DateTime(timezone=True))
     is_active = Column(Boolean, default=True)
+    # 0 = single-row inventory; N > 0 = capacity split across N shard rows
+    capacity_shards = Column(Integer, nullable=False, default=0, server_default="0")
+    # Maintained in the same transactions as hold/confirm/expiry; sharded
+    # events keep part of these on their shard rows (see app/inventory.py)
+    hold_count = Column(Integer, nullable=False, default=0, server_default="0")
+    confirmed_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped by every capacity/counter change; with the shard versions it
+    # forms the ETag of GET /events/{id} (see app/event_cache.py)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     reservations = relationship("Reservation", back_populates="event")
+    shards = relationship("EventCapacityShard", back_populates="event", order_by="EventCapacityShard.shard_no")
+
+
+class EventCapacityShard(Base):
+    __tablename__ = "event_capacity_shards"
+    __table_args__ = (UniqueConstraint("event_id", "shard_no", name="uq_event_capacity_shards_event_shard"),)
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False, index=True)
+    shard_no = Column(Integer, nullable=False)
+    available_capacity = Column(Integer, nullable=False)
+    hold_count = Column(Integer, nullable=False, default=0, server_default="0")
+    confirmed_count = Column(Integer, nullable=False, default=0, server_default="0")
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    event = relationship("Event", back_populates="shards")
+
+
+# Only live holds are ever swept, so the expiry index skips confirmed rows
+_HOLD_ONLY = text("state = 'HOLD'")
 
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        Index("ix_reservations_hold_expires_at", "expires_at", postgresql_where=_HOLD_ONLY, sqlite_where=_HOLD_ONLY),
+        Index("ix_reservations_event_id_state", "event_id", "state"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
     state = Column(Enum(ReservationState), nullable=False, default=ReservationState.HOLD)
     expires_at = Column(DateTime(timezone=True), nullable=True)
+    # Seats held by this reservation; counters and capacity move by this much
+    quantity = Column(Integer, nullable=False, default=1, server_default="1")
+    # Shard the seats were taken from (sharded inventory only)
+    shard_no = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User")
     event = relationship("Event", back_populates="reservations")
+
+
+class IdempotencyKey(Base):
+    """Stored outcome of a request sent with an ``Idempotency-Key`` header."""
+    __tablename__ = "idempotency_keys"
+    # The unique index is what serialises concurrent attempts with one key
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),)
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # sha256 of method, path and body; the same key with another request is an error
+    fingerprint = Column(String(64), nullable=False)
+    # NULL while the first attempt is still running
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    # Set by the transaction that did the work; such a claim is never re-run
+    committed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class SchedulerLease(Base):
+    """Who runs the periodic jobs (see app/leader.py)."""
+    __tablename__ = "scheduler_leases"
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(255), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    renewed_at = Column(DateTime(timezone=True), nullable=False)
+    # JSON: job name -> {"instance", "started_at", "seconds", "ok"}
+    last_runs = Column(Text, nullable=True)
+
+
+class OutboxMessage(Base):
+    """A reservation change waiting to be published (see app/outbox.py)."""
+    __tablename__ = "outbox"
+    # Publish order; rows are deleted once the broker has them
+    id = Column(Integer, primary_key=True)
+    # reservation.held | reservation.confirmed | reservation.expired; also the routing key
+    kind = Column(String(64), nullable=False)
+    event_id = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,168 @@
+"""Transactional outbox for reservation changes.
+
+Email, analytics and payments learn about holds, confirms and expirations
+from messages on the broker, not from calls made while the event row is
+locked. The code that changes a reservation calls ``add(db, kind, ...)``.
+When that transaction commits, one executemany INSERT writes the queued
+messages into the ``outbox`` table. So a message exists exactly when its
+change does, and the request path pays one statement for it.
+
+``relay`` (run by the ``app.tasks.relay_outbox`` Celery task, which the
+leader enqueues every ``OUTBOX_RELAY_INTERVAL_SECONDS``) drains the table in
+id order. For each batch it locks the rows, publishes them to the
+``OUTBOX_EXCHANGE`` topic exchange (routing key = kind), then deletes them
+and commits.
+
+* Delivery is at least once. A crash or broker error between publishing and
+  committing leaves the rows in place, and they are published again.
+  Consumers deduplicate on the ``message_id`` (the outbox id).
+* Messages are published in commit order per counter row: per event for an
+  unsharded event, per ``(event_id, shard_no)`` for a sharded one. Every
+  change updates its reservation's counter row (``Event`` or
+  ``EventCapacityShard``), and the outbox INSERT runs at commit while that
+  row lock is held. So two writers to one row get ids in commit order.
+  Relays publish committed rows in id order and queue behind each other on
+  the batch's row locks. Both keys are in the payload. A consumer that
+  relies on order partitions by them, the same way the inventory does.
+* Writers on different shards do not serialize, so across shards a later id
+  can be published while an earlier one is still uncommitted. Making that
+  event-wide would put the event row lock back on every sharded hold.
+  Messages for one reservation are always in order, even across a reshard,
+  because each change commits before the next can be written.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Optional
+
+from kombu import Connection, Exchange
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.orm import Session
+
+from app import db as db_module
+from app.config import settings
+from app.metrics import OUTBOX_PUBLISHED
+from app.models import OutboxMessage
+from app.worker import celery
+
+logger = logging.getLogger(__name__)
+
+HELD = "reservation.held"
+CONFIRMED = "reservation.confirmed"
+EXPIRED = "reservation.expired"
+
+
+def add(db: Session, kind: str, *reservations) -> None:
+    """Queue a ``kind`` message per reservation; written when ``db`` commits.
+
+    Anything with ``id``, ``event_id``, ``shard_no``, ``user_id`` and
+    ``quantity`` will do.
+    The id is read at commit, so new reservations need not be flushed yet.
+    """
+    db.info.setdefault("outbox", []).extend((kind, reservation) for reservation in reservations)
+
+
+def _row(kind: str, reservation, now: datetime) -> dict:
+    return {
+        "kind": kind,
+        "event_id": reservation.event_id,
+        "payload": json.dumps({
+            "type": kind,
+            "reservation_id": reservation.id,
+            "event_id": reservation.event_id,
+            "shard_no": reservation.shard_no,
+            "user_id": reservation.user_id,
+            "seats": reservation.quantity,
+            "occurred_at": now.isoformat(),
+        }),
+        "created_at": now,
+    }
+
+
+@event.listens_for(Session, "before_commit")
+def _write_outbox(session):
+    pending = session.info.pop("outbox", None)
+    if pending:
+        # New reservations get their ids here if the caller did not flush
+        session.flush()
+        now = datetime.utcnow()
+        session.execute(insert(OutboxMessage), [_row(kind, reservation, now) for kind, reservation in pending])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_outbox(session, previous_transaction):
+    session.info.pop("outbox", None)
+
+
+def exchange() -> Exchange:
+    return Exchange(settings.OUTBOX_EXCHANGE, type="topic", durable=True)
+
+
+def _publish_batch(db: Session, producer, target: Exchange, batch_size: int) -> int:
+    rows = db.execute(
+        select(OutboxMessage.id, OutboxMessage.kind, OutboxMessage.event_id, OutboxMessage.payload)
+        .order_by(OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update()
+    ).all()
+    if not rows:
+        db.rollback()
+        return 0
+    for row in rows:
+        producer.publish(
+            row.payload,
+            exchange=target,
+            routing_key=row.kind,
+            content_type="application/json",
+            content_encoding="utf-8",
+            delivery_mode=2,
+            message_id=str(row.id),
+            headers={"event_id": row.event_id},
+            declare=[target],
+            retry=True,
+            retry_policy={"max_retries": 3},
+        )
+    db.execute(
+        delete(OutboxMessage)
+        .where(OutboxMessage.id.in_([row.id for row in rows]))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(rows)
+
+
+def relay(db_session: Session = None, connection: Optional[Connection] = None,
+          batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> int:
+    """Publish and delete committed outbox rows in id order; returns how many were published.
+
+    Stops when a batch comes back empty, after ``max_batches`` (0 = until drained),
+    or at the first publish error. The unfinished batch stays in the table.
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    max_batches = max_batches if max_batches is not None else settings.OUTBOX_RELAY_MAX_BATCHES
+    db = db_session or db_module.SessionLocal()
+    own_connection = connection is None
+    if own_connection:
+        connection = celery.connection_for_write()
+    published = batches = 0
+    try:
+        producer = connection.Producer()
+        target = exchange()
+        while not max_batches or batches < max_batches:
+            # A short batch does not mean the table is drained: a concurrent
+            # relay may have deleted rows this one was waiting to lock
+            count = _publish_batch(db, producer, target, batch_size)
+            if not count:
+                break
+            published += count
+            batches += 1
+    except Exception:
+        logger.exception("Outbox relay stopped after %s messages", published)
+        db.rollback()
+    finally:
+        if own_connection:
+            connection.release()
+        if db_session is None:
+            db.close()
+        OUTBOX_PUBLISHED.inc(amount=published)
+    return published
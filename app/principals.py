@@ -0,0 +1,154 @@
+"""Authenticated principals and the per-process principal cache.
+
+``get_current_user`` used to load the ``User`` row on every request. It now
+returns a small immutable ``Principal`` that is cached per ``(subject,
+token)`` for ``AUTH_CACHE_TTL_SECONDS`` (never past the token's own expiry),
+so repeated requests with the same token skip the query.
+
+Entries are dropped as soon as a commit changes or deletes the user, locally
+and, with ``PUBSUB_BACKEND=redis``, on every other worker. Bulk
+``Query.update``/``delete`` on users bypasses the ORM events and only
+expires through the TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.config import settings
+from app.models import User
+from app.pubsub import get_broadcaster
+
+INVALIDATION_CHANNEL = "proxan:auth:invalidate"
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    is_admin: bool = False
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, username=user.username, is_admin=bool(user.is_admin))
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> Optional["Principal"]:
+        """Principal from the ``uid``/``adm`` claims; None for older tokens."""
+        if claims.get("uid") is None:
+            return None
+        return cls(id=int(claims["uid"]), username=claims["sub"], is_admin=bool(claims.get("adm", False)))
+
+
+class PrincipalCache:
+    """Bounded LRU with a per-entry deadline, safe to share between threads."""
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Principal]]" = OrderedDict()
+        self._tokens: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, subject: str, token: str) -> Optional[Principal]:
+        key = (subject, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            deadline, principal = entry
+            if deadline <= self.clock():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def put(self, subject: str, token: str, principal: Principal, expires_at: Optional[float] = None) -> None:
+        """Cache ``principal``; ``expires_at`` is the token's ``exp`` (unix time)."""
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        key = (subject, token)
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, principal)
+            self._entries.move_to_end(key)
+            self._tokens.setdefault(subject, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, subject: str) -> None:
+        with self._lock:
+            for token in list(self._tokens.get(subject, ())):
+                self._drop((subject, token))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+        tokens = self._tokens.get(key[0])
+        if tokens is not None:
+            tokens.discard(key[1])
+            if not tokens:
+                del self._tokens[key[0]]
+
+
+_cache: Optional[PrincipalCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_principal_cache() -> Optional[PrincipalCache]:
+    """The process-wide cache, or None when ``AUTH_CACHE_TTL_SECONDS`` is 0."""
+    global _cache
+    if settings.AUTH_CACHE_TTL_SECONDS <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = PrincipalCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL_SECONDS)
+                get_broadcaster().subscribe(INVALIDATION_CHANNEL, cache.invalidate)
+                _cache = cache
+    return _cache
+
+
+def invalidate_principals(usernames: Iterable[str]) -> None:
+    """Drop cached principals here and tell the other workers to do the same."""
+    for username in usernames:
+        if _cache is not None:
+            _cache.invalidate(username)
+        get_broadcaster().publish(INVALIDATION_CHANNEL, username)
+
+
+# --- User değişikliklerinde önbelleği temizle (commit sonrası) ---
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _remember_changed_user(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    names = {target.username, *inspect(target).attrs.username.history.deleted}
+    session.info.setdefault("changed_principals", set()).update(n for n in names if n)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    names = session.info.pop("changed_principals", None)
+    if names:
+        invalidate_principals(names)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changed_users(session, previous_transaction):
+    session.info.pop("changed_principals", None)
@@ -0,0 +1,116 @@
+"""Small publish/subscribe layer for cross-worker notifications.
+
+Every uvicorn worker keeps its own in-process caches. When one worker
+changes something the others have cached, it publishes a message on a
+channel and every subscriber drops its copy. ``memory`` only reaches the
+current process (tests, single worker); ``redis`` uses Redis pub/sub so the
+message reaches every worker.
+
+Delivery is best effort: a lost message only means a cache entry lives until
+its TTL runs out, so publishers never fail because of the broadcaster.
+"""
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[str], None]
+
+
+class Broadcaster:
+    """Interface shared by the in-process and Redis broadcasters."""
+
+    def __init__(self):
+        self._callbacks: Dict[str, List[Callback]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: str) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        with self._lock:
+            self._callbacks[channel].append(callback)
+
+    def close(self) -> None:
+        pass
+
+    def _deliver(self, channel: str, message: str) -> None:
+        with self._lock:
+            callbacks = list(self._callbacks.get(channel, ()))
+        for callback in callbacks:
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("pubsub callback failed on %s", channel)
+
+
+class InMemoryBroadcaster(Broadcaster):
+    def publish(self, channel: str, message: str) -> None:
+        self._deliver(channel, message)
+
+
+class RedisBroadcaster(Broadcaster):
+    """Redis pub/sub; a daemon thread listens once the first channel is subscribed."""
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+        self._pubsub = None
+        self._thread = None
+
+    def publish(self, channel: str, message: str) -> None:
+        try:
+            self.client.publish(channel, message)
+        except Exception:
+            # Redis unavailable: at least this process hears about it
+            logger.exception("pubsub publish failed on %s", channel)
+            self._deliver(channel, message)
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        super().subscribe(channel, callback)
+        with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{channel: self._on_message})
+            if self._thread is None:
+                self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _on_message(self, message) -> None:
+        channel, data = message["channel"], message["data"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        if isinstance(data, bytes):
+            data = data.decode()
+        self._deliver(channel, data)
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+
+_broadcaster: Optional[Broadcaster] = None
+
+
+def build_broadcaster(backend: str) -> Broadcaster:
+    if backend == "memory":
+        return InMemoryBroadcaster()
+    if backend == "redis":
+        from app import redis_client
+
+        return RedisBroadcaster(redis_client.from_url(settings.REDIS_URL))
+    raise ValueError(f"Unknown PUBSUB_BACKEND: {backend}")
+
+
+def get_broadcaster() -> Broadcaster:
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = build_broadcaster(settings.PUBSUB_BACKEND)
+    return _broadcaster
@@ -0,0 +1,176 @@
+"""Token-bucket rate limiting for the hold endpoints.
+
+Every hold request takes one token from three buckets: the caller's
+(``user:{id}``), the event's (``event:{id}``, one per distinct event in a
+batch) and a global one. It is admitted only when all of them have a token,
+and then all of them are charged, so a rejected request costs nothing. The
+check runs before the endpoint touches the database, so a client that is
+over its limit never takes a pooled connection or an event row lock.
+
+Backends mirror ``app.capacity_gate``: ``memory`` keeps the buckets in this
+process (one worker), ``redis`` runs the same algorithm in one Lua script so
+every worker shares the buckets. If Redis is unreachable the limiter fails
+open and logs; losing the limiter must not take the hold path down with it.
+"""
+import logging
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+Bucket = Tuple[str, float, int]  # (key, tokens per second, burst)
+
+
+class RateLimiter:
+    """Interface shared by the in-process and Redis limiters."""
+
+    def acquire(self, buckets: Sequence[Bucket]) -> Optional[float]:
+        """Take one token from every bucket, or from none.
+
+        Returns None when admitted, otherwise the seconds until every bucket
+        has a token again.
+        """
+        raise NotImplementedError
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """Single-process limiter, also used by the tests."""
+
+    # Full buckets are forgotten once this many have been created
+    max_buckets = 100_000
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._prune_at = self.max_buckets
+        self._buckets: Dict[str, List[float]] = {}  # key -> [tokens, updated_at, rate, burst]
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets):
+        with self._lock:
+            now = self.clock()
+            wait = 0.0
+            states = []
+            for key, rate, burst in buckets:
+                state = self._buckets.get(key)
+                tokens = burst if state is None else min(burst, state[0] + (now - state[1]) * rate)
+                states.append((key, tokens, rate, burst))
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            if wait:
+                return wait
+            for key, tokens, rate, burst in states:
+                self._buckets[key] = [tokens - 1, now, rate, burst]
+            if len(self._buckets) > self._prune_at:
+                self._prune(now)
+            return None
+
+    def _prune(self, now):
+        # A bucket idle long enough to be full again is the same as no bucket
+        for key, (tokens, updated_at, rate, burst) in list(self._buckets.items()):
+            if tokens + (now - updated_at) * rate >= burst:
+                del self._buckets[key]
+        # Everyone still active: do not rescan on every request
+        self._prune_at = max(self.max_buckets, len(self._buckets) * 2)
+
+
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+  local rate = tonumber(ARGV[i * 2 - 1])
+  local burst = tonumber(ARGV[i * 2])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local left = tonumber(state[1]) or burst
+  local ts = tonumber(state[2]) or now
+  left = math.min(burst, left + math.max(0, now - ts) * rate)
+  tokens[i] = left
+  if left < 1 then wait = math.max(wait, (1 - left) / rate) end
+end
+if wait > 0 then return tostring(wait) end
+for i, key in ipairs(KEYS) do
+  local rate = tonumber(ARGV[i * 2 - 1])
+  local burst = tonumber(ARGV[i * 2])
+  redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+  redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+end
+return '0'
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """Limiter shared by every worker; one script call per request."""
+
+    key_prefix = "proxan:ratelimit:"
+
+    def __init__(self, client):
+        self.client = client
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+
+    def acquire(self, buckets):
+        args = []
+        for _, rate, burst in buckets:
+            args.extend((rate, burst))
+        try:
+            wait = float(self._acquire(keys=[self.key_prefix + key for key, _, _ in buckets], args=args))
+        except Exception:
+            logger.exception("Rate limiter unavailable; admitting request")
+            return None
+        return wait or None
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def build_limiter(backend: str) -> Optional[RateLimiter]:
+    if backend == "off":
+        return None
+    if backend == "memory":
+        return InMemoryRateLimiter()
+    if backend == "redis":
+        from app import redis_client
+
+        return RedisRateLimiter(redis_client.from_url(settings.REDIS_URL))
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    global _limiter
+    if _limiter is None:
+        _limiter = build_limiter(settings.RATE_LIMIT_BACKEND)
+    return _limiter
+
+
+def hold_buckets(user_id: int, event_ids: Iterable[int]) -> List[Bucket]:
+    """The buckets one hold request draws from; a rate of 0 disables that level."""
+    buckets = []
+    if settings.RATE_LIMIT_USER_RATE > 0:
+        buckets.append((f"user:{user_id}", settings.RATE_LIMIT_USER_RATE, settings.RATE_LIMIT_USER_BURST))
+    if settings.RATE_LIMIT_EVENT_RATE > 0:
+        for event_id in sorted(set(event_ids)):
+            buckets.append((f"event:{event_id}", settings.RATE_LIMIT_EVENT_RATE, settings.RATE_LIMIT_EVENT_BURST))
+    if settings.RATE_LIMIT_GLOBAL_RATE > 0:
+        buckets.append(("global", settings.RATE_LIMIT_GLOBAL_RATE, settings.RATE_LIMIT_GLOBAL_BURST))
+    return buckets
+
+
+def check_hold_rate(user_id: int, event_ids: Iterable[int]) -> None:
+    """Raise 429 with ``Retry-After`` when the hold request is over a limit."""
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return
+    buckets = hold_buckets(user_id, event_ids)
+    wait = limiter.acquire(buckets) if buckets else None
+    if wait is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
@@ -0,0 +1,30 @@
+"""Redis client for the shared backends (gate, waiting room, rate limits, pub/sub).
+
+Import it where ``redis`` itself used to be imported: lazily, inside the
+``build_*`` functions, so the memory backends never need the package.
+
+Every command and pipeline goes through ``app.db.off_loop``. The async
+endpoints run the sync hold path inside ``AsyncSession.run_sync``, on the
+event loop thread, and a Redis round trip there must not block the loop.
+"""
+import redis
+from redis.client import Pipeline
+
+from app.db import off_loop
+
+
+class _LoopSafePipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        return off_loop(super().execute, raise_on_error)
+
+
+class LoopSafeRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        return off_loop(super().execute_command, *args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _LoopSafePipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def from_url(url: str) -> LoopSafeRedis:
+    return LoopSafeRedis.from_url(url)
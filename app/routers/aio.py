@@ -0,0 +1,90 @@
+"""Async versions of the hot endpoints (``Settings.ASYNC_ENDPOINTS``).
+
+Sync ``def`` endpoints each hold a threadpool thread while they wait on
+Postgres lock queues, so the ~40 thread default caps concurrency. These
+handlers await an ``AsyncSession`` instead. The business logic is not
+duplicated: it runs through ``AsyncSession.run_sync`` on the same sync
+functions the regular routers use, and password hashing is pushed to a
+thread (or the app/hashing.py process pool) so it never blocks the event
+loop.
+
+``run_sync`` runs that code on the event loop thread. The Redis backends
+(app/redis_client.py) and the Celery expiry enqueue go through
+``app.db.off_loop``, which moves them to a worker thread there. Calls made
+here directly, outside ``run_sync``, use ``run_in_threadpool``.
+"""
+from datetime import timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.security import OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import auth, hashing, holds, idempotency, schemas, serializers
+from app.auth import get_current_user_async
+from app.db import get_async_db
+from app.models import User
+from app.rate_limit import check_hold_rate
+from app.routers import events
+
+router = APIRouter()
+
+
+@router.post("/auth/register", response_model=schemas.Token, tags=["auth"])
+async def register(user_in: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(User.id).where(User.username == user_in.username)):
+        raise HTTPException(status_code=400, detail="Username already registered")
+    hashed_password = await hashing.hash_password_async(user_in.password)
+    user = User(username=user_in.username, hashed_password=hashed_password)
+    db.add(user)
+    await db.commit()
+    token = auth.create_access_token(user.username, expires_delta=timedelta(minutes=60), user_id=user.id, is_admin=user.is_admin)
+    return {"access_token": token}
+
+
+@router.post("/auth/token", response_model=schemas.Token, tags=["auth"])
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    if not user:
+        raise HTTPException(status_code=400, detail="Incorrect username or password")
+    valid, new_hash = await hashing.verify_and_update_async(form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=400, detail="Incorrect username or password")
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    token = auth.create_access_token(user.username, expires_delta=timedelta(minutes=60), user_id=user.id, is_admin=user.is_admin)
+    return {"access_token": token}
+
+
+@router.get("/events/{event_id}", tags=["events"])
+async def get_event_detail(event_id: int, db: AsyncSession = Depends(get_async_db), if_none_match: Optional[str] = Header(None)):
+    return await db.run_sync(lambda session: events.detail_response(session, event_id, if_none_match))
+
+
+@router.post("/reservations/hold", response_model=schemas.ReservationOut, tags=["reservations"])
+async def create_hold(reservation_in: schemas.ReservationCreate, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user_async), request: Request = None):
+    await run_in_threadpool(check_hold_rate, current_user.id, [reservation_in.event_id])
+    return serializers.respond(schemas.ReservationOut, await idempotency.run_async(
+        db, current_user.id, request, reservation_in,
+        lambda session: holds.create_hold(session, reservation_in.event_id, current_user.id, seats=reservation_in.quantity),
+        schemas.ReservationOut,
+    ))
+
+
+@router.post("/reservations/hold/batch", response_model=List[schemas.ReservationOut], tags=["reservations"])
+async def create_batch_hold(batch_in: schemas.ReservationBatchCreate, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user_async)):
+    items = [(item.event_id, item.quantity) for item in batch_in.items]
+    await run_in_threadpool(check_hold_rate, current_user.id, [event_id for event_id, _ in items])
+    return serializers.respond(schemas.ReservationOut, await db.run_sync(holds.create_holds, items, current_user.id))
+
+
+@router.post("/reservations/confirm/{reservation_id}", response_model=schemas.ReservationOut, tags=["reservations"])
+async def confirm_reservation(reservation_id: int, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user_async), request: Request = None):
+    return serializers.respond(schemas.ReservationOut, await idempotency.run_async(
+        db, current_user.id, request, None,
+        lambda session: holds.confirm_hold(session, reservation_id, current_user.id),
+        schemas.ReservationOut,
+    ))
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app import schemas, auth
+from app import schemas, auth, hashing
 from app.db import get_db
 from app.models import User
 from fastapi.security import OAuth2PasswordRequestForm
@@ -14,18 +14,25 @@ def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.username == user_in.username).first()
     if user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    user = User(username=user_in.username, hashed_password=auth.get_password_hash(user_in.password))
+    user = User(username=user_in.username, hashed_password=hashing.hash_password(user_in.password))
     db.add(user)
     db.commit()
     db.refresh(user)
-    token = auth.create_access_token(user.username, expires_delta=timedelta(minutes=60))
+    token = auth.create_access_token(user.username, expires_delta=timedelta(minutes=60), user_id=user.id, is_admin=user.is_admin)
     return {"access_token": token}
 
 
 @router.post("/token", response_model=schemas.Token)
 def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    token = auth.create_access_token(user.username, expires_delta=timedelta(minutes=60))
+    valid, new_hash = hashing.verify_and_update(form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=400, detail="Incorrect username or password")
+    if new_hash:
+        # Eski tur sayısıyla üretilmiş hash'i güncel ayarla yeniden yaz
+        user.hashed_password = new_hash
+        db.commit()
+    token = auth.create_access_token(user.username, expires_delta=timedelta(minutes=60), user_id=user.id, is_admin=user.is_admin)
     return {"access_token": token}
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import conlist
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
-from typing import List
-from app.db import get_db
-from app.models import Event, Reservation, ReservationState
+from typing import List, Optional
+from app.db import get_db, get_read_db
+from app.models import Event, EventCapacityShard
+from app import bulk, event_cache, inventory, serializers
+from app.auth import require_admin
+from app.schemas import EventOut
 from pydantic import BaseModel
 from datetime import datetime
+import base64
+import json
 
 router = APIRouter()
 
@@ -13,6 +22,15 @@ class EventCreate(BaseModel):
     title: str
     capacity: int
 
+class ShardConfig(BaseModel):
+    shards: int
+
+class BulkSelection(BaseModel):
+    ids: conlist(int, min_items=1, max_items=10000)
+
+class CapacityAdjustment(BulkSelection):
+    delta: int
+
 # --- Endpointler ---
 
 @router.post("/")  # Testin hata aldığı nokta burasıydı
@@ -27,31 +45,195 @@ def create_event(event_data: EventCreate, db: Session = Depends(get_db)):
     db.add(new_event)
     db.commit()
     db.refresh(new_event)
-    return new_event
+    # EventOut alanları; ham ORM nesnesi jsonable_encoder ile dolaşılmaz
+    return serializers.respond(EventOut, new_event)
+
+# --- Toplu işlemler (admin) ---
+@router.post("/import")
+async def import_events(request: Request, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    """CSV (text/csv) ya da NDJSON (application/x-ndjson) gövdeden toplu etkinlik yükleme.
+
+    The body is read as a stream and inserted in chunks; invalid rows are
+    listed in the report and do not stop the load.
+    """
+    fmt = bulk.format_for(request.headers.get("content-type", ""))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+    report = await run_in_threadpool(
+        lambda: bulk.import_events(db, bulk.parse(fmt, bulk.stream_lines(request.stream())))
+    )
+    return report.as_dict()
+
+@router.post("/bulk/activate")
+def bulk_activate(selection: BulkSelection, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    return {"updated": bulk.set_active(db, selection.ids, True)}
+
+@router.post("/bulk/deactivate")
+def bulk_deactivate(selection: BulkSelection, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    return {"updated": bulk.set_active(db, selection.ids, False)}
+
+@router.post("/bulk/capacity")
+def bulk_adjust_capacity(adjustment: CapacityAdjustment, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    """Kapasiteyi delta kadar değiştirir; parçalı ya da yetersiz boş yeri olanlar atlanır"""
+    return bulk.adjust_capacity(db, adjustment.ids, adjustment.delta)
+
+@router.get("", include_in_schema=False)
+@router.get("/")
+def list_events(
+    request: Request,
+    is_active: Optional[bool] = None,
+    start_date: Optional[datetime] = Query(None, description="start_date >= this"),
+    end_date: Optional[datetime] = Query(None, description="end_date <= this"),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+):
+    """Etkinlik listesi: keyset (cursor) sayfalama, tek sorgu, akışlı yanıt.
+
+    ``Accept: application/x-ndjson`` gets one event per line and a final
+    ``{"next_cursor": ...}`` line; anything else gets a chunked
+    ``{"items": [...], "next_cursor": ...}`` document.
+    """
+    statement = _listing_query(is_active, start_date, end_date, _decode_cursor(cursor), limit)
+    # One extra row tells us whether there is a next page
+    rows = db.execute(statement.execution_options(stream_results=True, yield_per=200))
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(_ndjson(rows, limit), media_type="application/x-ndjson")
+    return StreamingResponse(_json_document(rows, limit), media_type="application/json")
 
 @router.get("/{event_id}")
-def get_event_detail(event_id: int, db: Session = Depends(get_db)):
-    """Etkinlik detaylarını ve kapasite durumunu döner"""
-    event = db.query(Event).filter(Event.id == event_id).first()
+def get_event_detail(event_id: int, db: Session = Depends(get_read_db), primary: Session = Depends(get_db),
+                     if_none_match: Optional[str] = Header(None)):
+    """Etkinlik detaylarını ve kapasite durumunu döner (ETag + kısa TTL önbellek)"""
+    # Cache fills read the primary: a lagging replica would pin a pre-write
+    # payload for a whole TTL after the invalidation. Sessions connect
+    # lazily, so cache hits touch neither database.
+    if event_cache.get_event_cache() is not None:
+        db = primary
+    return detail_response(db, event_id, if_none_match)
+
+def detail_response(db: Session, event_id: int, if_none_match: Optional[str] = None) -> Response:
+    version, payload = event_cache.cached_detail(event_id, lambda: _load_detail(db, event_id))
+    tag = event_cache.etag(event_id, version)
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if if_none_match and tag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+def _load_detail(db: Session, event_id: int):
+    # HOLD/CONFIRMED sayıları Event üzerinde tutulur: tek bir primary-key okuması
+    event = db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Etkinlik bulunamadı")
-    
-    # PDF isterleri: HOLD ve CONFIRMED sayılarını hesapla
-    hold_count = db.query(Reservation).filter(
-        Reservation.event_id == event_id,
-        Reservation.state == ReservationState.HOLD
-    ).count()
-    
-    confirmed_count = db.query(Reservation).filter(
-        Reservation.event_id == event_id,
-        Reservation.state == ReservationState.CONFIRMED
-    ).count()
-    
-    return {
+
+    totals = inventory.event_totals(db, event)
+    return totals.version, {
         "id": event.id,
         "title": event.title,
         "capacity": event.capacity,
-        "available_capacity": event.available_capacity, #
-        "hold_count": hold_count, #
-        "confirmed_count": confirmed_count #
-    }
\ No newline at end of file
+        "available_capacity": totals.available, #
+        "hold_count": totals.hold_count, #
+        "confirmed_count": totals.confirmed_count, #
+        "version": totals.version,
+    }
+
+@router.put("/{event_id}/shards")
+def configure_shards(event_id: int, config: ShardConfig, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    """Etkinlik kapasitesini N parçaya böler (0 = tek satır)"""
+    event = inventory.set_shard_count(db, event_id, config.shards)
+    # Read before commit; afterwards the expired instance would be reloaded
+    body = {"id": event.id, "capacity_shards": event.capacity_shards}
+    db.commit()
+    return {**body, "shards": _shard_amounts(db, event_id)}
+
+@router.post("/{event_id}/shards/rebalance")
+def rebalance_shards(event_id: int, db: Session = Depends(get_db), admin=Depends(require_admin)):
+    """Kalan kapasiteyi parçalar arasında eşit dağıtır"""
+    amounts = inventory.rebalance(db, event_id)
+    if not amounts:
+        raise HTTPException(status_code=404, detail="Event is not sharded")
+    db.commit()
+    return {"id": event_id, "shards": amounts}
+
+def _shard_amounts(db: Session, event_id: int):
+    return [amount for (amount,) in db.query(EventCapacityShard.available_capacity)
+            .filter(EventCapacityShard.event_id == event_id)
+            .order_by(EventCapacityShard.shard_no)]
+
+
+# --- Listeleme yardımcıları ---
+def _shard_sum(column):
+    # Correlated per-row sum; only evaluated for sharded rows that made the page
+    total = (
+        select(func.coalesce(func.sum(column), 0))
+        .where(EventCapacityShard.event_id == Event.id)
+        .scalar_subquery()
+    )
+    return case((Event.capacity_shards > 0, total), else_=0)
+
+def _listing_query(is_active, start_date, end_date, after_id, limit):
+    statement = select(
+        Event.id,
+        Event.title,
+        Event.capacity,
+        (Event.available_capacity + _shard_sum(EventCapacityShard.available_capacity)).label("available_capacity"),
+        (Event.hold_count + _shard_sum(EventCapacityShard.hold_count)).label("hold_count"),
+        (Event.confirmed_count + _shard_sum(EventCapacityShard.confirmed_count)).label("confirmed_count"),
+        Event.start_date,
+        Event.end_date,
+        Event.is_active,
+    )
+    if is_active is not None:
+        statement = statement.where(Event.is_active.is_(is_active))
+    if start_date is not None:
+        statement = statement.where(Event.start_date >= start_date)
+    if end_date is not None:
+        statement = statement.where(Event.end_date <= end_date)
+    if after_id is not None:
+        statement = statement.where(Event.id > after_id)
+    return statement.order_by(Event.id).limit(limit + 1)
+
+def _encode_cursor(event_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": event_id}).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _row_json(row) -> str:
+    item = dict(row._mapping)
+    for key in ("start_date", "end_date"):
+        if item[key] is not None:
+            item[key] = item[key].isoformat()
+    return json.dumps(item, ensure_ascii=False)
+
+def _page(rows, limit):
+    """Yield ``(json_text, None)`` per row, then ``(None, next_cursor)``."""
+    last_id, next_cursor = None, None
+    for count, row in enumerate(rows, start=1):
+        if count > limit:
+            next_cursor = _encode_cursor(last_id)
+            break
+        last_id = row.id
+        yield _row_json(row), None
+    rows.close()
+    yield None, next_cursor
+
+def _ndjson(rows, limit):
+    for text, next_cursor in _page(rows, limit):
+        yield (text if text is not None else json.dumps({"next_cursor": next_cursor})) + "\n"
+
+def _json_document(rows, limit):
+    yield '{"items": ['
+    first = True
+    for text, next_cursor in _page(rows, limit):
+        if text is None:
+            yield '], "next_cursor": ' + json.dumps(next_cursor) + "}"
+        else:
+            yield text if first else ", " + text
+            first = False
@@ -0,0 +1,77 @@
+"""Canlı kapasite akışı: SSE ve WebSocket (bkz. app/live.py)."""
+import asyncio
+import json
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, status
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.live import get_hub
+
+router = APIRouter()
+
+
+def _parse_ids(ids: str) -> List[int]:
+    try:
+        event_ids = sorted({int(part) for part in ids.split(",") if part.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma separated integers")
+    if not event_ids or len(event_ids) > settings.LIVE_MAX_EVENTS_PER_SUBSCRIPTION:
+        raise HTTPException(status_code=400, detail="Invalid number of events")
+    return event_ids
+
+
+@router.get("/live")
+async def live_events(ids: str = Query(..., description="comma separated event ids")):
+    """Server-Sent Events: her değişiklikte ``event: capacity`` çerçevesi."""
+    event_ids = _parse_ids(ids)
+    hub = get_hub()
+    subscriber = await hub.subscribe(event_ids)
+
+    async def stream():
+        try:
+            while True:
+                frames = await subscriber.next(settings.LIVE_HEARTBEAT_SECONDS)
+                if not frames:
+                    yield ": keep-alive\n\n"
+                for frame in frames:
+                    yield f"event: capacity\nid: {frame['id']}-{frame['version']}\ndata: {json.dumps(frame)}\n\n"
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.websocket("/live/ws")
+async def live_events_ws(websocket: WebSocket, ids: str = Query(...)):
+    """WebSocket: ``{"type": "capacity", "events": [...]}`` mesajları."""
+    try:
+        event_ids = _parse_ids(ids)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    hub = get_hub()
+    subscriber = await hub.subscribe(event_ids)
+    # The client only ever sends a close; watch for it next to the frames
+    receive = asyncio.ensure_future(websocket.receive())
+    try:
+        while True:
+            frames = asyncio.ensure_future(subscriber.next(settings.LIVE_HEARTBEAT_SECONDS))
+            done, _ = await asyncio.wait({receive, frames}, return_when=asyncio.FIRST_COMPLETED)
+            if frames not in done:
+                frames.cancel()
+            if receive in done:
+                if receive.result()["type"] == "websocket.disconnect":
+                    return
+                receive = asyncio.ensure_future(websocket.receive())
+            if frames in done:
+                message = {"type": "capacity", "events": frames.result()} if frames.result() else {"type": "heartbeat"}
+                await asyncio.wait_for(websocket.send_json(message), settings.LIVE_SEND_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        # Consumer too slow to take even conflated frames
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+    finally:
+        receive.cancel()
+        hub.unsubscribe(subscriber)
@@ -1,62 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app import schemas
-from datetime import datetime, timedelta
-from app.models import Reservation, Event, ReservationState
 from app.auth import get_current_user
-from sqlalchemy import select, update
+from app import holds, idempotency, serializers
+from app.config import settings
+from app.rate_limit import check_hold_rate
+from app.waiting_room import get_waiting_room
 
 router = APIRouter()
 
-@router.post("/hold", response_model=schemas.ReservationOut)
-def create_hold(reservation_in: schemas.ReservationCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    # Transactional - lock event row
-    event = db.query(Event).filter(Event.id == reservation_in.event_id).with_for_update().first()
-    
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    if not event.is_active:
-        raise HTTPException(status_code=400, detail="Event is not active")
-    if event.available_capacity <= 0:
-        raise HTTPException(status_code=400, detail="No capacity")
-    
-    # Kapasite düşür ve hold oluştur
-    event.available_capacity -= 1
-    expires_at = datetime.utcnow() + timedelta(minutes=5)
-    
-    reservation = Reservation(
-        user_id=current_user.id, 
-        event_id=event.id, 
-        state=ReservationState.HOLD, 
-        expires_at=expires_at
-    )
-    
-    db.add(reservation)
-    db.commit()
-    db.refresh(reservation)
-    return reservation
+@router.post("/hold", response_model=schemas.ReservationOut, responses={202: {"model": schemas.TicketOut}})
+def create_hold(reservation_in: schemas.ReservationCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user), request: Request = None):
+    check_hold_rate(current_user.id, [reservation_in.event_id])
+    return serializers.respond(schemas.ReservationOut, idempotency.run(
+        db, current_user.id, request, reservation_in,
+        lambda session: holds.create_hold(session, reservation_in.event_id, current_user.id, seats=reservation_in.quantity),
+        schemas.ReservationOut,
+    ))
+
+@router.post("/hold/batch", response_model=List[schemas.ReservationOut])
+def create_batch_hold(batch_in: schemas.ReservationBatchCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    items = [(item.event_id, item.quantity) for item in batch_in.items]
+    check_hold_rate(current_user.id, [event_id for event_id, _ in items])
+    return serializers.respond(schemas.ReservationOut, holds.create_holds(db, items, current_user.id))
 
 @router.post("/confirm/{reservation_id}", response_model=schemas.ReservationOut)
-def confirm_reservation(reservation_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    reservation = db.query(Reservation).filter(
-        Reservation.id == reservation_id, 
-        Reservation.user_id == current_user.id
-    ).first()
-    
-    if not reservation:
-        raise HTTPException(status_code=404, detail="Reservation not found")
-    
-    # --- Kritik Güncelleme: Süre Kontrolü ---
-    if reservation.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=400, detail="Reservation expired")
-    # ---------------------------------------
+def confirm_reservation(reservation_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user), request: Request = None):
+    return serializers.respond(schemas.ReservationOut, idempotency.run(
+        db, current_user.id, request, None,
+        lambda session: holds.confirm_hold(session, reservation_id, current_user.id),
+        schemas.ReservationOut,
+    ))
+
+# --- Bekleme odası (WAITING_ROOM) ---
+def _own_ticket(ticket_id: str, user_id: int):
+    room = get_waiting_room()
+    ticket = room.get(ticket_id) if room else None
+    if ticket is None or ticket.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return room, ticket
+
+@router.get("/queue/{ticket_id}", response_model=schemas.TicketOut)
+def get_ticket(ticket_id: str, response: Response, current_user=Depends(get_current_user)):
+    """Sıradaki yer ya da verilen hold'un id'si; veritabanına gitmez"""
+    _, ticket = _own_ticket(ticket_id, current_user.id)
+    if ticket.reservation_id is None:
+        response.headers["Retry-After"] = str(settings.WAITING_ROOM_POLL_SECONDS)
+    return ticket.as_dict()
 
-    if reservation.state != ReservationState.HOLD:
-        raise HTTPException(status_code=400, detail="Reservation not in HOLD state")
-    
-    # Durumu GÜNCELLE
-    reservation.state = ReservationState.CONFIRMED
-    db.commit()
-    db.refresh(reservation)
-    return reservation
\ No newline at end of file
+@router.delete("/queue/{ticket_id}", status_code=204)
+def leave_queue(ticket_id: str, current_user=Depends(get_current_user)):
+    room, ticket = _own_ticket(ticket_id, current_user.id)
+    room.leave(ticket.id)
+    return Response(status_code=204)
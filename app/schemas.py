@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, conint, conlist
 from typing import Optional
 from datetime import datetime
 from app.models import ReservationState
@@ -37,15 +37,30 @@ class EventOut(BaseModel):
 
 class ReservationCreate(BaseModel):
     event_id: int
+    quantity: conint(ge=1) = 1
+
+
+class ReservationBatchCreate(BaseModel):
+    items: conlist(ReservationCreate, min_items=1, max_items=20)
 
 
 class ReservationOut(BaseModel):
     id: int
     user_id: int
     event_id: int
+    quantity: int = 1
     state: ReservationState
     expires_at: Optional[datetime]
     created_at: datetime
 
     class Config:
         orm_mode = True
+
+
+class TicketOut(BaseModel):
+    id: str
+    event_id: int
+    seats: int
+    state: str
+    position: Optional[int]
+    reservation_id: Optional[int]
@@ -0,0 +1,91 @@
+"""Fast responses for the hot routes (hold, batch hold, confirm, create event).
+
+Returning an ORM object through ``response_model`` makes FastAPI build a
+pydantic model from it (validating every field) and then walk the result
+with ``jsonable_encoder``. The objects here come straight from our own
+transactions, so that work only re-checks what the database already
+guarantees. ``serializer(model)`` instead reads the model's fields once and
+returns a function that copies the attributes into a dict, converting only
+datetimes (``isoformat``) and enums (``value``), the same as
+``jsonable_encoder`` does.
+
+``FastJSONResponse`` renders with orjson when it is installed, otherwise with
+a preconfigured stdlib encoder. Both produce the bytes Starlette's
+``JSONResponse`` does (compact separators, UTF-8, no NaN), so clients and the
+stored idempotent responses see no difference. The routes keep their
+``response_model``, which still documents the schema in OpenAPI.
+``benchmarks/serialization.py`` measures both paths.
+"""
+import json
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, Dict, Type
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder gives the same bytes, only slower
+    orjson = None
+
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return _encoder.encode(content).encode("utf-8")
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _enum_value(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def _converter(field) -> Callable[[Any], Any]:
+    kind = field.type_
+    if isinstance(kind, type) and issubclass(kind, (datetime, date)):
+        return _isoformat
+    if isinstance(kind, type) and issubclass(kind, Enum):
+        return _enum_value
+    return None
+
+
+@lru_cache(maxsize=None)
+def serializer(model: Type[BaseModel]) -> Callable[[Any], Dict[str, Any]]:
+    """``obj -> dict`` with ``model``'s fields, in order; compiled once per model.
+
+    The function is generated as a single dict literal of attribute reads,
+    so serializing is one Python call. Only flat models of scalars,
+    datetimes and enums are supported, which is all the hot routes return.
+    """
+    namespace, items = {}, []
+    for name in model.__fields__:
+        convert = _converter(model.__fields__[name])
+        if convert is None:
+            items.append(f"{name!r}: obj.{name}")
+        else:
+            namespace[f"_{name}"] = convert
+            items.append(f"{name!r}: _{name}(obj.{name})")
+    source = f"def serialize(obj):\n    return {{{', '.join(items)}}}\n"
+    exec(compile(source, f"<serializer {model.__name__}>", "exec"), namespace)
+    return namespace["serialize"]
+
+
+def respond(model: Type[BaseModel], result: Any, status_code: int = 200) -> Response:
+    """Render ``result`` (an object or a list of them) as ``model``.
+
+    A ready ``Response`` (e.g. an idempotent replay) is passed through.
+    """
+    if isinstance(result, Response):
+        return result
+    serialize = serializer(model)
+    if isinstance(result, list):
+        return FastJSONResponse([serialize(item) for item in result], status_code=status_code)
+    return FastJSONResponse(serialize(result), status_code=status_code)
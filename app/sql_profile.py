@@ -0,0 +1,142 @@
+"""Per-request SQL profiling: statement count, SQL time and the slowest statements.
+
+Listeners on every SQLAlchemy ``Engine`` (sync engines and the sync core of
+async ones) time each statement and add it to the active profiles:
+
+* the request's own profile, kept in a context variable by
+  ``SQLProfileMiddleware``. With ``SQL_PROFILE=header`` only requests sending
+  ``X-SQL-Profile: 1`` are profiled; with ``all`` every request is. A
+  profiled response carries ``X-SQL-Queries``, ``X-SQL-Time-Ms`` and a
+  ``Server-Timing`` entry, and the slowest statements are logged.
+* ``capture()`` blocks, which see statements from every thread. The test
+  suite's ``query_budget`` fixture uses them, because TestClient runs the app
+  on another thread.
+
+The listeners are installed only when profiling is first used, so with
+``SQL_PROFILE=off`` and no captures the hot path is untouched.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = "X-SQL-Profile"
+# Statements kept per profile, slowest first
+SLOWEST = 5
+
+_current: contextvars.ContextVar[Optional["QueryProfile"]] = contextvars.ContextVar("sql_profile", default=None)
+_captures: List["QueryProfile"] = []
+_install_lock = threading.Lock()
+_installed = False
+
+
+class QueryProfile:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: List[str] = []
+        self.slowest: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.statements.append(statement)
+            if len(self.slowest) < SLOWEST or seconds > self.slowest[-1][0]:
+                self.slowest.append((seconds, statement))
+                self.slowest.sort(key=lambda item: -item[0])
+                del self.slowest[SLOWEST:]
+
+    def report(self) -> str:
+        """Every statement, numbered, for assertion messages."""
+        return "\n".join(f"{i}. {' '.join(statement.split())}" for i, statement in enumerate(self.statements, 1))
+
+    def summary(self) -> str:
+        slowest = "; ".join(f"{seconds * 1000:.2f} ms {' '.join(sql.split())[:200]}" for seconds, sql in self.slowest)
+        return f"{self.count} queries, {self.seconds * 1000:.2f} ms; slowest: {slowest or '-'}"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _captures or _current.get() is not None:
+        conn.info.setdefault("sql_profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("sql_profile_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+    for capture_profile in list(_captures):
+        capture_profile.record(statement, elapsed)
+
+
+def install() -> None:
+    global _installed
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            _installed = True
+
+
+@contextmanager
+def capture():
+    """Profile every statement run while the block is open, on any thread."""
+    install()
+    profile = QueryProfile()
+    _captures.append(profile)
+    try:
+        yield profile
+    finally:
+        _captures.remove(profile)
+
+
+def _wanted(scope) -> bool:
+    if settings.SQL_PROFILE == "all":
+        return True
+    if settings.SQL_PROFILE == "header":
+        return any(name == b"x-sql-profile" and value not in (b"", b"0") for name, value in scope["headers"])
+    return False
+
+
+class SQLProfileMiddleware:
+    """Profiles opted-in requests and reports the result in headers and the log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or settings.SQL_PROFILE == "off" or not _wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        install()
+        profile = QueryProfile()
+        token = _current.set(profile)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-SQL-Queries"] = str(profile.count)
+                headers["X-SQL-Time-Ms"] = f"{profile.seconds * 1000:.2f}"
+                headers.append("Server-Timing", f'sql;dur={profile.seconds * 1000:.2f};desc="{profile.count} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _current.reset(token)
+            logger.info("SQL profile %s %s: %s", scope["method"], scope["path"], profile.summary())
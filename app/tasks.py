@@ -1,28 +1,218 @@
-from sqlalchemy.orm import Session
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
 from datetime import datetime
-from app.db import SessionLocal
-from app.models import Reservation, Event, ReservationState
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from app import outbox
+from app.config import settings
+from app.db import SessionLocal, off_loop
+from app.worker import celery
+from app.models import Reservation, ReservationState
+from app.capacity_gate import reconcile_capacity_gate
+from app.inventory import release_hold
+from app.metrics import SWEEP_DURATION, SWEEP_RECLAIMED
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepReport:
+    """Per-batch outcome of one cleanup_expired_holds run."""
+    batches: List[Tuple[int, float]] = field(default_factory=list)  # (rows, seconds)
+    events: int = 0
+    granted: int = 0  # waiting-room tickets turned into holds
+
+    @property
+    def rows(self) -> int:
+        return sum(rows for rows, _ in self.batches)
+
+    @property
+    def elapsed(self) -> float:
+        return sum(seconds for _, seconds in self.batches)
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "events": self.events,
+            "granted": self.granted,
+            "elapsed_ms": round(self.elapsed * 1000, 2),
+            "batches": [{"rows": rows, "ms": round(seconds * 1000, 2)} for rows, seconds in self.batches],
+        }
+
+
+def _expire_batch(db: Session, limit: int, now: datetime, reservation_id: Optional[int] = None) -> list:
+    """Delete up to ``limit`` expired holds; return rows of their id, user_id,
+    event_id, shard_no and quantity.
 
-def cleanup_expired_holds(db_session: Session = None):
+    Rows locked by a concurrent confirm are skipped, never waited on.
+    """
+    victims = (
+        select(Reservation.id, Reservation.user_id, Reservation.event_id, Reservation.shard_no, Reservation.quantity)
+        .where(Reservation.state == ReservationState.HOLD, Reservation.expires_at < now)
+        .order_by(Reservation.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if reservation_id is not None:
+        victims = victims.where(Reservation.id == reservation_id)
+
+    if getattr(db.get_bind().dialect, "full_returning", False):
+        # Postgres: one DELETE ... WHERE id IN (SELECT ... SKIP LOCKED) RETURNING
+        statement = (
+            delete(Reservation)
+            .where(Reservation.id.in_(victims.with_only_columns(Reservation.id).scalar_subquery()))
+            .returning(Reservation.id, Reservation.user_id, Reservation.event_id, Reservation.shard_no,
+                       Reservation.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        return db.execute(statement).all()
+
+    rows = db.execute(victims).all()
+    if not rows:
+        return []
+    ids = [row.id for row in rows]
+    result = db.execute(
+        delete(Reservation)
+        .where(Reservation.id.in_(ids), Reservation.state == ReservationState.HOLD)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(ids):
+        # Confirmed between our SELECT and DELETE: do not release those seats
+        kept = set(db.execute(select(Reservation.id).where(Reservation.id.in_(ids))).scalars())
+        rows = [row for row in rows if row.id not in kept]
+    return rows
+
+
+def _release_capacity(db: Session, expired: list) -> None:
+    seats = Counter()
+    for row in expired:
+        seats[(row.event_id, row.shard_no)] += row.quantity
+    # One UPDATE per event (or shard), in id order so concurrent sweeps cannot deadlock
+    for event_id, shard_no in sorted(seats, key=lambda key: (key[0], -1 if key[1] is None else key[1])):
+        release_hold(db, event_id, shard_no, seats[(event_id, shard_no)])
+    outbox.add(db, outbox.EXPIRED, *expired)
+
+
+def _admit_waiting(db: Session, event_ids=None):
+    # app.holds imports this module for schedule_expiry
+    from app.holds import admit_waiting
+
+    return admit_waiting(db, event_ids)
+
+
+def cleanup_expired_holds(db_session: Session = None, batch_size: Optional[int] = None,
+                          max_batches: Optional[int] = None) -> SweepReport:
+    """Süresi dolan HOLD kayıtlarını silip kapasiteyi iade eder.
+
+    Works in bounded batches, each its own short transaction, so event row
+    locks are held for one batch rather than for the whole sweep.
+    """
     # Eğer bir session verilmemişse (normal çalışma), yenisini aç
     db = db_session or SessionLocal()
+    batch_size = batch_size or settings.EXPIRY_BATCH_SIZE
+    max_batches = max_batches if max_batches is not None else settings.EXPIRY_MAX_BATCHES
+    pause = settings.EXPIRY_BATCH_PAUSE_MS / 1000
+    report = SweepReport()
+    touched_events = set()
+    sweep_started, result = time.perf_counter(), "ok"
     try:
-        expired_reservations = db.query(Reservation).filter(
-            Reservation.state == ReservationState.HOLD,
-            Reservation.expires_at < datetime.utcnow()
-        ).all()
-
-        for res in expired_reservations:
-            event = db.query(Event).filter(Event.id == res.event_id).first()
-            if event:
-                event.available_capacity += 1
-            db.delete(res)
-        
-        db.commit()
-    except Exception as e:
-        print(f"Cleanup Error: {e}")
+        now = datetime.utcnow()
+        while not max_batches or len(report.batches) < max_batches:
+            started = time.perf_counter()
+            expired = _expire_batch(db, batch_size, now)
+            _release_capacity(db, expired)
+            db.commit()
+            if not expired:
+                break
+            report.batches.append((len(expired), time.perf_counter() - started))
+            touched_events.update(row.event_id for row in expired)
+            if len(expired) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+        report.events = len(touched_events)
+        # Boşalan yerleri bekleme odasındaki sıraya ver (tüm kuyruklar)
+        granted = _admit_waiting(db)
+        report.granted = sum(granted.values())
+        # Geri verilen kapasiteyi admission gate sayaçlarına yansıt
+        reconcile_capacity_gate(db, touched_events | set(granted))
+        if report.rows or report.granted:
+            logger.info("Expired holds swept: %s", report.as_dict())
+    except Exception:
+        logger.exception("Cleanup Error")
         db.rollback()
+        result = "error"
     finally:
         # Sadece biz açtıysak biz kapatmalıyız
         if db_session is None:
-            db.close()
\ No newline at end of file
+            db.close()
+        SWEEP_DURATION.observe(time.perf_counter() - sweep_started, result)
+        SWEEP_RECLAIMED.inc(amount=report.rows)
+    return report
+
+
+def expire_reservation(reservation_id: int, db_session: Session = None) -> str:
+    """Expire a single hold at its ``expires_at``.
+
+    Safe to run any number of times and at any moment: a confirmed, already
+    swept or not-yet-due reservation is left alone. Returns what happened:
+    ``expired``, ``confirmed``, ``not_due`` or ``missing``.
+    """
+    db = db_session or SessionLocal()
+    try:
+        expired = _expire_batch(db, 1, datetime.utcnow(), reservation_id=reservation_id)
+        _release_capacity(db, expired)
+        db.commit()
+        if expired:
+            _admit_waiting(db, [expired[0].event_id])
+            reconcile_capacity_gate(db, [expired[0].event_id])
+            return "expired"
+        state = db.query(Reservation.state).filter(Reservation.id == reservation_id).scalar()
+        if state is None:
+            return "missing"
+        return "confirmed" if state == ReservationState.CONFIRMED else "not_due"
+    finally:
+        if db_session is None:
+            db.close()
+
+
+@celery.task(name="app.tasks.expire_reservation")
+def expire_reservation_task(reservation_id: int) -> str:
+    return expire_reservation(reservation_id)
+
+
+def schedule_expiry(reservation_id: int, expires_at: datetime):
+    """Enqueue the expiry of one hold with ETA ``expires_at`` (naive UTC).
+
+    A broker outage must not fail the hold itself; the periodic sweep in
+    ``cleanup_expired_holds`` still reclaims anything that was not enqueued.
+    """
+    try:
+        # Off the event loop when called from an async endpoint's run_sync
+        return off_loop(expire_reservation_task.apply_async, (reservation_id,), eta=expires_at, retry=False)
+    except Exception:
+        logger.exception("Could not schedule expiry for reservation %s", reservation_id)
+        return None
+
+
+@celery.task(name="app.tasks.relay_outbox")
+def relay_outbox_task() -> int:
+    return outbox.relay()
+
+
+def enqueue_outbox_relay():
+    """Leader job: have a worker drain the outbox.
+
+    The task expires after a few intervals, so triggers that pile up while
+    workers are down do not all run when they come back.
+    """
+    try:
+        return relay_outbox_task.apply_async(expires=settings.OUTBOX_RELAY_INTERVAL_SECONDS * 5, retry=False)
+    except Exception:
+        logger.exception("Could not enqueue the outbox relay")
+        return None
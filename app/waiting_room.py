@@ -0,0 +1,416 @@
+"""Waiting room: FIFO admission for sold-out events.
+
+Without it a sold-out hold answers 400 and clients retry in a loop, and every
+retry is another row lock on the event. With ``WAITING_ROOM`` on, the failing
+hold joins a per-event queue instead and answers 202 with a ticket. While an
+event has a queue, new holds join the back of it without touching the
+database at all, so nobody can overtake the queue by retrying.
+
+Seats come back through the expiry sweep (``app.tasks``). After releasing
+capacity it calls ``holds.admit_waiting``, which turns the oldest tickets into
+ordinary holds in one locked transaction per event. Clients poll
+``GET /reservations/queue/{ticket}`` (one Redis read, no database) and find
+the reservation id there once granted; the hold then expires like any other.
+
+A ticket that is not polled for ``WAITING_ROOM_TICKET_IDLE_SECONDS`` is
+dropped rather than granted, so abandoned clients do not burn seats, and
+no longer counts as a queue that new holds have to join.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+WAITING = "waiting"
+GRANTED = "granted"
+
+
+@dataclass(frozen=True)
+class Ticket:
+    id: str
+    event_id: int
+    user_id: int
+    seats: int
+    state: str = WAITING
+    # 1 = next in line; None once granted
+    position: Optional[int] = None
+    reservation_id: Optional[int] = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class Queued(Exception):
+    """Raised by ``create_hold`` when the request went to the waiting room."""
+
+    def __init__(self, ticket: Ticket):
+        super().__init__(ticket.id)
+        self.ticket = ticket
+
+
+def queued_response(request: Request, exc: Queued) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content=exc.ticket.as_dict(),
+        headers={
+            "Location": f"/reservations/queue/{exc.ticket.id}",
+            "Retry-After": str(settings.WAITING_ROOM_POLL_SECONDS),
+        },
+    )
+
+
+class WaitingRoom:
+    """Interface shared by the in-process and Redis waiting rooms."""
+
+    def join(self, event_id: int, user_id: int, seats: int) -> Ticket:
+        """Queue a hold; a user already waiting for the event keeps their ticket."""
+        raise NotImplementedError
+
+    def find(self, event_id: int, user_id: int) -> Optional[Ticket]:
+        """The user's waiting ticket for the event, if any."""
+        raise NotImplementedError
+
+    def get(self, ticket_id: str) -> Optional[Ticket]:
+        """Current state of a ticket; counts as a poll and keeps it alive."""
+        raise NotImplementedError
+
+    def leave(self, ticket_id: str) -> None:
+        raise NotImplementedError
+
+    def waiting(self, event_id: int) -> int:
+        """Live tickets in the queue; idle ones are dropped first."""
+        raise NotImplementedError
+
+    def events(self) -> List[int]:
+        """Events that have a queue."""
+        raise NotImplementedError
+
+    def head(self, event_id: int, limit: int) -> List[Ticket]:
+        """Up to ``limit`` oldest live tickets; idle ones are dropped on the way."""
+        raise NotImplementedError
+
+    def grant(self, ticket_id: str, reservation_id: int) -> None:
+        """Mark a ticket as turned into a hold and take it out of the queue."""
+        raise NotImplementedError
+
+    def close(self, event_id: int) -> None:
+        """Drop the whole queue (event deleted or deactivated)."""
+        raise NotImplementedError
+
+
+class InMemoryWaitingRoom(WaitingRoom):
+    """Single-process waiting room, also used by the tests."""
+
+    def __init__(self, idle_seconds: float, clock=time.monotonic):
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self._queues: Dict[int, "OrderedDict[str, None]"] = {}
+        self._tickets: Dict[str, Ticket] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._by_user: Dict[Tuple[int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, ticket_id: str) -> Optional[Ticket]:
+        ticket = self._tickets.get(ticket_id)
+        if ticket is not None and self._deadlines[ticket_id] <= self.clock():
+            self._drop(ticket)
+            return None
+        return ticket
+
+    def _drop(self, ticket: Ticket) -> None:
+        del self._tickets[ticket.id]
+        del self._deadlines[ticket.id]
+        queue = self._queues.get(ticket.event_id)
+        if queue is not None:
+            queue.pop(ticket.id, None)
+            if not queue:
+                del self._queues[ticket.event_id]
+        if self._by_user.get((ticket.event_id, ticket.user_id)) == ticket.id:
+            del self._by_user[(ticket.event_id, ticket.user_id)]
+
+    def _touch(self, ticket: Ticket) -> Ticket:
+        self._deadlines[ticket.id] = self.clock() + self.idle_seconds
+        if ticket.state == WAITING:
+            position = list(self._queues[ticket.event_id]).index(ticket.id) + 1
+            ticket = replace(ticket, position=position)
+        return ticket
+
+    def join(self, event_id, user_id, seats):
+        with self._lock:
+            ticket_id = self._by_user.get((event_id, user_id))
+            ticket = self._live(ticket_id) if ticket_id else None
+            if ticket is None:
+                ticket = Ticket(uuid.uuid4().hex, event_id, user_id, seats)
+                self._tickets[ticket.id] = ticket
+                self._queues.setdefault(event_id, OrderedDict())[ticket.id] = None
+                self._by_user[(event_id, user_id)] = ticket.id
+            return self._touch(ticket)
+
+    def find(self, event_id, user_id):
+        with self._lock:
+            ticket_id = self._by_user.get((event_id, user_id))
+            ticket = self._live(ticket_id) if ticket_id else None
+            return self._touch(ticket) if ticket is not None else None
+
+    def get(self, ticket_id):
+        with self._lock:
+            ticket = self._live(ticket_id)
+            return self._touch(ticket) if ticket is not None else None
+
+    def leave(self, ticket_id):
+        with self._lock:
+            ticket = self._tickets.get(ticket_id)
+            if ticket is not None:
+                self._drop(ticket)
+
+    def waiting(self, event_id):
+        with self._lock:
+            # An abandoned ticket must not make fresh holds queue behind it
+            for ticket_id in list(self._queues.get(event_id, ())):
+                self._live(ticket_id)
+            return len(self._queues.get(event_id, ()))
+
+    def events(self):
+        with self._lock:
+            return list(self._queues)
+
+    def head(self, event_id, limit):
+        with self._lock:
+            # Granted tickets nobody polls any more go here too
+            now = self.clock()
+            for ticket_id in [t for t, deadline in self._deadlines.items() if deadline <= now]:
+                self._drop(self._tickets[ticket_id])
+            tickets = []
+            for ticket_id in list(self._queues.get(event_id, ())):
+                ticket = self._live(ticket_id)
+                if ticket is not None:
+                    tickets.append(ticket)
+                    if len(tickets) == limit:
+                        break
+            return tickets
+
+    def grant(self, ticket_id, reservation_id):
+        with self._lock:
+            ticket = self._tickets.get(ticket_id)
+            if ticket is None or ticket.state != WAITING:
+                return
+            queue = self._queues[ticket.event_id]
+            del queue[ticket_id]
+            if not queue:
+                del self._queues[ticket.event_id]
+            self._by_user.pop((ticket.event_id, ticket.user_id), None)
+            self._tickets[ticket_id] = replace(ticket, state=GRANTED, reservation_id=reservation_id)
+
+    def close(self, event_id):
+        with self._lock:
+            for ticket_id in list(self._queues.get(event_id, ())):
+                self._drop(self._tickets[ticket_id])
+
+
+_JOIN_SCRIPT = """
+local existing = redis.call('GET', KEYS[1])
+if existing and redis.call('EXISTS', ARGV[6] .. existing) == 1 then
+  redis.call('EXPIRE', KEYS[1], ARGV[5])
+  redis.call('EXPIRE', ARGV[6] .. existing, ARGV[5])
+  redis.call('ZADD', KEYS[5], ARGV[7], existing)
+  return existing
+end
+local seq = redis.call('INCR', KEYS[4])
+local key = ARGV[6] .. ARGV[1]
+redis.call('HSET', key, 'event_id', ARGV[2], 'user_id', ARGV[3], 'seats', ARGV[4], 'state', 'waiting')
+redis.call('EXPIRE', key, ARGV[5])
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[5])
+redis.call('ZADD', KEYS[2], seq, ARGV[1])
+redis.call('ZADD', KEYS[5], ARGV[7], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[2])
+return ARGV[1]
+"""
+
+# Drop tickets not seen since ARGV[1], then count the rest
+_WAITING_SCRIPT = """
+local idle = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, ticket_id in ipairs(idle) do
+  local key = ARGV[2] .. ticket_id
+  local user_id = redis.call('HGET', key, 'user_id')
+  if user_id and redis.call('GET', ARGV[3] .. user_id) == ticket_id then
+    redis.call('DEL', ARGV[3] .. user_id)
+  end
+  redis.call('DEL', key)
+  redis.call('ZREM', KEYS[1], ticket_id)
+  redis.call('ZREM', KEYS[2], ticket_id)
+end
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+class RedisWaitingRoom(WaitingRoom):
+    """Waiting room shared by every worker.
+
+    One sorted set per event holds the queue (score = global join sequence),
+    a hash per ticket holds its state and expires when the ticket is not
+    polled, and a per-user key makes joining idempotent. A second sorted set
+    per event scores waiting tickets by when they were last polled, so
+    ``waiting`` can drop idle ones without reading every ticket.
+    """
+
+    key_prefix = "proxan:waiting:"
+
+    def __init__(self, client, idle_seconds: int, clock=time.time):
+        self.client = client
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self._join = client.register_script(_JOIN_SCRIPT)
+        self._waiting = client.register_script(_WAITING_SCRIPT)
+
+    def _queue_key(self, event_id):
+        return f"{self.key_prefix}queue:{event_id}"
+
+    def _seen_key(self, event_id):
+        return f"{self.key_prefix}seen:{event_id}"
+
+    def _ticket_key(self, ticket_id):
+        return f"{self.key_prefix}ticket:{ticket_id}"
+
+    def _user_key(self, event_id, user_id):
+        return f"{self.key_prefix}user:{event_id}:{user_id}"
+
+    @property
+    def _events_key(self):
+        return f"{self.key_prefix}events"
+
+    def _ticket(self, ticket_id, fields) -> Optional[Ticket]:
+        if not fields:
+            return None
+        fields = {key.decode(): value.decode() for key, value in fields.items()}
+        reservation_id = fields.get("reservation_id")
+        return Ticket(
+            id=ticket_id,
+            event_id=int(fields["event_id"]),
+            user_id=int(fields["user_id"]),
+            seats=int(fields["seats"]),
+            state=fields["state"],
+            reservation_id=int(reservation_id) if reservation_id else None,
+        )
+
+    def _touch(self, ticket: Ticket) -> Ticket:
+        pipe = self.client.pipeline()
+        pipe.expire(self._ticket_key(ticket.id), self.idle_seconds)
+        if ticket.state == WAITING:
+            pipe.expire(self._user_key(ticket.event_id, ticket.user_id), self.idle_seconds)
+            pipe.zadd(self._seen_key(ticket.event_id), {ticket.id: self.clock()}, xx=True)
+            pipe.zrank(self._queue_key(ticket.event_id), ticket.id)
+        rank = pipe.execute()[-1]
+        if ticket.state == WAITING and rank is not None:
+            ticket = replace(ticket, position=int(rank) + 1)
+        return ticket
+
+    def join(self, event_id, user_id, seats):
+        ticket_id = self._join(
+            keys=[self._user_key(event_id, user_id), self._queue_key(event_id),
+                  self._events_key, f"{self.key_prefix}seq", self._seen_key(event_id)],
+            args=[uuid.uuid4().hex, event_id, user_id, seats, self.idle_seconds, self._ticket_key(""),
+                  self.clock()],
+        ).decode()
+        return self.get(ticket_id)
+
+    def find(self, event_id, user_id):
+        ticket_id = self.client.get(self._user_key(event_id, user_id))
+        return self.get(ticket_id.decode()) if ticket_id else None
+
+    def get(self, ticket_id):
+        ticket = self._ticket(ticket_id, self.client.hgetall(self._ticket_key(ticket_id)))
+        return self._touch(ticket) if ticket is not None else None
+
+    def leave(self, ticket_id):
+        ticket = self._ticket(ticket_id, self.client.hgetall(self._ticket_key(ticket_id)))
+        if ticket is None:
+            return
+        pipe = self.client.pipeline()
+        pipe.zrem(self._queue_key(ticket.event_id), ticket_id)
+        pipe.zrem(self._seen_key(ticket.event_id), ticket_id)
+        pipe.delete(self._ticket_key(ticket_id), self._user_key(ticket.event_id, ticket.user_id))
+        pipe.execute()
+
+    def waiting(self, event_id):
+        return int(self._waiting(
+            keys=[self._queue_key(event_id), self._seen_key(event_id)],
+            args=[self.clock() - self.idle_seconds, self._ticket_key(""), self._user_key(event_id, "")],
+        ))
+
+    def events(self):
+        return [int(event_id) for event_id in self.client.smembers(self._events_key)]
+
+    def head(self, event_id, limit):
+        queue = self._queue_key(event_id)
+        tickets, start = [], 0
+        while len(tickets) < limit:
+            ticket_ids = [raw.decode() for raw in self.client.zrange(queue, start, start + limit - 1)]
+            if not ticket_ids:
+                break
+            pipe = self.client.pipeline()
+            for ticket_id in ticket_ids:
+                pipe.hgetall(self._ticket_key(ticket_id))
+            idle = []
+            for ticket_id, fields in zip(ticket_ids, pipe.execute()):
+                ticket = self._ticket(ticket_id, fields)
+                if ticket is None:
+                    idle.append(ticket_id)
+                elif len(tickets) < limit:
+                    tickets.append(ticket)
+            if idle:
+                self.client.zrem(queue, *idle)
+                self.client.zrem(self._seen_key(event_id), *idle)
+            start += len(ticket_ids) - len(idle)
+        if not tickets and not self.client.exists(queue):
+            self.client.srem(self._events_key, event_id)
+        return tickets
+
+    def grant(self, ticket_id, reservation_id):
+        ticket = self._ticket(ticket_id, self.client.hgetall(self._ticket_key(ticket_id)))
+        if ticket is None:
+            return
+        pipe = self.client.pipeline()
+        pipe.hset(self._ticket_key(ticket_id), mapping={"state": GRANTED, "reservation_id": reservation_id})
+        pipe.zrem(self._queue_key(ticket.event_id), ticket_id)
+        pipe.zrem(self._seen_key(ticket.event_id), ticket_id)
+        pipe.delete(self._user_key(ticket.event_id, ticket.user_id))
+        pipe.execute()
+
+    def close(self, event_id):
+        queue = self._queue_key(event_id)
+        ticket_ids = [raw.decode() for raw in self.client.zrange(queue, 0, -1)]
+        pipe = self.client.pipeline()
+        if ticket_ids:
+            pipe.delete(*[self._ticket_key(ticket_id) for ticket_id in ticket_ids])
+        pipe.delete(queue, self._seen_key(event_id))
+        pipe.srem(self._events_key, event_id)
+        pipe.execute()
+
+
+_room: Optional[WaitingRoom] = None
+
+
+def build_waiting_room(backend: str) -> Optional[WaitingRoom]:
+    if backend == "off":
+        return None
+    if backend == "memory":
+        return InMemoryWaitingRoom(settings.WAITING_ROOM_TICKET_IDLE_SECONDS)
+    if backend == "redis":
+        from app import redis_client
+
+        return RedisWaitingRoom(redis_client.from_url(settings.REDIS_URL), settings.WAITING_ROOM_TICKET_IDLE_SECONDS)
+    raise ValueError(f"Unknown WAITING_ROOM backend: {backend}")
+
+
+def get_waiting_room() -> Optional[WaitingRoom]:
+    global _room
+    if _room is None:
+        _room = build_waiting_room(settings.WAITING_ROOM)
+    return _room
@@ -1,8 +1,12 @@
 from celery import Celery
 from app.config import settings
 
-celery = Celery(__name__, broker=settings.REDIS_URL, backend=settings.REDIS_URL)
+celery = Celery(__name__, broker=settings.REDIS_URL, backend=settings.REDIS_URL, include=["app.tasks"])
 
 celery.conf.task_routes = {
     "app.tasks.*": {"queue": "default"}
 }
+# Workers started without -Q must consume the queue tasks are routed to
+celery.conf.task_default_queue = "default"
+# Expiry tasks are fire-and-forget; their return value is only for logs/tests
+celery.conf.task_ignore_result = True
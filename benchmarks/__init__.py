@@ -0,0 +1 @@
+# Proxan benchmarks - run as `python -m benchmarks.<name> --help`
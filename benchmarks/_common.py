@@ -0,0 +1,75 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import sys
+import tempfile
+from statistics import mean
+from typing import Dict, Iterable, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import Base, Event, User  # noqa: E402
+
+
+def make_engine(url: Optional[str] = None, pool_size: int = 20):
+    """Engine for a benchmark run; defaults to a throwaway SQLite file."""
+    if not url:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="proxan-bench-"), "bench.db")
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 60})
+
+        # Writers queue on BEGIN IMMEDIATE instead of failing with "database is locked"
+        @event.listens_for(engine, "connect")
+        def _disable_pysqlite_begin(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def _begin_immediate(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        engine = create_engine(url, pool_size=pool_size, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def seed_event(engine, capacity: int, title: str = "Benchmark"):
+    """Create a user and an event; returns ``(user_id, event_id)``."""
+    session = sessionmaker(bind=engine)()
+    try:
+        user = User(username=f"bench-{os.urandom(6).hex()}", hashed_password="x")
+        evt = Event(title=title, capacity=capacity, available_capacity=capacity, is_active=True)
+        session.add_all([user, evt])
+        session.commit()
+        return user.id, evt.id
+    finally:
+        session.close()
+
+
+def latency_summary(samples: Iterable[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max in milliseconds from samples in seconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(mean(ordered) * 1000, 3),
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def emit(result, output: Optional[str] = None) -> None:
+    text = json.dumps(result, indent=2, default=str)
+    if output:
+        with open(output, "w") as fh:
+            fh.write(text + "\n")
+    print(text)
@@ -0,0 +1,129 @@
+"""Cost of the instrumentation in app/metrics.py.
+
+Three measurements:
+
+* ``primitives`` - one ``Counter.inc``, ``Histogram.observe``, a
+  ``Histogram.time()`` block and a ``count_outcomes``-wrapped call, each
+  minus the cost of the bare loop or bare call
+* ``middleware`` - a minimal ASGI app driven directly (no HTTP client noise)
+  with and without ``MetricsMiddleware``; the difference is what every
+  request pays
+* ``scrape``     - rendering ``/metrics`` with ``--series`` route series
+
+    python -m benchmarks.metrics_overhead --iterations 200000
+
+The budget is 25 microseconds of middleware overhead per request;
+``within_budget`` reports it against the median difference.
+"""
+import argparse
+import asyncio
+import time
+from statistics import median
+from types import SimpleNamespace
+
+from benchmarks._common import emit
+from app import metrics
+
+BUDGET_US = 25.0
+
+
+def _per_call_ns(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def primitives(iterations):
+    counter = metrics.Counter("bench_total", "bench", ("outcome",))
+    histogram = metrics.Histogram("bench_seconds", "bench", ("route",))
+
+    def noop():
+        return None
+
+    wrapped = metrics.count_outcomes(counter, {})(noop)
+
+    def timed():
+        with histogram.time("/hold"):
+            pass
+
+    baseline = _per_call_ns(noop, iterations)
+    return {
+        "counter_inc_ns": round(_per_call_ns(lambda: counter.inc("success"), iterations) - baseline, 1),
+        "histogram_observe_ns": round(_per_call_ns(lambda: histogram.observe(0.003, "/hold"), iterations) - baseline, 1),
+        "histogram_time_block_ns": round(_per_call_ns(timed, iterations) - baseline, 1),
+        "count_outcomes_wrapper_ns": round(_per_call_ns(wrapped, iterations) - baseline, 1),
+    }
+
+
+ROUTE = SimpleNamespace(path="/reservations/hold")
+
+
+async def _endpoint(scope, receive, send):
+    scope["route"] = ROUTE
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _drive(app, iterations):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    samples = []
+    for _ in range(iterations):
+        scope = {"type": "http", "method": "POST", "path": "/reservations/hold", "headers": []}
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def middleware(iterations, rounds=5):
+    wrapped = metrics.MetricsMiddleware(_endpoint)
+    bare_runs, wrapped_runs = [], []
+    # Interleave the runs so drift in the machine hits both sides
+    for _ in range(rounds):
+        bare_runs.append(median(asyncio.run(_drive(_endpoint, iterations))))
+        wrapped_runs.append(median(asyncio.run(_drive(wrapped, iterations))))
+    bare_us, wrapped_us = median(bare_runs) * 1e6, median(wrapped_runs) * 1e6
+    overhead = wrapped_us - bare_us
+    return {
+        "bare_request_us": round(bare_us, 2),
+        "instrumented_request_us": round(wrapped_us, 2),
+        "overhead_us": round(overhead, 2),
+        "within_budget": overhead < BUDGET_US,
+    }
+
+
+def scrape(series):
+    registry = metrics.Registry()
+    histogram = registry.register(metrics.Histogram("bench_seconds", "bench", ("method", "route", "status")))
+    for i in range(series):
+        histogram.observe(0.01, "GET", f"/route/{i}", "200")
+    started = time.perf_counter()
+    body = registry.render()
+    return {"series": series, "render_ms": round((time.perf_counter() - started) * 1000, 3), "bytes": len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--series", type=int, default=200, help="route series in the scrape measurement")
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    emit({
+        "benchmark": "metrics_overhead",
+        "budget_us": BUDGET_US,
+        "iterations": args.iterations,
+        "primitives": primitives(args.iterations),
+        "middleware": middleware(args.iterations // 10),
+        "scrape": scrape(args.series),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
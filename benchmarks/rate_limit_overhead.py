@@ -0,0 +1,64 @@
+"""Per-request cost of the hold rate limiter in app/rate_limit.py.
+
+Times ``check_hold_rate`` alone, the way the hold endpoints call it (user,
+event and global bucket), over ``--users`` distinct callers and
+``--events`` events so the bucket table has a realistic size. Limits are
+set high enough that nothing is rejected: this measures the admitted path.
+
+    python -m benchmarks.rate_limit_overhead --requests 200000
+    python -m benchmarks.rate_limit_overhead --backend redis --requests 20000
+
+The budget is one millisecond per request; ``within_budget`` reports it
+against p99.
+"""
+import argparse
+import random
+import time
+
+from benchmarks._common import emit, latency_summary
+from app import rate_limit
+from app.config import settings
+
+BUDGET_MS = 1.0
+
+
+def run(backend, requests, users, events):
+    settings.RATE_LIMIT_BACKEND = backend
+    settings.RATE_LIMIT_USER_RATE = settings.RATE_LIMIT_EVENT_RATE = settings.RATE_LIMIT_GLOBAL_RATE = 1e9
+    settings.RATE_LIMIT_USER_BURST = settings.RATE_LIMIT_EVENT_BURST = settings.RATE_LIMIT_GLOBAL_BURST = 10 ** 9
+    rate_limit._limiter = None
+    rate_limit.get_rate_limiter()
+
+    rng = random.Random(42)
+    calls = [(rng.randrange(users), rng.randrange(events)) for _ in range(requests)]
+    latencies = []
+    started = time.perf_counter()
+    for user_id, event_id in calls:
+        t0 = time.perf_counter()
+        rate_limit.check_hold_rate(user_id, [event_id])
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    summary = latency_summary(latencies)
+    return {
+        "backend": backend,
+        "checks_per_second": round(requests / elapsed),
+        "latency": summary,
+        "within_budget": summary["p99_ms"] < BUDGET_MS,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", nargs="+", default=["memory"], choices=["memory", "redis"])
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    results = [run(backend, args.requests, args.users, args.events) for backend in args.backend]
+    emit({"benchmark": "rate_limit_overhead", "budget_ms": BUDGET_MS, "requests": args.requests, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Per-response serialization cost: the pydantic path vs app/serializers.py.
+
+For a ``ReservationOut`` (hold / confirm), a 20-item batch hold and an
+``EventOut`` (create event) this times building the response body from ORM
+objects that are already loaded, which is the work left after the database:
+
+* ``pydantic``  - ``Model.from_orm`` + ``jsonable_encoder`` + ``JSONResponse``,
+  what FastAPI does for ``response_model``
+* ``fast``      - ``serializers.respond`` (compiled serializer + orjson, or
+  the stdlib encoder with ``--stdlib``)
+
+Both must produce identical bytes; ``identical`` reports the check.
+
+    python -m benchmarks.serialization --iterations 20000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from statistics import median
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks._common import emit
+from app import schemas, serializers
+from app.models import Event, Reservation, ReservationState
+
+
+def _reservation(i):
+    now = datetime.utcnow()
+    return Reservation(id=i, user_id=42, event_id=7, quantity=1, state=ReservationState.HOLD,
+                       expires_at=now + timedelta(minutes=10), created_at=now)
+
+
+def _event():
+    return Event(id=7, title="Flash sale konseri", capacity=5000, available_capacity=1234,
+                 start_date=datetime(2025, 6, 1, 20, 0), end_date=None, is_active=True)
+
+
+def _pydantic(model, result):
+    if isinstance(result, list):
+        return JSONResponse(jsonable_encoder([model.from_orm(item) for item in result]))
+    return JSONResponse(jsonable_encoder(model.from_orm(result)))
+
+
+def _per_call_us(func, iterations, rounds=5):
+    runs = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        runs.append((time.perf_counter() - started) / iterations * 1e6)
+    return median(runs)
+
+
+def measure(name, model, result, iterations):
+    identical = _pydantic(model, result).body == serializers.respond(model, result).body
+    slow = _per_call_us(lambda: _pydantic(model, result), iterations)
+    fast = _per_call_us(lambda: serializers.respond(model, result), iterations)
+    return {
+        "case": name,
+        "pydantic_us": round(slow, 2),
+        "fast_us": round(fast, 2),
+        "speedup": round(slow / fast, 1),
+        "identical": identical,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--stdlib", action="store_true", help="render with the stdlib encoder instead of orjson")
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    if args.stdlib:
+        serializers.orjson = None
+    cases = [
+        measure("reservation", schemas.ReservationOut, _reservation(1), args.iterations),
+        measure("batch_20", schemas.ReservationOut, [_reservation(i) for i in range(20)], args.iterations // 10),
+        measure("event", schemas.EventOut, _event(), args.iterations),
+    ]
+    emit({
+        "benchmark": "serialization",
+        "encoder": "orjson" if serializers.orjson is not None else "stdlib",
+        "iterations": args.iterations,
+        "cases": cases,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,22 @@
 import pytest
 import sys
 import os
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from types import SimpleNamespace
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker
 
 # Proje kök dizinini Python yoluna ekleyerek 'app' modülünün her ortamda bulunmasını sağlar
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.models import Base, Event, Reservation, ReservationState
+from app.models import Base, Event, Reservation, ReservationState, User
 from app.main import app
-from app.db import get_db
+from app.db import get_db, get_read_db
+from app import sql_profile
 
 # Auth bypass için dependency'yi yakalıyoruz
 try:
@@ -60,11 +63,18 @@ def db():
     finally:
         session.close()
         Base.metadata.drop_all(bind=engine)
+        # drop_all ORM event'lerini tetiklemez; önbellekte eski kullanıcı kalmasın
+        from app.principals import get_principal_cache
+        from app.event_cache import get_event_cache
+        for cache in (get_principal_cache(), get_event_cache()):
+            if cache is not None:
+                cache.clear()
 
 @pytest.fixture(scope="function")
 def client(db):
     """FastAPI bağımlılıklarını test nesneleriyle (DB ve Mock Auth) değiştirir."""
     app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_read_db] = lambda: db
     
     if get_current_user:
         # AttributeError'u engelleyen ve current_user.id'ye erişim sağlayan yapı
@@ -76,6 +86,28 @@ def client(db):
     
     app.dependency_overrides.clear()
 
+@pytest.fixture
+def admin(client):
+    """``client``, but the mock user passes ``require_admin``."""
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=1, username="admin", is_admin=True)
+    return client
+
+@pytest.fixture
+def query_budget():
+    """``with query_budget(3): ...`` fails if the block runs more than 3 SQL statements.
+
+    Counts statements from every thread, so requests made through TestClient
+    are included. The statements are listed in the failure message.
+    """
+    @contextmanager
+    def _budget(limit):
+        with sql_profile.capture() as profile:
+            yield profile
+        assert profile.count <= limit, (
+            f"{profile.count} SQL statements, budget {limit}:\n{profile.report()}"
+        )
+    return _budget
+
 @pytest.fixture
 def hold_reservation(db):
     """Onaylama testleri için 'HOLD' durumunda hazır rezervasyon."""
@@ -100,4 +132,67 @@ def expired_hold(db):
     db.add(res)
     db.commit()
     db.refresh(res)
-    return res
\ No newline at end of file
+    return res
+
+# --- Eşzamanlılık testleri için gerçek bağlantı havuzlu veritabanları ---
+def _sqlite_file_engine(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+
+    # pysqlite BEGIN'i geciktirir; BEGIN IMMEDIATE ile yazarlar kilitlenmeden sıraya girer
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+def _postgres_engine():
+    url = os.getenv("TEST_POSTGRES_URL") or os.getenv("DATABASE_URL")
+    if not url or not url.startswith("postgresql"):
+        pytest.skip("Postgres not configured (set TEST_POSTGRES_URL)")
+    engine = create_engine(url, pool_size=20, max_overflow=0, connect_args={"connect_timeout": 2})
+    try:
+        engine.connect().close()
+    except OperationalError:
+        pytest.skip("Postgres not reachable")
+    return engine
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def concurrent_engine(request, tmp_path):
+    """Çok bağlantılı motor: SQLite dosyası veya (varsa) gerçek Postgres."""
+    if request.param == "postgres":
+        engine = _postgres_engine()
+    else:
+        engine = _sqlite_file_engine(tmp_path / "concurrency.db")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def pg_engine():
+    engine = _postgres_engine()
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def make_event():
+    """Verilen motorda kullanıcı ve etkinlik oluşturup kimliklerini döner."""
+    def _make(engine, capacity, **fields):
+        session = sessionmaker(bind=engine)()
+        try:
+            user = User(username=f"load-{os.urandom(6).hex()}", hashed_password="x")
+            evt = Event(title="Load Test", capacity=capacity, available_capacity=capacity, is_active=True, **fields)
+            session.add_all([user, evt])
+            session.commit()
+            return SimpleNamespace(user_id=user.id, event_id=evt.id)
+        finally:
+            session.close()
+    return _make
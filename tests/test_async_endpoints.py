@@ -0,0 +1,106 @@
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base, get_async_db
+from app.models import Event
+from app.routers import aio
+
+
+@pytest.fixture
+def async_app():
+    engine = create_async_engine("sqlite+aiosqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(aio.router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.state.engine = engine
+    app.state.sessions = AsyncSessionLocal
+    return app
+
+
+@pytest.mark.asyncio
+async def test_async_reservation_flow(async_app):
+    async with async_app.state.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_app.state.sessions() as db:
+        db.add(Event(id=1, title="Async", capacity=2, available_capacity=2, is_active=True))
+        await db.commit()
+
+    transport = ASGITransport(app=async_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        r = await ac.post("/auth/register", json={"username": "bob", "password": "secret"})
+        assert r.status_code == 200
+        assert (await ac.post("/auth/register", json={"username": "bob", "password": "x"})).status_code == 400
+
+        r = await ac.post("/auth/token", data={"username": "bob", "password": "secret"})
+        assert r.status_code == 200
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        assert (await ac.post("/auth/token", data={"username": "bob", "password": "nope"})).status_code == 400
+
+        holds = [await ac.post("/reservations/hold", json={"event_id": 1}, headers=headers) for _ in range(3)]
+        assert [h.status_code for h in holds] == [200, 200, 400]
+
+        r = await ac.post(f"/reservations/confirm/{holds[0].json()['id']}", headers=headers)
+        assert r.json()["state"] == "CONFIRMED"
+
+        detail = (await ac.get("/events/1")).json()
+        assert (detail["available_capacity"], detail["hold_count"], detail["confirmed_count"]) == (0, 1, 1)
+
+    await async_app.state.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_off_loop_moves_blocking_calls_off_the_event_loop():
+    import threading
+
+    from app.db import off_loop
+
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    loop_thread = threading.get_ident()
+    # Outside run_sync it is a plain call
+    assert off_loop(threading.get_ident) == loop_thread
+    async with AsyncSession(engine) as db:
+        assert await db.run_sync(lambda _: off_loop(threading.get_ident)) != loop_thread
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_redis_gate_runs_off_the_event_loop_inside_run_sync():
+    import threading
+
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    import redis
+    from app.capacity_gate import RedisCapacityGate
+    from app.redis_client import LoopSafeRedis
+
+    threads = set()
+
+    class RecordingConnection(fakeredis.FakeConnection):
+        def send_command(self, *args, **kwargs):
+            threads.add(threading.get_ident())
+            return super().send_command(*args, **kwargs)
+
+    client = LoopSafeRedis(connection_pool=redis.ConnectionPool(
+        connection_class=RecordingConnection, server=fakeredis.FakeServer()))
+    gate = RedisCapacityGate(client)
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    def hold_path(_):
+        gate.set(1, 2)
+        return gate.reserve(1, 2), gate.reserve(1, 1)
+
+    async with AsyncSession(engine) as db:
+        first, second = await db.run_sync(hold_path)
+    assert (first, second) == (True, False)
+    assert threads and threading.get_ident() not in threads
+    await engine.dispose()
@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app import holds, inventory
+from app.consistency import check_capacity, check_event_counters
+from app.models import Event, Reservation, ReservationState
+from app.tasks import cleanup_expired_holds
+
+
+def _second_event(db, capacity=5):
+    db.add(Event(id=2, title="İkinci", capacity=capacity, available_capacity=capacity, is_active=True))
+    db.commit()
+
+
+def _detail(client, event_id=1):
+    body = client.get(f"/events/{event_id}").json()
+    return body["available_capacity"], body["hold_count"], body["confirmed_count"]
+
+
+def test_multi_seat_hold_lifecycle(client, db):
+    response = client.post("/reservations/hold", json={"event_id": 1, "quantity": 3})
+    assert response.status_code == 200 and response.json()["quantity"] == 3
+    assert _detail(client) == (97, 3, 0)
+
+    client.post(f"/reservations/confirm/{response.json()['id']}")
+    assert _detail(client) == (97, 0, 3)
+
+    client.post("/reservations/hold", json={"event_id": 1, "quantity": 4})
+    db.query(Reservation).filter(Reservation.state == ReservationState.HOLD).update(
+        {"expires_at": datetime.utcnow() - timedelta(minutes=1)}
+    )
+    db.commit()
+    cleanup_expired_holds(db_session=db)
+    assert _detail(client) == (97, 0, 3)
+    assert check_event_counters(db) == [] and check_capacity(db) == []
+
+
+def test_seat_limits(client):
+    assert client.post("/reservations/hold", json={"event_id": 1, "quantity": 0}).status_code == 422
+    response = client.post("/reservations/hold", json={"event_id": 1, "quantity": 11})
+    assert (response.status_code, response.json()["detail"]) == (400, "Too many seats")
+
+
+def test_batch_hold_takes_every_event(client, db):
+    _second_event(db)
+    response = client.post("/reservations/hold/batch", json={"items": [
+        {"event_id": 2, "quantity": 2}, {"event_id": 1, "quantity": 1}, {"event_id": 2, "quantity": 1},
+    ]})
+    assert response.status_code == 200
+    assert [(r["event_id"], r["quantity"]) for r in response.json()] == [(1, 1), (2, 3)]
+    assert _detail(client, 1) == (99, 1, 0)
+    assert _detail(client, 2) == (2, 3, 0)
+
+
+def test_batch_hold_is_all_or_nothing(client, db):
+    _second_event(db, capacity=1)
+    response = client.post("/reservations/hold/batch", json={"items": [
+        {"event_id": 1, "quantity": 2}, {"event_id": 2, "quantity": 2},
+    ]})
+    assert (response.status_code, response.json()["detail"]) == (400, "No capacity")
+    assert client.post("/reservations/hold/batch", json={"items": [
+        {"event_id": 1, "quantity": 1}, {"event_id": 999, "quantity": 1},
+    ]}).status_code == 404
+    assert _detail(client, 1) == (100, 0, 0)
+    assert db.query(Reservation).count() == 0
+
+
+def test_multi_seat_hold_spans_drained_shards(db):
+    inventory.set_shard_count(db, 1, 20)  # 5 seats per shard
+    db.commit()
+    reservation = holds.create_hold(db, 1, 1, seats=8)
+    assert reservation.shard_no is not None
+    assert inventory.shard_totals(db, [1])[1][:3] == (92, 8, 0)
+    assert check_event_counters(db) == [] and check_capacity(db) == []
+
+
+def test_crossed_batches_do_not_deadlock(concurrent_engine, make_event):
+    a = make_event(concurrent_engine, capacity=40)
+    b = make_event(concurrent_engine, capacity=40)
+    Session = sessionmaker(bind=concurrent_engine)
+
+    def batch(i):
+        db = Session()
+        try:
+            pairs = [(a.event_id, 1), (b.event_id, 1)]
+            holds.create_holds(db, pairs if i % 2 else pairs[::-1], a.user_id)
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(batch, range(40)))
+
+    db = Session()
+    assert [db.get(Event, ids.event_id).available_capacity for ids in (a, b)] == [0, 0]
+    db.close()
@@ -0,0 +1,204 @@
+import json
+
+import pytest
+from sqlalchemy import event as sa_event, text
+from sqlalchemy.orm import sessionmaker
+
+from conftest import TestingSessionLocal
+from app import bulk, capacity_gate, waiting_room
+from app import db as db_module
+from app.config import settings
+from app.capacity_gate import InMemoryCapacityGate
+from app.models import Event
+from app.waiting_room import InMemoryWaitingRoom
+
+CSV = "text/csv"
+NDJSON = "application/x-ndjson"
+
+
+def _titles(db):
+    db.expire_all()
+    return [title for (title,) in db.query(Event.title).filter(Event.id > 1).order_by(Event.id)]
+
+
+def test_bulk_endpoints_require_admin(client):
+    assert client.post("/events/import", content="title,capacity\nA,1\n", headers={"Content-Type": CSV}).status_code == 403
+    assert client.post("/events/bulk/deactivate", json={"ids": [1]}).status_code == 403
+    assert client.post("/events/bulk/capacity", json={"ids": [1], "delta": 5}).status_code == 403
+
+
+def test_csv_import_reports_bad_rows_and_loads_the_rest(admin, db, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_CHUNK_SIZE", 2)
+    body = (
+        "title,capacity,start_date,is_active\n"
+        "Açılış,100,2025-06-01T20:00:00,\n"
+        "Broken,lots,,\n"
+        ",5,,false\n"
+        "Kapanış,50,,false\n"
+        "Extra,1,,,surplus\n"
+        "Final,10,not-a-date,\n"
+    )
+    response = admin.post("/events/import", content=body.encode(), headers={"Content-Type": CSV})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["rows"], report["inserted"], report["failed"]) == (6, 2, 4)
+    assert [error["line"] for error in report["errors"]] == [3, 4, 6, 7]
+    assert report["errors"][0]["errors"] == ["capacity: value is not a valid integer"]
+    assert report["errors"][1]["errors"] == ["title: field required"]
+    assert _titles(db) == ["Açılış", "Kapanış"]
+    kapanis = db.query(Event).filter_by(title="Kapanış").one()
+    assert (kapanis.available_capacity, kapanis.is_active) == (50, False)
+
+
+def test_ndjson_import(admin, db):
+    lines = [
+        json.dumps({"title": "One", "capacity": 3}),
+        "",
+        "{not json",
+        json.dumps([1, 2]),
+        json.dumps({"title": "Two", "capacity": 4, "is_active": None}),
+    ]
+    report = admin.post("/events/import", content="\n".join(lines), headers={"Content-Type": NDJSON}).json()
+    assert (report["inserted"], report["failed"]) == (2, 2)
+    assert [(e["line"], e["errors"][0][:12]) for e in report["errors"]] == [(3, "invalid JSON"), (4, "expected a J")]
+    assert _titles(db) == ["One", "Two"]
+    assert db.query(Event).filter_by(title="Two").one().is_active is True
+
+
+def test_import_streams_chunked_body(admin, db):
+    rows = "".join(f"Gösteri {i},{i}\n" for i in range(500))
+    payload = ("title,capacity\n" + rows).encode()
+    # Chunk boundaries fall inside lines and inside multi-byte characters
+    chunks = (payload[i:i + 37] for i in range(0, len(payload), 37))
+    report = admin.post("/events/import", content=chunks, headers={"Content-Type": CSV}).json()
+    assert report["inserted"] == 500
+    assert _titles(db)[-1] == "Gösteri 499"
+
+
+def test_rejected_chunk_is_retried_row_by_row(admin, db):
+    db.execute(text(
+        "CREATE TRIGGER reject_boom BEFORE INSERT ON events WHEN NEW.title = 'boom' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    ))
+    db.commit()
+    body = "title,capacity\nok-1,1\nboom,1\nok-2,1\n"
+    report = admin.post("/events/import", content=body, headers={"Content-Type": CSV}).json()
+    assert (report["inserted"], report["failed"]) == (2, 1)
+    assert report["errors"][0]["line"] == 3 and "rejected" in report["errors"][0]["errors"][0]
+    assert _titles(db) == ["ok-1", "ok-2"]
+
+
+def test_copy_writes_missing_dates_as_null(pg_engine, monkeypatch):
+    db = sessionmaker(bind=pg_engine)()
+    copies, inserts = [], []
+    copy = bulk._copy
+    monkeypatch.setattr(bulk, "_copy", lambda session, rows: copies.append(len(rows)) or copy(session, rows))
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT"):
+            inserts.append(statement)
+
+    sa_event.listen(pg_engine, "before_cursor_execute", _record)
+    try:
+        body = "title,capacity,start_date\ncopy-null-1,5,\ncopy-null-2,5,2026-01-01T20:00:00\n"
+        report = bulk.import_events(db, bulk.parse_csv(body.splitlines(keepends=True)))
+        assert (report.inserted, report.failed) == (2, 0)
+        # One COPY for the chunk, no row-by-row fallback
+        assert copies == [2] and inserts == []
+        rows = db.execute(text(
+            "SELECT title, start_date, end_date FROM events WHERE title LIKE 'copy-null-%' ORDER BY title"
+        )).all()
+        assert [(title, start is None, end) for title, start, end in rows] == [
+            ("copy-null-1", True, None), ("copy-null-2", False, None)]
+    finally:
+        sa_event.remove(pg_engine, "before_cursor_execute", _record)
+        db.execute(text("DELETE FROM events WHERE title LIKE 'copy-null-%'"))
+        db.commit()
+        db.close()
+
+
+def test_import_rejects_unknown_content_type(admin):
+    assert admin.post("/events/import", content="{}", headers={"Content-Type": "application/json"}).status_code == 415
+
+
+def test_import_is_one_insert_per_chunk(admin, query_budget, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_CHUNK_SIZE", 100)
+    body = "title,capacity\n" + "".join(f"E{i},5\n" for i in range(250))
+    with query_budget(3):
+        assert admin.post("/events/import", content=body, headers={"Content-Type": CSV}).json()["inserted"] == 250
+
+
+def test_cli_import(db, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(db_module, "SessionLocal", TestingSessionLocal)
+    path = tmp_path / "season.ndjson"
+    path.write_text("\n".join(json.dumps({"title": f"CLI {i}", "capacity": 10}) for i in range(5)) + "\n")
+    assert bulk.main(["import", str(path)]) == 0
+    assert json.loads(capsys.readouterr().out)["inserted"] == 5
+
+    bad = tmp_path / "bad.csv"
+    bad.write_text("title,capacity\nX,-\n")
+    assert bulk.main(["import", str(bad)]) == 1
+    assert len(_titles(db)) == 5
+
+
+@pytest.fixture
+def many_events(db):
+    db.add_all([Event(id=i, title=f"E{i}", capacity=10, available_capacity=10 - i % 3, is_active=True)
+                for i in range(2, 32)])
+    db.commit()
+    return list(range(2, 32))
+
+
+def test_bulk_deactivate_and_activate_are_one_statement(admin, db, many_events, query_budget):
+    with query_budget(1):
+        assert admin.post("/events/bulk/deactivate", json={"ids": many_events}).json() == {"updated": 30}
+    assert admin.post("/events/bulk/deactivate", json={"ids": many_events}).json() == {"updated": 0}
+    db.expire_all()
+    assert db.query(Event).filter(Event.is_active.is_(False)).count() == 30
+    assert admin.post("/reservations/hold", json={"event_id": 2}).json()["detail"] == "Event is not active"
+
+    assert admin.post("/events/bulk/activate", json={"ids": [2, 3]}).json() == {"updated": 2}
+    assert admin.post("/reservations/hold", json={"event_id": 2}).status_code == 200
+
+
+def test_deactivate_drops_gate_counters_and_queues(admin, db, many_events, monkeypatch):
+    gate, room = InMemoryCapacityGate(), InMemoryWaitingRoom(idle_seconds=60)
+    monkeypatch.setattr(capacity_gate, "_gate", gate)
+    monkeypatch.setattr(waiting_room, "_room", room)
+    gate.reconcile(db, [2, 3])
+    ticket = room.join(2, 1, 1)
+
+    admin.post("/events/bulk/deactivate", json={"ids": [2, 3]})
+    assert (gate.get(2), gate.get(3)) == (None, None)
+    assert room.waiting(2) == 0 and room.get(ticket.id) is None
+    # The database, not a stale counter, answers for an inactive event
+    assert admin.post("/reservations/hold", json={"event_id": 2}).json()["detail"] == "Event is not active"
+
+    admin.post("/events/bulk/activate", json={"ids": [2]})
+    assert gate.get(2) == 8
+
+
+def test_bulk_capacity_adjust(admin, db, many_events, query_budget):
+    db.add(Event(id=40, title="Sharded", capacity=10, available_capacity=0, capacity_shards=2, is_active=True))
+    db.commit()
+    version_before = db.get(Event, 5).version
+
+    with query_budget(2):
+        result = admin.post("/events/bulk/capacity", json={"ids": many_events + [40, 999], "delta": 5}).json()
+    assert result == {"updated": many_events, "skipped": [40, 999]}
+    db.expire_all()
+    event = db.get(Event, 5)
+    assert (event.capacity, event.available_capacity, event.version) == (15, 13, version_before + 1)
+
+    # Free seats are now 13, 15 and 14: only events with 14 free can give 14 back
+    result = admin.post("/events/bulk/capacity", json={"ids": [2, 3, 4], "delta": -14}).json()
+    assert result == {"updated": [3, 4], "skipped": [2]}
+    db.expire_all()
+    assert (db.get(Event, 3).capacity, db.get(Event, 3).available_capacity) == (1, 1)
+
+
+def test_capacity_increase_refreshes_cached_detail(admin, many_events):
+    assert admin.get("/events/2").json()["available_capacity"] == 8
+    admin.post("/events/bulk/capacity", json={"ids": [2], "delta": 2})
+    assert admin.get("/events/2").json()["available_capacity"] == 10
@@ -0,0 +1,197 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app import capacity_gate
+from app.capacity_gate import InMemoryCapacityGate
+from app.models import Event, Reservation, ReservationState
+from app.tasks import cleanup_expired_holds
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    gate = InMemoryCapacityGate()
+    monkeypatch.setattr(capacity_gate, "_gate", gate)
+    return gate
+
+
+def test_sold_out_rejected_without_touching_event(client, db, gate):
+    gate.set(1, 0)
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No capacity"
+    # The DB still has stock; only the gate answered
+    assert db.get(Event, 1).available_capacity == 100
+    assert db.query(Reservation).count() == 0
+
+
+def test_winner_consumes_gate_and_db(client, db, gate):
+    gate.reconcile(db)
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert response.status_code == 200
+    assert gate.get(1) == 99
+    db.expire_all()
+    assert db.get(Event, 1).available_capacity == 99
+
+
+def test_unknown_event_primes_counter_after_commit(client, gate):
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert response.status_code == 200
+    assert gate.get(1) == 99
+
+
+def test_failed_hold_releases_seat(client, db, gate):
+    gate.set(42, 5)
+    response = client.post("/reservations/hold", json={"event_id": 42})
+    assert response.status_code == 404
+    assert gate.get(42) == 5
+
+
+def test_sweep_after_a_rejected_hold_is_not_overwritten(client, db, gate, monkeypatch):
+    # The gate still counts a seat the database no longer has; the one
+    # expired hold will give it back
+    event = db.get(Event, 1)
+    event.available_capacity, event.hold_count = 0, 1
+    db.add(Reservation(event_id=1, user_id=1, state=ReservationState.HOLD,
+                       expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.commit()
+    gate.set(1, 1)
+
+    swept = []
+    for name in ("set", "release"):
+        original = getattr(gate, name)
+
+        def sweep_first(event_id, seats, _original=original):
+            # The sweep commits and reconciles between the failed hold's
+            # rollback and its own gate write
+            if not swept:
+                swept.append(None)  # the sweep's own reconcile comes through here too
+                swept[0] = cleanup_expired_holds(db_session=db).rows
+            return _original(event_id, seats)
+
+        monkeypatch.setattr(gate, name, sweep_first)
+
+    assert client.post("/reservations/hold", json={"event_id": 1}).json()["detail"] == "No capacity"
+    assert swept == [1]
+    # The freed seat must stay visible to the gate ...
+    assert gate.get(1) >= 1
+    # ... so the next buyer gets it
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+
+
+def test_cleanup_reconciles_counter(db, gate):
+    event = db.get(Event, 1)
+    event.available_capacity = 98
+    db.add_all([
+        Reservation(event_id=1, user_id=1, state=ReservationState.HOLD,
+                    expires_at=datetime.utcnow() - timedelta(minutes=1))
+        for _ in range(2)
+    ])
+    db.commit()
+    gate.set(1, 0)
+
+    cleanup_expired_holds(db_session=db)
+
+    assert gate.get(1) == 100
+
+
+# --- RedisCapacityGate ---
+class StubRedis:
+    """Just enough of ``redis.Redis`` for the gate; scripts run as Python ports."""
+
+    def __init__(self):
+        self.data = {}
+        self.scripts = {
+            capacity_gate._RESERVE_SCRIPT: self._reserve,
+            capacity_gate._RELEASE_SCRIPT: self._release,
+        }
+
+    def register_script(self, script):
+        return self.scripts[script]
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode()
+        return True
+
+    def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    # Line for line what the Lua does; return values are what redis-py hands back
+    def _reserve(self, keys, args):
+        value = self.data.get(keys[0])
+        if value is None:
+            return -1
+        if int(value) < int(args[0]):
+            return 0
+        self.data[keys[0]] = str(int(value) - int(args[0])).encode()
+        return 1
+
+    def _release(self, keys, args):
+        if keys[0] not in self.data:
+            return None
+        self.data[keys[0]] = str(int(self.data[keys[0]]) + int(args[0])).encode()
+        return int(self.data[keys[0]])
+
+
+@pytest.fixture(params=["stub", "fakeredis"])
+def redis_gate(request, monkeypatch):
+    if request.param == "stub":
+        client = StubRedis()
+    else:
+        # Runs the real Lua scripts; needs fakeredis with its Lua extra (lupa)
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        client = fakeredis.FakeRedis()
+    gate = capacity_gate.RedisCapacityGate(client)
+    monkeypatch.setattr(capacity_gate, "_gate", gate)
+    return gate
+
+
+def _counter(gate, event_id):
+    value = gate.client.get(gate._key(event_id))
+    return None if value is None else int(value)
+
+
+def test_redis_missing_counter_falls_through(redis_gate):
+    assert redis_gate.reserve(7) is None
+    # Neither reserve nor release may create the counter
+    redis_gate.release(7, 2)
+    assert _counter(redis_gate, 7) is None
+
+
+def test_redis_reserve_and_release(redis_gate):
+    redis_gate.set(7, 3)
+    assert redis_gate.reserve(7, 2) is True
+    assert redis_gate.reserve(7, 2) is False
+    assert _counter(redis_gate, 7) == 1
+    assert redis_gate.reserve(7) is True
+    assert redis_gate.reserve(7) is False
+    redis_gate.release(7, 2)
+    assert _counter(redis_gate, 7) == 2
+
+
+def test_redis_prime_never_overwrites(redis_gate):
+    redis_gate.prime(7, 5)
+    redis_gate.reserve(7)
+    redis_gate.prime(7, 100)
+    assert _counter(redis_gate, 7) == 4
+    redis_gate.set(7, 100)
+    assert _counter(redis_gate, 7) == 100
+    redis_gate.forget(7)
+    assert redis_gate.reserve(7) is None
+
+
+def test_redis_gate_in_front_of_holds(client, db, redis_gate):
+    # No counter yet: the hold goes to the database and primes it after commit
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+    assert _counter(redis_gate, 1) == 99
+    redis_gate.set(1, 0)
+    assert client.post("/reservations/hold", json={"event_id": 1}).json()["detail"] == "No capacity"
+    db.get(Event, 1).is_active = False
+    db.commit()
+    redis_gate.reconcile(db, [1])
+    assert _counter(redis_gate, 1) is None
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event as sa_event
+
+from app import event_cache, inventory
+from app.config import settings
+from app.models import Event, Reservation, ReservationState
+from app.pubsub import get_broadcaster
+from app.tasks import cleanup_expired_holds
+
+
+@pytest.fixture
+def queries(db):
+    seen = []
+    listener = lambda conn, cursor, statement, *args: seen.append(statement)  # noqa: E731
+    sa_event.listen(db.get_bind(), "before_cursor_execute", listener)
+    yield seen
+    sa_event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+
+def _etag(client):
+    response = client.get("/events/1")
+    assert response.status_code == 200
+    return response.headers["etag"]
+
+
+def test_version_bumps_on_every_change(client, db):
+    seen = [_etag(client)]
+    hold_id = client.post("/reservations/hold", json={"event_id": 1}).json()["id"]
+    seen.append(_etag(client))
+    client.post(f"/reservations/confirm/{hold_id}")
+    seen.append(_etag(client))
+
+    client.post("/reservations/hold", json={"event_id": 1})
+    db.query(Reservation).filter(Reservation.state == ReservationState.HOLD).update(
+        {"expires_at": datetime.utcnow() - timedelta(minutes=1)}
+    )
+    db.commit()
+    cleanup_expired_holds(db_session=db)
+    seen.append(_etag(client))
+
+    inventory.set_shard_count(db, 1, 3)
+    db.commit()
+    seen.append(_etag(client))
+    client.post("/reservations/hold", json={"event_id": 1})  # lands on a shard
+    seen.append(_etag(client))
+    inventory.set_shard_count(db, 1, 0)
+    db.commit()
+    seen.append(_etag(client))
+
+    versions = [int(tag.strip('"').split("-")[1]) for tag in seen]
+    assert versions == sorted(set(versions)) and len(versions) == 7
+
+
+def test_if_none_match_returns_304(client):
+    tag = _etag(client)
+    response = client.get("/events/1", headers={"If-None-Match": f'"other", {tag}'})
+    assert response.status_code == 304 and response.headers["etag"] == tag and not response.content
+
+    client.post("/reservations/hold", json={"event_id": 1})
+    response = client.get("/events/1", headers={"If-None-Match": tag})
+    assert response.status_code == 200 and response.json()["available_capacity"] == 99
+
+
+def test_cached_reads_skip_the_database(client, queries):
+    _etag(client)
+    queries.clear()
+    for _ in range(5):
+        _etag(client)
+    assert queries == []
+
+    client.post("/reservations/hold", json={"event_id": 1})
+    queries.clear()
+    assert client.get("/events/1").json()["available_capacity"] == 99
+    assert queries
+
+
+def test_staleness_is_bounded_by_ttl(client, db, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(event_cache.get_event_cache(), "clock", lambda: clock[0])
+    _etag(client)
+    # A write that bypasses changed() is only visible once the TTL runs out
+    db.query(Event).filter(Event.id == 1).update({"available_capacity": 42, "version": Event.version + 1})
+    db.commit()
+    assert client.get("/events/1").json()["available_capacity"] == 100
+    clock[0] += settings.EVENT_CACHE_TTL_SECONDS
+    assert client.get("/events/1").json()["available_capacity"] == 42
+
+
+def test_remote_invalidation(client, db):
+    _etag(client)
+    assert len(event_cache.get_event_cache()) == 1
+    get_broadcaster().publish(event_cache.INVALIDATION_CHANNEL, "1")
+    assert len(event_cache.get_event_cache()) == 0
+
+
+def test_load_racing_a_write_is_not_cached():
+    cache = event_cache.EventDetailCache(maxsize=10, ttl=60)
+    generation = cache.generation(1)
+    cache.invalidate(1)  # commit lands while the old payload is being built
+    cache.put(1, (3, {"stale": True}), generation)
+    assert cache.get(1) is None
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from app import inventory
+from app.consistency import check_capacity, check_event_counters
+from app.models import Event, Reservation, ReservationState
+from app.tasks import cleanup_expired_holds
+
+
+def _detail(client):
+    body = client.get("/events/1").json()
+    return body["available_capacity"], body["hold_count"], body["confirmed_count"]
+
+
+def _expire_all(db):
+    db.query(Reservation).filter(Reservation.state == ReservationState.HOLD).update(
+        {"expires_at": datetime.utcnow() - timedelta(minutes=1)}
+    )
+    db.commit()
+
+
+def test_counters_follow_the_lifecycle(client, db):
+    ids = [client.post("/reservations/hold", json={"event_id": 1}).json()["id"] for _ in range(3)]
+    assert _detail(client) == (97, 3, 0)
+
+    client.post(f"/reservations/confirm/{ids[0]}")
+    assert _detail(client) == (97, 2, 1)
+
+    _expire_all(db)
+    cleanup_expired_holds(db_session=db)
+    assert _detail(client) == (99, 0, 1)
+    assert check_event_counters(db) == []
+    assert check_capacity(db) == []
+
+
+def test_sharded_counters_are_summed(client, db):
+    inventory.set_shard_count(db, 1, 3)
+    db.commit()
+    ids = [client.post("/reservations/hold", json={"event_id": 1}).json()["id"] for _ in range(4)]
+    client.post(f"/reservations/confirm/{ids[1]}")
+    assert _detail(client) == (96, 3, 1)
+
+    # Folding the shards back keeps every counter
+    inventory.set_shard_count(db, 1, 0)
+    db.commit()
+    assert _detail(client) == (96, 3, 1)
+    assert check_event_counters(db) == []
+
+
+def test_detail_is_a_single_query(client, db):
+    engine = db.get_bind()
+    from sqlalchemy import event as sa_event
+    seen = []
+    listener = lambda *args: seen.append(args[2])  # noqa: E731
+    sa_event.listen(engine, "before_cursor_execute", listener)
+    try:
+        client.get("/events/1")
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", listener)
+    assert len(seen) == 1
+
+
+def test_checker_reports_and_fixes_drift(db):
+    db.add(Reservation(event_id=1, user_id=1, state=ReservationState.CONFIRMED,
+                       expires_at=datetime.utcnow()))
+    db.get(Event, 1).hold_count = 5
+    db.commit()
+
+    mismatches = check_event_counters(db)
+    assert {(m.field, m.stored, m.actual) for m in mismatches} == {("hold_count", 5, 0), ("confirmed_count", 0, 1)}
+
+    check_event_counters(db, fix=True)
+    db.commit()
+    assert check_event_counters(db) == []
@@ -0,0 +1,81 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import event as sa_event
+
+from app import inventory
+from app.models import Event
+
+
+def _seed(db, count=25):
+    base = datetime(2027, 1, 1)
+    db.add_all([
+        Event(id=i, title=f"Etkinlik {i}", capacity=10, available_capacity=10, is_active=i % 3 != 0,
+              start_date=base + timedelta(days=i), end_date=base + timedelta(days=i, hours=3))
+        for i in range(2, count + 2)
+    ])
+    db.commit()
+
+
+def _walk(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        body = client.get("/events", params=query).json()
+        pages.append([item["id"] for item in body["items"]])
+        cursor = body["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def test_keyset_pages_cover_every_event_once(client, db):
+    _seed(db)
+    pages = _walk(client, limit=10)
+    assert [len(p) for p in pages] == [10, 10, 6]
+    assert sum(pages, []) == list(range(1, 27))
+
+
+def test_filters(client, db):
+    _seed(db)
+    active = sum(_walk(client, is_active="true", limit=7), [])
+    assert active and all(i % 3 != 0 for i in active)
+
+    window = _walk(client, start_date="2027-01-05T00:00:00", end_date="2027-01-08T23:00:00")
+    assert window == [[4, 5, 6, 7]]
+
+
+def test_counters_include_shards(client, db):
+    client.post("/reservations/hold", json={"event_id": 1, "quantity": 2})
+    inventory.set_shard_count(db, 1, 4)
+    db.commit()
+    client.post("/reservations/hold", json={"event_id": 1, "quantity": 3})
+
+    item = client.get("/events").json()["items"][0]
+    detail = client.get("/events/1").json()
+    assert (item["available_capacity"], item["hold_count"], item["confirmed_count"]) == (95, 5, 0)
+    assert all(item[k] == detail[k] for k in ("available_capacity", "hold_count", "confirmed_count"))
+
+
+def test_ndjson_stream(client, db):
+    _seed(db, count=4)
+    response = client.get("/events", params={"limit": 3}, headers={"Accept": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines[:-1]] == [1, 2, 3]
+    assert client.get("/events", params={"cursor": lines[-1]["next_cursor"]}).json()["items"][0]["id"] == 4
+
+
+def test_page_is_one_query(client, db):
+    _seed(db)
+    seen = []
+    listener = lambda conn, cursor, statement, *args: seen.append(statement)  # noqa: E731
+    sa_event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        assert len(client.get("/events", params={"limit": 50}).json()["items"]) == 26
+    finally:
+        sa_event.remove(db.get_bind(), "before_cursor_execute", listener)
+    assert len(seen) == 1
+
+
+def test_invalid_cursor(client):
+    assert client.get("/events", params={"cursor": "bm90LWpzb24"}).status_code == 400
@@ -0,0 +1,84 @@
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app import tasks
+from app.config import settings
+from app.models import Event, Reservation, ReservationState
+from app.worker import celery
+
+
+@pytest.fixture
+def eager_celery(db, monkeypatch):
+    monkeypatch.setattr(celery.conf, "task_always_eager", True)
+    monkeypatch.setattr(celery.conf, "task_eager_propagates", True)
+    # The task opens its own session; point it at the test database
+    monkeypatch.setattr(tasks, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    return celery
+
+
+def _hold(db, minutes, state=ReservationState.HOLD):
+    res = Reservation(event_id=1, user_id=1, state=state, expires_at=datetime.utcnow() + timedelta(minutes=minutes))
+    db.add(res)
+    db.query(Event).filter(Event.id == 1).update({"available_capacity": Event.available_capacity - 1})
+    db.commit()
+    return res.id
+
+
+def _available(db):
+    db.expire_all()
+    return db.get(Event, 1).available_capacity
+
+
+def test_expire_due_hold_is_idempotent(db):
+    reservation_id = _hold(db, minutes=-1)
+    assert tasks.expire_reservation(reservation_id, db_session=db) == "expired"
+    assert _available(db) == 100
+    # Redelivery or the safety sweep running first must not release twice
+    assert tasks.expire_reservation(reservation_id, db_session=db) == "missing"
+    assert _available(db) == 100
+
+
+def test_confirmed_and_not_due_holds_are_left_alone(db):
+    confirmed = _hold(db, minutes=-1, state=ReservationState.CONFIRMED)
+    live = _hold(db, minutes=5)
+    assert tasks.expire_reservation(confirmed, db_session=db) == "confirmed"
+    assert tasks.expire_reservation(live, db_session=db) == "not_due"
+    assert _available(db) == 98
+    assert db.query(Reservation).count() == 2
+
+
+def test_task_runs_through_celery(eager_celery, db):
+    reservation_id = _hold(db, minutes=-1)
+    result = tasks.expire_reservation_task.delay(reservation_id)
+    assert result.get() == "expired"
+    assert _available(db) == 100
+
+
+def test_hold_enqueues_expiry_with_eta(client, eager_celery, db, monkeypatch):
+    monkeypatch.setattr(settings, "EXPIRY_SCHEDULER", "celery")
+    calls = []
+    real = tasks.expire_reservation
+
+    def spy(reservation_id, db_session=None):
+        calls.append(reservation_id)
+        return real(reservation_id, db_session)
+
+    monkeypatch.setattr(tasks, "expire_reservation", spy)
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert response.status_code == 200
+    # Eager mode ignores the ETA, so the task fires early and must no-op
+    assert calls == [response.json()["id"]]
+    assert db.get(Reservation, calls[0]).state == ReservationState.HOLD
+    assert _available(db) == 99
+
+
+def test_broker_failure_does_not_fail_the_hold(client, monkeypatch):
+    monkeypatch.setattr(settings, "EXPIRY_SCHEDULER", "celery")
+
+    def broken(*args, **kwargs):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(tasks.expire_reservation_task, "apply_async", broken)
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
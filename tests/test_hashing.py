@@ -0,0 +1,48 @@
+import pytest
+from fastapi import HTTPException
+
+from app import hashing
+from app.config import settings
+from app.models import User
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_QUEUE", 0)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 2000)
+    hashing.shutdown()
+    yield
+    hashing.shutdown()
+
+
+def test_pool_hashes_and_verifies(pool):
+    hashed = hashing.hash_password("secret")
+    assert hashed.startswith("$pbkdf2-sha256$2000$")
+    assert hashing.verify_and_update("secret", hashed) == (True, None)
+    assert hashing.verify_and_update("wrong", hashed)[0] is False
+
+
+def test_saturated_pool_rejects_fast(pool):
+    hashing.hash_password("warm-up")
+    hashing._slots.acquire()  # the only slot is busy
+    try:
+        with pytest.raises(HTTPException) as exc:
+            hashing.hash_password("secret")
+        assert exc.value.status_code == 503 and exc.value.headers["Retry-After"] == "1"
+    finally:
+        hashing._slots.release()
+
+
+def test_login_rehashes_weaker_hash(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", 0)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 1000)
+    db.add(User(username="carol", hashed_password=hashing.hash_password("secret")))
+    db.commit()
+
+    monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 3000)
+    response = client.post("/auth/token", data={"username": "carol", "password": "secret"})
+    assert response.status_code == 200
+    db.expire_all()
+    assert db.query(User).filter_by(username="carol").one().hashed_password.startswith("$pbkdf2-sha256$3000$")
+    assert client.post("/auth/token", data={"username": "carol", "password": "nope"}).status_code == 400
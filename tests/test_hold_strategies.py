@@ -0,0 +1,75 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from app import holds, inventory
+from app.config import settings
+from app.models import Event, Reservation
+
+STRATEGIES = list(holds.STRATEGIES)
+
+
+@pytest.fixture(params=STRATEGIES)
+def strategy(request, monkeypatch):
+    monkeypatch.setattr(settings, "HOLD_STRATEGY", request.param)
+    return request.param
+
+
+def test_hold_through_api(client, db, strategy):
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["state"] == "HOLD" and body["event_id"] == 1 and body["created_at"]
+    db.expire_all()
+    assert db.get(Event, 1).available_capacity == 99
+
+
+@pytest.mark.parametrize("change, status, detail", [
+    ({"available_capacity": 0}, 400, "No capacity"),
+    ({"is_active": False}, 400, "Event is not active"),
+])
+def test_hold_rejections(client, db, strategy, change, status, detail):
+    db.query(Event).filter(Event.id == 1).update(change)
+    db.commit()
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert (response.status_code, response.json()["detail"]) == (status, detail)
+    assert db.query(Reservation).count() == 0
+
+
+def test_hold_unknown_event(client, strategy):
+    assert client.post("/reservations/hold", json={"event_id": 999}).status_code == 404
+
+
+def test_conditional_update_falls_back_to_shards(db):
+    inventory.set_shard_count(db, 1, 4)
+    db.commit()
+    reservation = holds.create_hold(db, 1, 1, strategy="conditional_update")
+    assert reservation.shard_no is not None
+    assert inventory.shard_totals(db, [1])[1].available == 99
+
+
+def test_concurrent_holds_never_oversell(concurrent_engine, make_event, strategy):
+    ids = make_event(concurrent_engine, capacity=25)
+    Session = sessionmaker(bind=concurrent_engine)
+
+    def attempt(_):
+        db = Session()
+        try:
+            holds.create_hold(db, ids.event_id, ids.user_id)
+            return True
+        except HTTPException:
+            return False
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        successes = sum(pool.map(attempt, range(50)))
+
+    db = Session()
+    held = db.query(func.count(Reservation.id)).filter(Reservation.event_id == ids.event_id).scalar()
+    assert successes == held == 25
+    assert db.get(Event, ids.event_id).available_capacity == 0
+    db.close()
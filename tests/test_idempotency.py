@@ -0,0 +1,134 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from app import holds, idempotency, schemas
+from app.models import Event, IdempotencyKey, Reservation
+
+
+def _request(key):
+    return SimpleNamespace(method="POST", url=SimpleNamespace(path="/reservations/hold"),
+                           headers={"Idempotency-Key": key})
+
+
+def test_replay_returns_original_response(client, db):
+    headers = {"Idempotency-Key": "hold-1"}
+    first = client.post("/reservations/hold", json={"event_id": 1}, headers=headers)
+    second = client.post("/reservations/hold", json={"event_id": 1}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert db.query(Reservation).count() == 1
+    db.expire_all()
+    assert db.get(Event, 1).available_capacity == 99
+
+
+def test_key_reused_with_other_body_rejected(client):
+    headers = {"Idempotency-Key": "hold-1"}
+    assert client.post("/reservations/hold", json={"event_id": 1}, headers=headers).status_code == 200
+    response = client.post("/reservations/hold", json={"event_id": 1, "quantity": 2}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_failed_attempt_is_not_stored(client, db):
+    headers = {"Idempotency-Key": "hold-1"}
+    assert client.post("/reservations/hold", json={"event_id": 42}, headers=headers).status_code == 404
+    assert db.query(IdempotencyKey).count() == 0
+    # The key is free again for the same request
+    assert client.post("/reservations/hold", json={"event_id": 42}, headers=headers).status_code == 404
+
+
+def test_confirm_replay(client):
+    hold_id = client.post("/reservations/hold", json={"event_id": 1}).json()["id"]
+    headers = {"Idempotency-Key": "confirm-1"}
+    first = client.post(f"/reservations/confirm/{hold_id}", headers=headers)
+    second = client.post(f"/reservations/confirm/{hold_id}", headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert second.json()["state"] == "CONFIRMED"
+    # Without the key the retry is a second confirm and fails
+    assert client.post(f"/reservations/confirm/{hold_id}").status_code == 400
+
+
+def test_expired_and_abandoned_keys_are_taken_over(db):
+    old = datetime.utcnow() - timedelta(days=2)
+    request_hash = idempotency.fingerprint(_request(None))
+    db.add_all([
+        IdempotencyKey(user_id=1, key="expired", fingerprint=request_hash, status_code=200, response_body="{}",
+                       created_at=old, expires_at=old),
+        IdempotencyKey(user_id=1, key="abandoned", fingerprint=request_hash, created_at=old,
+                       expires_at=datetime.utcnow() + timedelta(days=1)),
+    ])
+    db.commit()
+    for key in ("expired", "abandoned"):
+        response = idempotency.run(db, 1, _request(key), None, lambda s: holds.create_hold(s, 1, 1), schemas.ReservationOut)
+        assert "Idempotent-Replayed" not in response.headers
+    assert db.query(Reservation).count() == 2
+    assert idempotency.purge_expired_keys(db) == 0
+
+
+def test_committed_work_is_never_run_again(db, monkeypatch):
+    request = _request("hold-1")
+    first = idempotency.run(db, 1, request, None, lambda s: holds.create_hold(s, 1, 1), schemas.ReservationOut)
+    assert first.status_code == 200
+    # Simulate the response write being lost after the hold committed
+    db.query(IdempotencyKey).update({"status_code": None, "response_body": None})
+    db.commit()
+    claim = db.query(IdempotencyKey).one()
+    assert claim.committed_at is not None
+
+    monkeypatch.setattr(idempotency.settings, "IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", 0)
+    with pytest.raises(HTTPException) as exc:
+        idempotency.run(db, 1, request, None, lambda s: holds.create_hold(s, 1, 1), schemas.ReservationOut)
+    assert exc.value.status_code == 409
+    assert db.query(Reservation).count() == 1
+
+
+def test_concurrent_retries_make_one_reservation(concurrent_engine, make_event):
+    ids = make_event(concurrent_engine, capacity=10)
+    Session = sessionmaker(bind=concurrent_engine)
+    request = _request("retry-key")
+    body = schemas.ReservationCreate(event_id=ids.event_id)
+    runs = []
+    start = threading.Barrier(8)
+
+    def slow_hold(session):
+        runs.append(1)
+        time.sleep(0.2)  # keep the duplicates waiting on this attempt
+        return holds.create_hold(session, ids.event_id, ids.user_id)
+
+    def retry(_, wait=True):
+        db = Session()
+        try:
+            if wait:
+                start.wait()
+            response = idempotency.run(db, ids.user_id, request, body, slow_hold, schemas.ReservationOut)
+            return response.status_code, response.body
+        except HTTPException as exc:
+            return exc.status_code, None
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(retry, range(8)))
+
+    assert len(runs) == 1
+    # Duplicates do not wait on a sync worker: one 200, the rest 409 ...
+    assert sorted(status for status, _ in responses) == [200] + [409] * 7
+    # ... and once the first attempt is done a retry gets its response back
+    (_, original), = [r for r in responses if r[0] == 200]
+    assert retry(0, wait=False) == (200, original)
+    assert len(runs) == 1
+    db = Session()
+    held = db.query(func.count(Reservation.id)).filter(Reservation.event_id == ids.event_id).scalar()
+    assert held == 1
+    assert db.get(Event, ids.event_id).available_capacity == 9
+    db.close()
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import anyio
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app import live
+from app.live import Subscriber, get_hub
+from app.routers.live import live_events
+from conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def hub(client):
+    """Hub on the test DB; flushes are driven by hand, not by the timer."""
+    live.shutdown_hub()
+    hub = get_hub()
+    hub.interval = 3600
+    hub.session_factory = TestingSessionLocal
+    yield hub
+    hub.shutdown()
+
+
+def test_websocket_gets_snapshot_then_one_frame_per_burst(client, hub):
+    with client.websocket_connect("/events/live/ws?ids=1") as ws:
+        snapshot = ws.receive_json()
+        assert snapshot["type"] == "capacity"
+        assert snapshot["events"][0]["available_capacity"] == 100
+
+        for _ in range(30):
+            assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+        # 30 commits, one dirty id, one frame
+        assert client.portal.call(hub.flush) == 1
+        update = ws.receive_json()["events"]
+        assert [(e["id"], e["available_capacity"], e["hold_count"]) for e in update] == [(1, 70, 30)]
+        assert update[0]["version"] > snapshot["events"][0]["version"]
+
+        # Nothing changed since: no frame
+        assert client.portal.call(hub.flush) == 0
+    # The server side notices the close on the client's event loop
+    for _ in range(100):
+        if hub.subscriber_count == 0:
+            break
+        client.portal.call(anyio.sleep, 0.01)
+    assert hub.subscriber_count == 0
+
+
+def test_unwatched_events_are_not_loaded(client, hub):
+    client.post("/reservations/hold", json={"event_id": 1})
+    assert client.portal.call(hub.flush) == 0
+
+
+def test_slow_subscriber_keeps_only_latest_frame():
+    subscriber = Subscriber([1, 2])
+    for version in range(1000):
+        subscriber.offer({"id": 1, "version": version})
+    subscriber.offer({"id": 2, "version": 7})
+
+    frames = asyncio.run(subscriber.next(0))
+    assert frames == [{"id": 1, "version": 999}, {"id": 2, "version": 7}]
+    assert subscriber.conflated == 999
+    assert asyncio.run(subscriber.next(0)) == []
+
+
+def test_sse_frame_format(client, hub):
+    async def first_frame():
+        response = await live_events("1")
+        try:
+            return response.headers["content-type"], await response.body_iterator.__anext__()
+        finally:
+            await response.body_iterator.aclose()
+
+    content_type, frame = client.portal.call(first_frame)
+    assert content_type.startswith("text/event-stream")
+    lines = frame.strip().split("\n")
+    assert lines[0] == "event: capacity"
+    assert lines[1].startswith("id: 1-")
+    assert json.loads(lines[2][len("data: "):])["available_capacity"] == 100
+    assert hub.subscriber_count == 0
+
+
+@pytest.mark.parametrize("ids", ["", "a,b", ",".join(str(i) for i in range(100))])
+def test_invalid_ids_rejected(client, hub, ids):
+    assert client.get("/events/live", params={"ids": ids}).status_code == 400
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with client.websocket_connect(f"/events/live/ws?ids={ids}") as ws:
+            ws.receive_json()
+    assert excinfo.value.code == 1008
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from app import db as db_module
+from app import metrics
+from app.config import settings
+from app.models import Event, Reservation, ReservationState
+from app.tasks import cleanup_expired_holds
+
+
+def test_registry_renders_prometheus_text():
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter("demo_total", "Demo counter", ("outcome",)))
+    histogram = registry.register(metrics.Histogram("demo_seconds", "Demo latency", ("route",), buckets=(0.1, 1.0)))
+    counter.inc("ok")
+    counter.inc("ok", amount=2)
+    counter.inc('say "hi"')
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP demo_total Demo counter", "# TYPE demo_total counter"]
+    assert 'demo_total{outcome="ok"} 3' in lines
+    assert 'demo_total{outcome="say \\"hi\\""} 1' in lines
+    assert "# TYPE demo_seconds histogram" in lines
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_sum{route="/a"} 5.55' in lines
+    assert 'demo_seconds_count{route="/a"} 3' in lines
+
+
+def test_hold_outcomes_lock_wait_and_route_latency(client, db):
+    before = {o: metrics.HOLD_OUTCOMES.value(o) for o in ("success", "sold_out", "inactive", "not_found")}
+    lock_waits = metrics.HOLD_LOCK_WAIT.count("row_lock")
+
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+    db.add_all([
+        Event(id=2, title="Sold out", capacity=1, available_capacity=0, is_active=True),
+        Event(id=3, title="Closed", capacity=1, available_capacity=1, is_active=False),
+    ])
+    db.commit()
+    assert client.post("/reservations/hold", json={"event_id": 2}).status_code == 400
+    assert client.post("/reservations/hold", json={"event_id": 3}).status_code == 400
+    assert client.post("/reservations/hold", json={"event_id": 99}).status_code == 404
+
+    for outcome in before:
+        assert metrics.HOLD_OUTCOMES.value(outcome) == before[outcome] + 1
+    assert metrics.HOLD_LOCK_WAIT.count("row_lock") == lock_waits + 4
+
+    body = client.get("/metrics").text
+    assert 'proxan_hold_outcomes_total{outcome="sold_out"}' in body
+    assert 'proxan_http_request_duration_seconds_count{method="POST",route="/reservations/hold",status="200"}' in body
+    # Raw paths never become labels
+    client.get("/events/12345")
+    assert 'route="/events/{event_id}"' in client.get("/metrics").text
+
+
+def test_confirm_outcomes(client, hold_reservation, expired_hold):
+    confirmed = metrics.CONFIRM_OUTCOMES.value("confirmed")
+    expired = metrics.CONFIRM_OUTCOMES.value("expired")
+
+    assert client.post(f"/reservations/confirm/{hold_reservation.id}").status_code == 200
+    assert client.post(f"/reservations/confirm/{expired_hold.id}").status_code == 400
+
+    assert metrics.CONFIRM_OUTCOMES.value("confirmed") == confirmed + 1
+    assert metrics.CONFIRM_OUTCOMES.value("expired") == expired + 1
+
+
+def test_sweep_duration_and_reclaimed(db):
+    db.add_all([
+        Reservation(event_id=1, user_id=1, state=ReservationState.HOLD,
+                    expires_at=datetime.utcnow() - timedelta(minutes=1))
+        for _ in range(3)
+    ])
+    db.commit()
+    runs = metrics.SWEEP_DURATION.count("ok")
+    reclaimed = metrics.SWEEP_RECLAIMED.value()
+
+    cleanup_expired_holds(db)
+
+    assert metrics.SWEEP_DURATION.count("ok") == runs + 1
+    assert metrics.SWEEP_RECLAIMED.value() == reclaimed + 3
+
+
+def test_pool_checkout_wait_and_in_use(client, tmp_path, monkeypatch):
+    engine = db_module.make_engine(f"sqlite:///{tmp_path / 'pool.db'}", 2, 0, name="metrics-test",
+                                  poolclass=db_module.TimedQueuePool)
+    monkeypatch.setattr(db_module, "engine", engine)
+    monkeypatch.setattr(db_module, "read_engine", engine)
+    try:
+        connection = engine.connect()
+        assert metrics.POOL_CHECKOUT_WAIT.count("metrics-test") == 1
+        assert 'proxan_db_pool_in_use{pool="primary"} 1' in client.get("/metrics").text
+        connection.close()
+    finally:
+        engine.dispose()
+
+
+def test_metrics_can_be_disabled(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    assert client.get("/metrics").status_code == 404
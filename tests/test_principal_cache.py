@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+import pytest
+from jose import jwt
+from sqlalchemy import event as sa_event
+
+from app import auth
+from app.config import settings
+from app.main import app
+from app.models import User
+from app.principals import INVALIDATION_CHANNEL, Principal, PrincipalCache, get_principal_cache
+from app.pubsub import get_broadcaster
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def real_auth(client, db):
+    """Client that authenticates through the real get_current_user."""
+    app.dependency_overrides.pop(auth.get_current_user, None)
+    user = User(id=1, username="alice", hashed_password="x", is_admin=False)
+    db.add(user)
+    db.commit()
+    token = auth.create_access_token("alice", timedelta(minutes=5), user_id=1, is_admin=False)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def user_queries(db):
+    seen = []
+
+    def record(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            seen.append(statement)
+
+    engine = db.get_bind()
+    sa_event.listen(engine, "before_cursor_execute", record)
+    yield seen
+    sa_event.remove(engine, "before_cursor_execute", record)
+
+
+def test_token_carries_id_and_admin_claims():
+    token = auth.create_access_token("alice", user_id=7, is_admin=True)
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    assert (claims["sub"], claims["uid"], claims["adm"]) == ("alice", 7, True)
+    assert Principal.from_claims(claims) == Principal(7, "alice", True)
+    assert Principal.from_claims({"sub": "legacy"}) is None
+
+
+def test_cache_skips_user_query_after_first_request(client, real_auth, user_queries):
+    for _ in range(3):
+        assert client.post("/reservations/hold", json={"event_id": 1}, headers=real_auth).status_code == 200
+    assert len(user_queries) == 1
+
+
+def test_user_change_invalidates_cache(client, db, real_auth, user_queries):
+    client.post("/reservations/hold", json={"event_id": 1}, headers=real_auth)
+    assert len(get_principal_cache()) == 1
+
+    db.get(User, 1).is_admin = True
+    db.commit()
+    assert len(get_principal_cache()) == 0
+
+    db.delete(db.get(User, 1))
+    db.commit()
+    assert client.post("/reservations/hold", json={"event_id": 1}, headers=real_auth).status_code == 401
+
+
+def test_trusted_claims_need_no_user_query(client, real_auth, user_queries, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    assert client.post("/reservations/hold", json={"event_id": 1}, headers=real_auth).json()["user_id"] == 1
+    assert user_queries == []
+
+
+def test_invalid_token_is_rejected(client, real_auth):
+    response = client.post("/reservations/hold", json={"event_id": 1}, headers={"Authorization": "Bearer nope"})
+    assert response.status_code == 401
+
+
+def test_cache_ttl_and_lru():
+    clock = FakeClock()
+    cache = PrincipalCache(maxsize=2, ttl=10, clock=clock)
+    cache.put("a", "t1", Principal(1, "a"))
+    cache.put("b", "t2", Principal(2, "b"))
+    assert cache.get("a", "t1")  # a is now most recently used
+    cache.put("c", "t3", Principal(3, "c"))
+    assert cache.get("b", "t2") is None and cache.get("a", "t1") and cache.get("c", "t3")
+
+    clock.now = 11
+    assert cache.get("a", "t1") is None
+    assert cache.get("a", "other-token") is None
+
+
+def test_broadcast_invalidation_reaches_cache(db):
+    cache = get_principal_cache()
+    cache.put("alice", "t1", Principal(1, "alice"))
+    cache.put("alice", "t2", Principal(1, "alice"))
+    get_broadcaster().publish(INVALIDATION_CHANNEL, "alice")
+    assert len(cache) == 0
@@ -0,0 +1,210 @@
+"""SQL statement budgets for every endpoint in app/routers/.
+
+Each budget is the number of statements the endpoint needs today. A change
+that adds a query (an N+1, a refresh after commit, a second count) fails
+here and has to raise the budget on purpose. Where the work could grow with
+the data, the request runs against many rows so a per-row query would show.
+"""
+from datetime import datetime, timedelta
+
+import anyio
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from conftest import TestingSessionLocal
+from app import live, sql_profile, waiting_room
+from app.config import settings
+from app.db import Base, get_async_db
+from app.models import Event, Reservation, ReservationState
+from app.routers import aio
+from app.tasks import cleanup_expired_holds
+
+
+@pytest.fixture
+def events(db):
+    """Events 2..31 next to the seeded event 1."""
+    db.add_all([Event(id=i, title=f"Event {i}", capacity=10, available_capacity=10, is_active=True)
+                for i in range(2, 32)])
+    db.commit()
+    return list(range(1, 32))
+
+
+# --- auth ---
+def test_register_and_login(client, query_budget):
+    # SELECT by username, INSERT, refresh
+    with query_budget(3):
+        assert client.post("/auth/register", json={"username": "ayse", "password": "secret"}).status_code == 200
+    with query_budget(1):
+        assert client.post("/auth/token", data={"username": "ayse", "password": "secret"}).status_code == 200
+
+
+# --- events ---
+def test_create_event(client, query_budget):
+    with query_budget(2):
+        assert client.post("/events/", json={"title": "New", "capacity": 5}).status_code == 200
+
+
+def test_list_events_is_one_query_per_page(client, events, query_budget):
+    with query_budget(1):
+        body = client.get("/events/", params={"limit": 100}).json()
+    assert len(body["items"]) == len(events)
+
+
+def test_event_detail(client, query_budget, monkeypatch):
+    monkeypatch.setattr(settings, "EVENT_CACHE_TTL_SECONDS", 0)
+    with query_budget(1):
+        assert client.get("/events/1").status_code == 200
+
+
+def test_event_detail_cache_hit_needs_no_query(client, query_budget):
+    client.get("/events/1")
+    with query_budget(0):
+        assert client.get("/events/1").status_code == 200
+
+
+def test_configure_and_rebalance_shards(admin, query_budget):
+    # event, old shards, re-home held rows, event UPDATE, one INSERT per shard, amounts
+    with query_budget(5 + 4):
+        assert admin.put("/events/1/shards", json={"shards": 4}).status_code == 200
+    with query_budget(3):
+        assert admin.post("/events/1/shards/rebalance").status_code == 200
+
+
+# --- reservations ---
+def test_hold(client, query_budget):
+    # event lock, UPDATE, INSERT, outbox INSERT, refresh
+    with query_budget(5):
+        assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+
+
+def test_sold_out_hold(client, db, query_budget):
+    db.get(Event, 1).available_capacity = 0
+    db.commit()
+    with query_budget(1):
+        assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 400
+
+
+def test_batch_hold_does_not_grow_with_events(client, events, query_budget):
+    items = [{"event_id": event_id, "quantity": 1} for event_id in events[:20]]
+    # One SELECT for all events, one executemany UPDATE, one outbox INSERT;
+    # only the reservation INSERTs (each needs its primary key back) scale
+    with query_budget(3 + len(items)):
+        assert client.post("/reservations/hold/batch", json={"items": items}).status_code == 200
+
+
+def test_confirm(client, hold_reservation, query_budget):
+    with query_budget(5):
+        assert client.post(f"/reservations/confirm/{hold_reservation.id}").status_code == 200
+
+
+def test_queue_endpoints_do_not_touch_the_database(client, monkeypatch, query_budget):
+    room = waiting_room.InMemoryWaitingRoom(idle_seconds=60)
+    monkeypatch.setattr(waiting_room, "_room", room)
+    ticket = room.join(1, 1, 1)
+    with query_budget(0):
+        assert client.get(f"/reservations/queue/{ticket.id}").status_code == 200
+        assert client.delete(f"/reservations/queue/{ticket.id}").status_code == 204
+
+
+# --- live ---
+def test_live_snapshot_and_flush_are_one_query(client, events, query_budget):
+    live.shutdown_hub()
+    hub = live.get_hub()
+    hub.interval = 3600
+    hub.session_factory = TestingSessionLocal
+    try:
+        ids = ",".join(str(i) for i in events)
+        with client.websocket_connect(f"/events/live/ws?ids={ids}") as ws:
+            with query_budget(1):
+                ws.receive_json()
+            for event_id in events:
+                hub.mark_dirty(str(event_id))
+            with query_budget(1):
+                client.portal.call(hub.flush)
+    finally:
+        live.shutdown_hub()
+
+
+# --- expiry sweep (not a route, but the N+1 it used to have started here) ---
+def test_sweep_does_not_grow_with_expired_holds(db, events, query_budget):
+    expired = datetime.utcnow() - timedelta(minutes=1)
+    db.add_all([Reservation(event_id=event_id, user_id=1, state=ReservationState.HOLD, expires_at=expired)
+                for event_id in events for _ in range(2)])
+    db.commit()
+    # SELECT + DELETE + outbox INSERT for the batch, one UPDATE per event - never per hold
+    with query_budget(3 + len(events)):
+        assert cleanup_expired_holds(db).rows == 2 * len(events)
+
+
+# --- async endpoints (app/routers/aio.py) ---
+@pytest.fixture
+def aio_client():
+    engine = create_async_engine("sqlite+aiosqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with Session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(aio.router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with Session() as db:
+            db.add(Event(id=1, title="Async", capacity=10, available_capacity=10, is_active=True))
+            await db.commit()
+
+    anyio.run(setup)
+    yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    anyio.run(engine.dispose)
+
+
+def test_async_endpoints(aio_client, query_budget):
+    async def scenario():
+        async with aio_client as ac:
+            with query_budget(3):
+                token = (await ac.post("/auth/register", json={"username": "can", "password": "pw"})).json()["access_token"]
+            with query_budget(1):
+                assert (await ac.post("/auth/token", data={"username": "can", "password": "pw"})).status_code == 200
+            headers = {"Authorization": f"Bearer {token}"}
+            # token user, event, UPDATE, INSERT, outbox INSERT, refresh
+            with query_budget(6):
+                hold = (await ac.post("/reservations/hold", json={"event_id": 1}, headers=headers)).json()
+            with query_budget(4):
+                r = await ac.post("/reservations/hold/batch", json={"items": [{"event_id": 1}]}, headers=headers)
+                assert r.status_code == 200
+            with query_budget(5):
+                assert (await ac.post(f"/reservations/confirm/{hold['id']}", headers=headers)).status_code == 200
+            with query_budget(1):
+                assert (await ac.get("/events/1")).status_code == 200
+
+    anyio.run(scenario)
+
+
+# --- the profiler itself ---
+def test_debug_header_reports_request_sql(client, monkeypatch):
+    monkeypatch.setattr(settings, "SQL_PROFILE", "header")
+    plain = client.post("/reservations/hold", json={"event_id": 1})
+    assert "x-sql-queries" not in plain.headers
+
+    profiled = client.post("/reservations/hold", json={"event_id": 1}, headers={sql_profile.HEADER: "1"})
+    assert profiled.status_code == 200
+    assert int(profiled.headers["x-sql-queries"]) >= 1
+    assert float(profiled.headers["x-sql-time-ms"]) >= 0
+    assert profiled.headers["server-timing"].startswith("sql;dur=")
+
+
+def test_profile_keeps_the_slowest_statements():
+    profile = sql_profile.QueryProfile()
+    for i in range(20):
+        profile.record(f"SELECT {i}", i / 1000)
+    assert profile.count == 20
+    assert [sql for _, sql in profile.slowest] == ["SELECT 19", "SELECT 18", "SELECT 17", "SELECT 16", "SELECT 15"]
+    assert "20 queries" in profile.summary()
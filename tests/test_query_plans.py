@@ -0,0 +1,138 @@
+"""EXPLAIN regression suite for the hot reservation queries.
+
+Seeds a large synthetic reservations table, runs the real code paths while
+recording their SQL and fails if any of them plans a full scan of
+``reservations``. Runs on SQLite always and on Postgres when configured.
+"""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from conftest import _postgres_engine
+from app import holds
+from app.consistency import check_event_counters
+from app.models import Base, Event, Reservation, ReservationState, User
+from app.tasks import cleanup_expired_holds, expire_reservation
+
+EVENTS = 200
+RESERVATIONS = 20000
+
+FULL_SCAN = {
+    "sqlite": re.compile(r"\bSCAN (TABLE )?reservations\b"),
+    "postgresql": re.compile(r"Seq Scan on reservations\b"),
+}
+
+
+def _seed(engine):
+    session = sessionmaker(bind=engine)()
+    user = User(username=f"plans-{datetime.utcnow().timestamp()}", hashed_password="x")
+    events = [Event(title=f"Plan {i}", capacity=1000, available_capacity=1000, is_active=True) for i in range(EVENTS)]
+    session.add_all([user, *events])
+    session.commit()
+    user_id, event_ids = user.id, [e.id for e in events]
+
+    now = datetime.utcnow()
+    rows = []
+    for i in range(RESERVATIONS):
+        # Mostly confirmed history, a thin layer of live and expired holds
+        hold = i % 20 == 0
+        rows.append({
+            "user_id": user_id,
+            "event_id": event_ids[i % EVENTS],
+            "state": ReservationState.HOLD if hold else ReservationState.CONFIRMED,
+            "expires_at": now + timedelta(minutes=(-1 if i % 40 == 0 else 5)),
+        })
+    session.execute(Reservation.__table__.insert(), rows)
+    session.commit()
+    session.close()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE" if engine.dialect.name == "sqlite" else "ANALYZE reservations")
+    return user_id, event_ids
+
+
+def _cleanup(engine, event_ids, user_id):
+    with engine.begin() as conn:
+        conn.execute(Reservation.__table__.delete().where(Reservation.event_id.in_(event_ids)))
+        conn.execute(Event.__table__.delete().where(Event.id.in_(event_ids)))
+        conn.execute(User.__table__.delete().where(User.id == user_id))
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgres"])
+def seeded(request):
+    if request.param == "postgres":
+        engine = _postgres_engine()
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    user_id, event_ids = _seed(engine)
+    yield engine, user_id, event_ids
+    _cleanup(engine, event_ids, user_id)
+    engine.dispose()
+
+
+def _recorded(engine, operation):
+    """Run ``operation(session)`` and return the reservations statements it sent."""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "reservations" in statement and not statement.lstrip().upper().startswith("INSERT"):
+            seen.append((statement, parameters))
+
+    session = sessionmaker(bind=engine)()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        operation(session)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        session.rollback()
+        session.close()
+    assert seen, "operation did not touch reservations"
+    return seen
+
+
+def _plan(engine, statement, parameters):
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def _assert_no_full_scan(engine, operation):
+    pattern = FULL_SCAN[engine.dialect.name]
+    for statement, parameters in _recorded(engine, operation):
+        plan = _plan(engine, statement, parameters)
+        assert not pattern.search(plan), f"full scan of reservations:\n{statement}\n{plan}"
+
+
+def _pick(engine, *criteria):
+    session = sessionmaker(bind=engine)()
+    try:
+        return session.query(Reservation.id).filter(*criteria).order_by(Reservation.id.desc()).first().id
+    finally:
+        session.close()
+
+
+def test_expiry_sweep_uses_partial_index(seeded):
+    engine, _, _ = seeded
+    _assert_no_full_scan(engine, lambda db: cleanup_expired_holds(db_session=db, batch_size=50, max_batches=1))
+
+
+def test_single_expiry_uses_primary_key(seeded):
+    engine, _, _ = seeded
+    expired = _pick(engine, Reservation.state == ReservationState.HOLD, Reservation.expires_at < datetime.utcnow())
+    _assert_no_full_scan(engine, lambda db: expire_reservation(expired, db_session=db))
+
+
+def test_confirm_uses_primary_key(seeded):
+    engine, user_id, _ = seeded
+    live = _pick(engine, Reservation.state == ReservationState.HOLD, Reservation.expires_at > datetime.utcnow())
+    _assert_no_full_scan(engine, lambda db: holds.confirm_hold(db, live, user_id))
+
+
+def test_per_event_counts_use_event_state_index(seeded):
+    engine, _, event_ids = seeded
+    _assert_no_full_scan(engine, lambda db: check_event_counters(db, event_ids[:3]))
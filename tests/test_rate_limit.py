@@ -0,0 +1,92 @@
+import pytest
+
+from app import rate_limit
+from app.config import settings
+from app.models import Event, Reservation
+from app.rate_limit import InMemoryRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = InMemoryRateLimiter(clock=FakeClock())
+    monkeypatch.setattr(rate_limit, "_limiter", limiter)
+    monkeypatch.setattr(settings, "RATE_LIMIT_USER_RATE", 1)
+    monkeypatch.setattr(settings, "RATE_LIMIT_USER_BURST", 3)
+    monkeypatch.setattr(settings, "RATE_LIMIT_EVENT_RATE", 100)
+    monkeypatch.setattr(settings, "RATE_LIMIT_EVENT_BURST", 100)
+    monkeypatch.setattr(settings, "RATE_LIMIT_GLOBAL_RATE", 100)
+    monkeypatch.setattr(settings, "RATE_LIMIT_GLOBAL_BURST", 100)
+    return limiter
+
+
+def test_bucket_refills_at_rate():
+    limiter = InMemoryRateLimiter(clock=FakeClock())
+    bucket = [("user:1", 2, 2)]
+    assert limiter.acquire(bucket) is None
+    assert limiter.acquire(bucket) is None
+    assert limiter.acquire(bucket) == pytest.approx(0.5)
+    limiter.clock.now += 0.5
+    assert limiter.acquire(bucket) is None
+    # Refill never goes past the burst
+    limiter.clock.now += 60
+    assert [limiter.acquire(bucket) for _ in range(3)] == [None, None, pytest.approx(0.5)]
+
+
+def test_rejection_charges_no_bucket():
+    limiter = InMemoryRateLimiter(clock=FakeClock())
+    assert limiter.acquire([("user:1", 1, 1), ("global", 1, 5)]) is None
+    assert limiter.acquire([("user:1", 1, 1), ("global", 1, 5)]) == pytest.approx(1)
+    # The global bucket lost one token, not two
+    assert [limiter.acquire([("global", 1, 5)]) for _ in range(5)][-1] == pytest.approx(1)
+
+
+def test_full_buckets_are_pruned(monkeypatch):
+    limiter = InMemoryRateLimiter(clock=FakeClock())
+    monkeypatch.setattr(limiter, "_prune_at", 10)
+    for user_id in range(10):
+        limiter.acquire([(f"user:{user_id}", 1, 1)])
+    limiter.clock.now += 5
+    limiter.acquire([("user:99", 1, 1)])
+    assert len(limiter._buckets) == 1
+
+
+def test_hold_over_user_limit_gets_429(client, db, limiter):
+    statuses = [client.post("/reservations/hold", json={"event_id": 1}).status_code for _ in range(5)]
+    assert statuses == [200, 200, 200, 429, 429]
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert response.headers["Retry-After"] == "1"
+    # Rejected requests never reached the database
+    assert db.query(Reservation).count() == 3
+    db.expire_all()
+    assert db.get(Event, 1).available_capacity == 97
+
+    limiter.clock.now += 1
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+
+
+def test_event_and_global_limits(client, limiter, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_USER_RATE", 0)  # user level off
+    monkeypatch.setattr(settings, "RATE_LIMIT_EVENT_BURST", 2)
+    monkeypatch.setattr(settings, "RATE_LIMIT_GLOBAL_BURST", 3)
+
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 429
+    # Another event still has its own bucket, but the global one is nearly spent
+    assert client.post("/reservations/hold", json={"event_id": 2}).status_code == 404
+    assert client.post("/reservations/hold", json={"event_id": 2}).status_code == 429
+
+
+def test_batch_draws_one_token_per_event(client, limiter, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_EVENT_BURST", 1)
+    body = {"items": [{"event_id": 1}, {"event_id": 1, "quantity": 2}]}
+    assert client.post("/reservations/hold/batch", json=body).status_code == 200
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 429
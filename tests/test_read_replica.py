@@ -0,0 +1,129 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app import db as db_module
+from app.auth import get_current_user
+from app.config import settings
+from app.main import app
+from app.models import Base, Event, Reservation, User
+
+
+@pytest.fixture
+def split_client(tmp_path, monkeypatch):
+    """Two SQLite files standing in for the primary and its replica.
+
+    Both start with event 1 titled after the database it lives in, so a
+    response shows which one served it.
+    """
+    engines = {}
+    for role in ("primary", "replica"):
+        engine = create_engine(f"sqlite:///{tmp_path / role}.db", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add_all([
+            User(id=1, username="reader", hashed_password="x"),
+            Event(id=1, title=role, capacity=10, available_capacity=10, is_active=True),
+        ])
+        session.commit()
+        session.close()
+        engines[role] = engine
+    monkeypatch.setattr(db_module, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engines["primary"]))
+    monkeypatch.setattr(db_module, "ReadSessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engines["replica"]))
+    monkeypatch.setattr(settings, "EVENT_CACHE_TTL_SECONDS", 0)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=1, username="reader")
+    with TestClient(app) as c:
+        yield c, engines
+    app.dependency_overrides.clear()
+    for engine in engines.values():
+        engine.dispose()
+
+
+def _count_reservations(engine):
+    session = sessionmaker(bind=engine)()
+    try:
+        return session.query(Reservation).count()
+    finally:
+        session.close()
+
+
+def test_reads_use_replica_and_writes_use_primary(split_client):
+    client, engines = split_client
+
+    assert client.get("/events/1").json()["title"] == "replica"
+    assert [e["title"] for e in client.get("/events/").json()["items"]] == ["replica"]
+
+    assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+    assert _count_reservations(engines["primary"]) == 1
+    assert _count_reservations(engines["replica"]) == 0
+
+
+def test_client_reads_its_own_write_then_returns_to_replica(split_client, monkeypatch):
+    client, _ = split_client
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 0.3)
+
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert db_module.READ_PRIMARY_COOKIE in response.headers["set-cookie"]
+    assert client.get("/events/1").json()["title"] == "primary"
+    assert client.get("/events/1").json()["available_capacity"] == 9
+
+    time.sleep(0.4)
+    assert client.get("/events/1").json()["title"] == "replica"
+
+
+def test_failed_write_and_other_clients_stay_on_replica(split_client):
+    client, _ = split_client
+
+    response = client.post("/reservations/hold", json={"event_id": 999})
+    assert response.status_code == 404
+    assert "set-cookie" not in response.headers
+    assert client.get("/events/1").json()["title"] == "replica"
+
+    client.post("/reservations/hold", json={"event_id": 1})
+    client.cookies.clear()  # a different browser
+    assert client.get("/events/1").json()["title"] == "replica"
+
+
+def test_event_cache_fills_from_primary(split_client, monkeypatch):
+    from app.event_cache import get_event_cache
+
+    client, engines = split_client
+    monkeypatch.setattr(settings, "EVENT_CACHE_TTL_SECONDS", 1.0)
+    try:
+        # A lagging replica must not be what the cache keeps for a whole TTL
+        assert client.get("/events/1").json()["title"] == "primary"
+        assert client.get("/events/1").json()["title"] == "primary"
+    finally:
+        get_event_cache().clear()
+
+
+def test_no_cookie_without_replica(client):
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert response.status_code == 200
+    assert "set-cookie" not in response.headers
+
+
+def test_pool_stats_report_saturation(tmp_path):
+    engine = db_module.make_engine(f"sqlite:///{tmp_path / 'pool.db'}", 2, 0, poolclass=QueuePool)
+    try:
+        first, second = engine.connect(), engine.connect()
+        stats = db_module.engine_pool_stats(engine)
+        assert stats["size"] == 2
+        assert stats["checked_out"] == 2
+        assert stats["saturation"] == 1.0
+        assert stats["peak_checked_out"] == 2
+        assert stats["saturated_checkouts"] == 1
+        first.close()
+        second.close()
+        assert db_module.engine_pool_stats(engine)["checked_out"] == 0
+    finally:
+        engine.dispose()
+
+
+def test_health_db_lists_primary_pool(client):
+    assert "primary" in client.get("/health/db").json()
@@ -0,0 +1,126 @@
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import leader
+from app.leader import DatabaseLease, LeaderElector
+from app.main import build_scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1, 12, 0, 0)
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def lease_factory(db):
+    Session = sessionmaker(bind=db.get_bind())
+    return lambda: DatabaseLease(session_factory=Session)
+
+
+def _electors(lease_factory, clock, count=3):
+    return [LeaderElector(lease_factory(), instance=f"worker-{i}", ttl=15, clock=clock) for i in range(count)]
+
+
+def test_only_leader_runs_the_job(lease_factory):
+    clock = FakeClock()
+    electors = _electors(lease_factory, clock)
+    runs = Counter()
+    jobs = [e.guard("sweep", lambda e=e: runs.update([e.instance])) for e in electors]
+
+    for _ in range(5):
+        for elector in electors:
+            elector.heartbeat()
+        for job in jobs:
+            job()
+        clock.now += timedelta(seconds=5)
+
+    assert runs == {"worker-0": 5}
+    assert [e.is_leader for e in electors] == [True, False, False]
+
+
+def test_crashed_leader_is_replaced_after_lease(lease_factory):
+    clock = FakeClock()
+    first, second, _ = _electors(lease_factory, clock)
+    first.heartbeat()
+    assert not second.heartbeat()
+
+    # first stops heartbeating; its own view of the lease runs out first
+    clock.now += timedelta(seconds=15)
+    assert not first.is_leader
+    clock.now += timedelta(seconds=1)
+    assert second.heartbeat()
+    # Coming back does not steal the lease
+    assert not first.heartbeat()
+
+
+def test_resign_hands_over_on_next_heartbeat(lease_factory):
+    clock = FakeClock()
+    first, second, _ = _electors(lease_factory, clock)
+    first.heartbeat()
+    first.resign()
+    clock.now += timedelta(milliseconds=1)
+    assert second.heartbeat()
+    assert not first.is_leader
+
+
+def test_failed_job_is_recorded(lease_factory):
+    clock = FakeClock()
+    elector = _electors(lease_factory, clock, count=1)[0]
+    elector.heartbeat()
+
+    def broken():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        elector.guard("sweep", broken)()
+    status = elector.status()
+    assert status["leader"] == "worker-0"
+    assert status["last_runs"]["sweep"]["ok"] is False
+
+
+def test_health_endpoint_reports_leader(client, lease_factory, monkeypatch):
+    elector = LeaderElector(lease_factory(), instance="worker-7", ttl=15)
+    monkeypatch.setattr(leader, "_elector", elector)
+    elector.heartbeat()
+    elector.guard("cleanup_expired_holds", lambda: None)()
+
+    body = client.get("/health/scheduler").json()
+    assert body["leader"] == "worker-7"
+    assert body["is_leader"] is True
+    assert body["last_runs"]["cleanup_expired_holds"]["instance"] == "worker-7"
+
+
+def test_schedulers_in_one_process_run_job_once(concurrent_engine, monkeypatch):
+    """Real APScheduler instances sharing one lease: only the leader sweeps."""
+    from app import main
+
+    Session = sessionmaker(bind=concurrent_engine)
+    calls = []
+    monkeypatch.setattr(main.settings, "SCHEDULER_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(main.settings, "EXPIRY_SWEEP_INTERVAL_SECONDS", 0.1)
+
+    electors = [LeaderElector(DatabaseLease(session_factory=Session), instance=f"worker-{i}", ttl=2)
+                for i in range(4)]
+    schedulers = []
+    for elector in electors:
+        # Same guard, but the job body only notes which instance ran it
+        elector.guard = lambda name, func, e=elector: LeaderElector.guard(e, name, lambda: calls.append(e.instance))
+        elector.heartbeat()  # what the first scheduled heartbeat would do
+        scheduler = build_scheduler(elector)
+        schedulers.append(scheduler)
+        scheduler.start()
+    time.sleep(1)
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+    leaders = [e.instance for e in electors if e.is_leader]
+    assert len(leaders) == 1
+    assert len(calls) >= 3
+    assert set(calls) == set(leaders)
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import schemas, serializers
+from app.models import Event, Reservation, ReservationState
+
+
+def _pydantic_bytes(model, obj):
+    # The path FastAPI takes for ``response_model`` + an ORM object
+    return JSONResponse(jsonable_encoder(model.from_orm(obj))).body
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(serializers, "orjson", None)
+    elif serializers.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_reservation_bytes_match_pydantic(hold_reservation, encoder):
+    confirmed = Reservation(id=7, user_id=1, event_id=1, quantity=3, state=ReservationState.CONFIRMED,
+                            expires_at=None, created_at=datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=timezone.utc))
+    for reservation in (hold_reservation, confirmed):
+        assert serializers.respond(schemas.ReservationOut, reservation).body == \
+            _pydantic_bytes(schemas.ReservationOut, reservation)
+
+
+def test_event_bytes_match_pydantic(encoder):
+    event = Event(id=3, title='Çay "konseri" \x01   🎫', capacity=10, available_capacity=4,
+                  start_date=datetime(2024, 5, 1, 20, 0), end_date=datetime(2024, 5, 1, 20, 0) + timedelta(hours=3),
+                  is_active=False)
+    assert serializers.respond(schemas.EventOut, event).body == _pydantic_bytes(schemas.EventOut, event)
+
+
+def test_list_and_passthrough(hold_reservation):
+    body = serializers.respond(schemas.ReservationOut, [hold_reservation, hold_reservation]).body
+    assert body == b"[" + b",".join([_pydantic_bytes(schemas.ReservationOut, hold_reservation)] * 2) + b"]"
+
+    ready = JSONResponse({"replayed": True})
+    assert serializers.respond(schemas.ReservationOut, ready) is ready
+
+
+def test_hot_routes_keep_their_shape(client):
+    hold = client.post("/reservations/hold", json={"event_id": 1, "quantity": 2})
+    assert hold.headers["content-type"] == "application/json"
+    assert list(hold.json()) == list(schemas.ReservationOut.__fields__)
+    assert hold.json()["state"] == "HOLD" and hold.json()["quantity"] == 2
+
+    confirm = client.post(f"/reservations/confirm/{hold.json()['id']}")
+    assert confirm.json()["state"] == "CONFIRMED"
+
+    event = client.post("/events/", json={"title": "Yeni", "capacity": 5})
+    assert event.json() == {"id": 2, "title": "Yeni", "capacity": 5, "available_capacity": 5,
+                            "start_date": None, "end_date": None, "is_active": True}
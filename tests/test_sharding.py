@@ -0,0 +1,152 @@
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from sqlalchemy import event as sa_event, func, text
+from sqlalchemy.orm import sessionmaker
+
+from app import inventory, schemas, tasks
+from app.config import settings
+from app.models import Event, EventCapacityShard, Reservation, ReservationState
+from app.routers.reservations import create_hold
+from app.tasks import cleanup_expired_holds
+
+
+@pytest.fixture(autouse=True)
+def sharded_mode(monkeypatch):
+    monkeypatch.setattr(settings, "SHARDED_INVENTORY", True)
+
+
+def _shards(db, event_id=1):
+    db.expire_all()
+    return [s.available_capacity for s in db.query(EventCapacityShard).filter_by(event_id=event_id).order_by(EventCapacityShard.shard_no)]
+
+
+def test_shard_endpoints_require_admin(client):
+    assert client.put("/events/1/shards", json={"shards": 3}).status_code == 403
+    assert client.post("/events/1/shards/rebalance").status_code == 403
+
+
+def test_configure_shards_splits_remaining_capacity(admin, db):
+    response = admin.put("/events/1/shards", json={"shards": 3})
+    assert response.status_code == 200
+    assert response.json()["shards"] == [34, 33, 33]
+    assert admin.get("/events/1").json()["available_capacity"] == 100
+
+
+def test_hold_takes_from_a_shard_and_expiry_returns_it(admin, db):
+    admin.put("/events/1/shards", json={"shards": 4})
+    hold = admin.post("/reservations/hold", json={"event_id": 1}).json()
+    assert sum(_shards(db)) == 99
+    assert admin.get("/events/1").json()["available_capacity"] == 99
+
+    reservation = db.get(Reservation, hold["id"])
+    shard_no = reservation.shard_no
+    assert shard_no is not None
+    shard_before = _shards(db)[shard_no]
+    reservation.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db.commit()
+    cleanup_expired_holds(db_session=db)
+    assert _shards(db)[shard_no] == shard_before + 1
+
+
+def test_hold_falls_back_to_shard_with_stock(client, db):
+    inventory.set_shard_count(db, 1, 4)
+    db.commit()
+    db.query(EventCapacityShard).filter(EventCapacityShard.shard_no != 2).update({"available_capacity": 0})
+    db.commit()
+    for _ in range(3):
+        assert client.post("/reservations/hold", json={"event_id": 1}).status_code == 200
+    assert _shards(db)[2] == 22
+    db.query(EventCapacityShard).update({"available_capacity": 0})
+    db.commit()
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert response.status_code == 400
+
+
+def test_rebalance_evens_out_shards(admin, db):
+    inventory.set_shard_count(db, 1, 2)
+    db.commit()
+    db.query(EventCapacityShard).filter_by(shard_no=0).update({"available_capacity": 1})
+    db.commit()
+    response = admin.post("/events/1/shards/rebalance")
+    assert response.json()["shards"] == [26, 25]
+
+
+def test_unsharding_folds_capacity_back(admin, db):
+    admin.put("/events/1/shards", json={"shards": 5})
+    admin.post("/reservations/hold", json={"event_id": 1})
+    admin.put("/events/1/shards", json={"shards": 0})
+    db.expire_all()
+    assert db.get(Event, 1).available_capacity == 99
+    assert db.query(EventCapacityShard).count() == 0
+
+
+def _hammer(engine, event_id, user_id, attempts, workers, hold_lock_for=0.0):
+    Session = sessionmaker(bind=engine)
+    if hold_lock_for:
+        # Simulates the work done while the row lock is held
+        @sa_event.listens_for(Session, "before_commit")
+        def _slow_commit(session):
+            session.execute(text("SELECT pg_sleep(:s)"), {"s": hold_lock_for})
+
+    def attempt(_):
+        db = Session()
+        try:
+            create_hold(schemas.ReservationCreate(event_id=event_id), db=db, current_user=SimpleNamespace(id=user_id))
+            return True
+        except HTTPException:
+            return False
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        successes = sum(pool.map(attempt, range(attempts)))
+    return successes, time.perf_counter() - started
+
+
+def test_expiry_releases_in_lock_order(db, monkeypatch):
+    # The unsharded row (None) goes first and is not confused with shard 0
+    released = []
+    monkeypatch.setattr(tasks, "release_hold", lambda db, event_id, shard_no, count: released.append(
+        (event_id, shard_no, count)))
+    monkeypatch.setattr(tasks.outbox, "add", lambda *args: None)
+    rows = [SimpleNamespace(event_id=event_id, shard_no=shard_no, quantity=1)
+            for event_id, shard_no in [(2, 1), (1, 0), (1, None), (2, 0), (1, 0), (1, 2), (1, None)]]
+    tasks._release_capacity(db, rows)
+    assert released == [(1, None, 2), (1, 0, 2), (1, 2, 1), (2, 0, 1), (2, 1, 1)]
+
+
+def test_concurrent_sharded_holds_never_oversell(concurrent_engine, make_event):
+    ids = make_event(concurrent_engine, capacity=30)
+    db = sessionmaker(bind=concurrent_engine)()
+    inventory.set_shard_count(db, ids.event_id, 6)
+    db.commit()
+
+    successes, _ = _hammer(concurrent_engine, ids.event_id, ids.user_id, attempts=60, workers=12)
+
+    holds = db.query(func.count(Reservation.id)).filter(
+        Reservation.event_id == ids.event_id, Reservation.state == ReservationState.HOLD
+    ).scalar()
+    assert successes == holds == 30
+    assert _shards(db, ids.event_id) == [0] * 6
+    db.close()
+
+
+def test_sharded_holds_outpace_single_row(pg_engine, make_event):
+    single = make_event(pg_engine, capacity=200)
+    sharded = make_event(pg_engine, capacity=200)
+    db = sessionmaker(bind=pg_engine)()
+    inventory.set_shard_count(db, sharded.event_id, 8)
+    db.commit()
+    db.close()
+
+    ok_single, t_single = _hammer(pg_engine, single.event_id, single.user_id, 80, 8, hold_lock_for=0.01)
+    ok_sharded, t_sharded = _hammer(pg_engine, sharded.event_id, sharded.user_id, 80, 8, hold_lock_for=0.01)
+
+    assert ok_single == ok_sharded == 80
+    assert ok_sharded / t_sharded > 1.5 * (ok_single / t_single)
@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event as sa_event
+from sqlalchemy.sql import Select, Update
+
+from app import holds, waiting_room
+from app.config import settings
+from app.holds import create_hold
+from app.models import Event, Reservation, ReservationState
+from app.tasks import cleanup_expired_holds
+from app.waiting_room import InMemoryWaitingRoom, Queued
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def room(monkeypatch):
+    room = InMemoryWaitingRoom(idle_seconds=60, clock=FakeClock())
+    monkeypatch.setattr(waiting_room, "_room", room)
+    return room
+
+
+@pytest.fixture
+def lock_count(db):
+    """Counts statements that take an event row lock (FOR UPDATE or UPDATE events)."""
+    counter = {"locks": 0}
+
+    def count(conn, clauseelement, multiparams, params, execution_options):
+        if isinstance(clauseelement, Select) and clauseelement._for_update_arg is not None:
+            tables = {table.name for table in clauseelement.get_final_froms()}
+        elif isinstance(clauseelement, Update):
+            tables = {clauseelement.table.name}
+        else:
+            return
+        if "events" in tables:
+            counter["locks"] += 1
+
+    engine = db.get_bind()
+    sa_event.listen(engine, "before_execute", count)
+    yield counter
+    sa_event.remove(engine, "before_execute", count)
+
+
+def _sell_out_with_expired_holds(db, expired):
+    event = db.get(Event, 1)
+    event.available_capacity = 0
+    event.hold_count = 100
+    past = datetime.utcnow() - timedelta(minutes=1)
+    db.add_all([
+        Reservation(event_id=1, user_id=1000 + i, state=ReservationState.HOLD,
+                    expires_at=past if i < expired else past + timedelta(hours=1))
+        for i in range(100)
+    ])
+    db.commit()
+
+
+def _storm(db, users, retries):
+    queued = {}
+    for _ in range(retries):
+        for user_id in users:
+            try:
+                create_hold(db, 1, user_id)
+            except Queued as exc:
+                queued[user_id] = exc.ticket
+            except Exception as exc:
+                assert exc.detail == "No capacity"
+                db.rollback()
+    return queued
+
+
+def test_retry_storm_without_waiting_room_locks_every_time(db, lock_count):
+    _sell_out_with_expired_holds(db, expired=0)
+    lock_count["locks"] = 0
+    _storm(db, users=range(1, 21), retries=10)
+    assert lock_count["locks"] == 200
+
+
+def test_retry_storm_with_waiting_room_locks_once(db, room, lock_count):
+    _sell_out_with_expired_holds(db, expired=0)
+    lock_count["locks"] = 0
+    tickets = _storm(db, users=range(1, 21), retries=10)
+    # Only the first attempt saw an empty queue and asked the database
+    assert lock_count["locks"] == 1
+    assert room.waiting(1) == 20
+    # Retrying keeps the same ticket and place in line
+    assert [tickets[user].position for user in range(1, 21)] == list(range(1, 21))
+    assert len({ticket.id for ticket in tickets.values()}) == 20
+
+
+def test_released_seats_granted_in_fifo_order(db, room, lock_count):
+    _sell_out_with_expired_holds(db, expired=3)
+    tickets = _storm(db, users=range(1, 11), retries=1)
+
+    lock_count["locks"] = 0
+    report = cleanup_expired_holds(db_session=db)
+    assert report.granted == 3
+    # The release UPDATE, then one SELECT FOR UPDATE and one UPDATE for all three grants
+    assert lock_count["locks"] == 3
+
+    for user_id in (1, 2, 3):
+        ticket = room.get(tickets[user_id].id)
+        assert ticket.state == "granted"
+        reservation = db.get(Reservation, ticket.reservation_id)
+        assert (reservation.user_id, reservation.state) == (user_id, ReservationState.HOLD)
+    assert room.get(tickets[4].id).position == 1
+    assert room.waiting(1) == 7
+
+    db.expire_all()
+    event = db.get(Event, 1)
+    assert (event.available_capacity, event.hold_count) == (0, 100)
+
+
+def test_idle_tickets_are_skipped(db, room):
+    _sell_out_with_expired_holds(db, expired=1)
+    tickets = _storm(db, users=[1, 2], retries=1)
+    room.clock.now += 30
+    room.get(tickets[2].id)  # only user 2 keeps polling
+    room.clock.now += 45
+
+    cleanup_expired_holds(db_session=db)
+    assert room.get(tickets[1].id) is None
+    assert room.get(tickets[2].id).state == "granted"
+
+
+@pytest.fixture(params=["memory", "fakeredis"])
+def any_room(request, monkeypatch):
+    if request.param == "memory":
+        room = InMemoryWaitingRoom(idle_seconds=60, clock=FakeClock())
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        room = waiting_room.RedisWaitingRoom(fakeredis.FakeRedis(), idle_seconds=60, clock=FakeClock())
+    monkeypatch.setattr(waiting_room, "_room", room)
+    return room
+
+
+def test_idle_ticket_does_not_queue_fresh_holds(db, any_room):
+    _sell_out_with_expired_holds(db, expired=0)
+    tickets = _storm(db, users=[1, 2], retries=1)
+    any_room.clock.now += 30
+    any_room.get(tickets[2].id)  # only user 2 keeps polling
+    any_room.clock.now += 45
+    assert any_room.waiting(1) == 1
+
+    # Seats come back after everyone in the queue walked away
+    any_room.clock.now += 60
+    event = db.get(Event, 1)
+    event.available_capacity = 5
+    db.commit()
+    reservation = create_hold(db, 1, 3)
+    assert (reservation.user_id, reservation.state) == (3, ReservationState.HOLD)
+    assert any_room.waiting(1) == 0
+
+
+def test_api_queue_flow(client, db, room, monkeypatch):
+    monkeypatch.setattr(settings, "WAITING_ROOM_POLL_SECONDS", 3)
+    _sell_out_with_expired_holds(db, expired=1)
+
+    response = client.post("/reservations/hold", json={"event_id": 1})
+    assert response.status_code == 202
+    assert response.headers["Retry-After"] == "3"
+    ticket = response.json()
+    assert (ticket["state"], ticket["position"]) == ("waiting", 1)
+    assert response.headers["Location"] == f"/reservations/queue/{ticket['id']}"
+
+    polled = client.get(f"/reservations/queue/{ticket['id']}")
+    assert polled.status_code == 200
+    assert polled.json()["position"] == 1
+
+    cleanup_expired_holds(db_session=db)
+    granted = client.get(f"/reservations/queue/{ticket['id']}").json()
+    assert granted["state"] == "granted"
+    confirmed = client.post(f"/reservations/confirm/{granted['reservation_id']}")
+    assert confirmed.status_code == 200
+    assert confirmed.json()["state"] == "CONFIRMED"
+
+
+def test_api_leave_queue(client, db, room):
+    _sell_out_with_expired_holds(db, expired=0)
+    ticket = client.post("/reservations/hold", json={"event_id": 1}).json()
+    assert client.delete(f"/reservations/queue/{ticket['id']}").status_code == 204
+    assert client.get(f"/reservations/queue/{ticket['id']}").status_code == 404
+    assert room.waiting(1) == 0
+
+
+def test_inactive_event_closes_queue(db, room):
+    _sell_out_with_expired_holds(db, expired=0)
+    _storm(db, users=[1, 2], retries=1)
+    db.get(Event, 1).is_active = False
+    db.commit()
+    assert holds.admit_waiting(db) == {}
+    assert room.events() == []